@@ -1,15 +1,100 @@
+import argparse
+import errno
+import os
 import sys
 
 PERMS = 0o666    # RW for owner, group, others
-BUFSIZ = 512
+BUFSIZ = 128 * 1024    # K&R uses 512, but larger buffers need fewer system calls
 
-if len(sys.argv) != 3:
-    print("Usage: python3 copy-file-to-file.py inputfile outputfile", file=sys.stderr)
-    exit(1)
+# Errors that mean a fast path can't be used for this pair of files,
+# for example because one of them is a pipe or they are on different
+# file systems.
+UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP, errno.EBADF}
 
-with open(sys.argv[1], "rb") as inputfile:
-    with open(sys.argv[2], "wb") as outputfile:
-        outputfile.write(inputfile.read())
+# The most the kernel is asked to copy in one call.
+CHUNK = 2 ** 30
+
+def copy_kernel(copier, infd, outfd):
+    """Copy with os.copy_file_range or os.sendfile, which move the data
+    inside the kernel. Return False if they can't be used."""
+    copied = 0
+    while True:
+        try:
+            if copier == "sendfile":
+                n = os.sendfile(outfd, infd, None, CHUNK)
+            else:
+                n = os.copy_file_range(infd, outfd, CHUNK)
+        except OSError as err:
+            if copied == 0 and err.errno in UNSUPPORTED:
+                return False
+            raise
+        if n == 0:
+            # Files in /proc and /sys report a size of 0, and some kernels
+            # copy nothing from them, so let the read loop confirm EOF.
+            return copied > 0
+        copied += n
+
+def copy_buffer(infile, outfile, bufsize):
+    """Copy through a single buffer of bufsize bytes, like read and write
+    in K&R's cp, so memory use doesn't depend on the size of the file."""
+    buf = bytearray(bufsize)
+    view = memoryview(buf)
+    while n := infile.readinto(buf):
+        written = 0
+        while written < n:
+            written += outfile.write(view[written:n])
+
+def copy(infile, outfile, bufsize=BUFSIZ, method="auto"):
+    """Copy infile to outfile, both unbuffered binary files. Return the
+    method that was used."""
+    methods = ["copy_file_range", "sendfile"] if method == "auto" else [method]
+    for copier in methods:
+        if copier == "readinto":
+            break
+        if hasattr(os, copier) and copy_kernel(copier, infile.fileno(), outfile.fileno()):
+            return copier
+    copy_buffer(infile, outfile, bufsize)
+    return "readinto"
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy inputfile to outputfile.")
+    parser.add_argument("inputfile")
+    parser.add_argument("outputfile")
+    parser.add_argument("--buffer-size", type=int, default=BUFSIZ,
+                        help="bytes read at a time when copying through a buffer (default %(default)s)")
+    parser.add_argument("--method", default="auto",
+                        choices=["auto", "copy_file_range", "sendfile", "readinto"],
+                        help="how to copy the data (default %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the method that was used")
+    args = parser.parse_args()
+    if args.buffer_size < 1:
+        parser.error("--buffer-size must be at least 1")
+
+    try:
+        with open(args.inputfile, "rb", buffering=0) as inputfile:
+            # Like creat(name, PERMS): the mode is used if the file is new,
+            # less the umask. Then give it the input's permissions, limited
+            # to PERMS.
+            fd = os.open(args.outputfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, PERMS)
+            with open(fd, "wb", buffering=0) as outputfile:
+                method = copy(inputfile, outputfile, args.buffer_size, args.method)
+                mode = os.fstat(inputfile.fileno()).st_mode
+                os.fchmod(outputfile.fileno(), mode & PERMS)
+    except OSError as err:
+        print("copy-file-to-file.py:", err, file=sys.stderr)
+        exit(1)
+    if args.verbose:
+        print("copied with", method)
+
+main()
 
 # $ python3 copy-file-to-file.py text.txt output.txt
-# $ diff text.txt output.txt
\ No newline at end of file
+# $ diff text.txt output.txt
+# $ python3 copy-file-to-file.py -v text.txt output.txt
+# copied with copy_file_range
+# $ python3 copy-file-to-file.py -v --method readinto --buffer-size 64 text.txt output.txt
+# copied with readinto
+# $ cat text.txt | python3 copy-file-to-file.py -v /dev/stdin output.txt
+# copied with readinto
+# $ diff text.txt output.txt
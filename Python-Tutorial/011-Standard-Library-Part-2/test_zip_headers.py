@@ -0,0 +1,101 @@
+import io
+import struct
+import unittest
+import zipfile
+import zlib
+
+import zip_headers
+
+
+def streamed_archive(members, signature=True):
+    """Build a stored archive whose members are followed by data descriptors.
+
+    Streaming writers set flag 0x08, but many of them still put the sizes
+    in the local header, as this one does.
+    """
+    out = io.BytesIO()
+    central = []
+    for name, data in members:
+        crc32 = zlib.crc32(data)
+        central.append((name, crc32, len(data), out.tell()))
+        out.write(zip_headers.LOCAL_HEADER.pack(
+            zip_headers.LOCAL_SIGNATURE, 20, zip_headers.DATA_DESCRIPTOR_FLAG,
+            zipfile.ZIP_STORED, 0, 0x21, crc32, len(data), len(data),
+            len(name), 0))
+        out.write(name)
+        out.write(data)
+        if signature:
+            out.write(zip_headers.DESCRIPTOR_SIGNATURE)
+        out.write(struct.pack('<3I', crc32, len(data), len(data)))
+    directory = out.tell()
+    for name, crc32, size, offset in central:
+        out.write(struct.pack(
+            '<4s6H3I5H2I', b'PK\x01\x02', 20, 20,
+            zip_headers.DATA_DESCRIPTOR_FLAG, zipfile.ZIP_STORED, 0, 0x21,
+            crc32, size, size, len(name), 0, 0, 0, 0, 0, offset))
+        out.write(name)
+    out.write(struct.pack(
+        '<4s4H2IH', b'PK\x05\x06', 0, 0, len(central), len(central),
+        out.tell() - directory, directory, 0))
+    return out.getvalue()
+
+
+class ScanHeadersTest(unittest.TestCase):
+
+    members = [(b'first.txt', b'spam' * 10), (b'second.txt', b'eggs')]
+
+    def check(self, archive):
+        headers = list(zip_headers.scan_headers(archive))
+        self.assertEqual([h.filename for h in headers],
+                         [name for name, data in self.members])
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            for header in headers:
+                info = zf.getinfo(header.filename.decode())
+                self.assertEqual(header.offset, info.header_offset)
+                self.assertEqual(header.crc32, info.CRC)
+
+    def test_descriptor_with_signature(self):
+        self.check(streamed_archive(self.members))
+
+    def test_descriptor_without_signature(self):
+        self.check(streamed_archive(self.members, signature=False))
+
+    def test_seekable_archive(self):
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, 'w') as zf:
+            for name, data in self.members:
+                zf.writestr(name.decode(), data)
+        self.check(out.getvalue())
+
+    def test_descriptor_without_sizes(self):
+        out = io.BytesIO()
+        with zipfile.ZipFile(Unseekable(out), 'w') as zf:
+            for name, data in self.members:
+                zf.writestr(name.decode(), data)
+        with self.assertRaises(ValueError):
+            list(zip_headers.scan_headers(out.getvalue()))
+
+    def test_garbage_raises(self):
+        archive = streamed_archive(self.members)
+        first = zip_headers.LOCAL_HEADER.size + len(b'first.txt') + 40
+        with self.assertRaises(ValueError):
+            # Drop the first descriptor's signature and CRC-32 so the
+            # scan lands in the middle of it.
+            list(zip_headers.scan_headers(
+                archive[:first] + archive[first + 8:]))
+
+
+class Unseekable(io.RawIOBase):
+
+    def __init__(self, out):
+        self.out = out
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.out.write(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import collections
+import mmap
+import struct
+
+# signature, version, flags, method, time, date, crc32, compressed size,
+# uncompressed size, filename size, extra size
+LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+LOCAL_SIGNATURE = b'PK\x03\x04'
+EXTRA_HEADER = struct.Struct('<HH')
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_MARKER = 0xFFFFFFFF
+DATA_DESCRIPTOR_FLAG = 0x08
+DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+# central directory, ZIP64 end of central directory, end of central directory
+END_SIGNATURES = {b'PK\x01\x02', b'PK\x06\x06', b'PK\x05\x06'}
+
+ZipHeader = collections.namedtuple(
+    'ZipHeader',
+    'offset filename method crc32 compressed_size file_size data_offset')
+
+
+def zip64_sizes(extra, file_size, compressed_size):
+    """Replace sizes marked as 0xFFFFFFFF with the ones in a ZIP64 extra field.
+
+    The ZIP64 field only holds the values that did not fit, in the order
+    uncompressed size, then compressed size.
+    """
+    offset = 0
+    while offset + EXTRA_HEADER.size <= len(extra):
+        field_id, size = EXTRA_HEADER.unpack_from(extra, offset)
+        offset += EXTRA_HEADER.size
+        if field_id == ZIP64_EXTRA_ID:
+            if file_size == ZIP64_MARKER:
+                file_size, = struct.unpack_from('<Q', extra, offset)
+                offset += 8
+            if compressed_size == ZIP64_MARKER:
+                compressed_size, = struct.unpack_from('<Q', extra, offset)
+            break
+        offset += size
+    return file_size, compressed_size
+
+
+def descriptor_size(data, offset, zip64):
+    """Return the size of the data descriptor that starts at offset.
+
+    The descriptor holds the CRC-32 and the sizes, 4 or 8 bytes each,
+    and may start with its own signature.
+    """
+    size = 4 + (16 if zip64 else 8)
+    if bytes(data[offset:offset+4]) == DESCRIPTOR_SIGNATURE:
+        size += 4
+    return size
+
+
+def scan_headers(data):
+    """Yield a ZipHeader for each local file header in data.
+
+    data can be anything that supports the buffer protocol, such as
+    bytes or an mmap. Fields are unpacked in place, so only the
+    filenames are copied. Scanning stops at the central directory;
+    anything else that is not a local header raises ValueError.
+    """
+    with memoryview(data) as view:
+        offset = 0
+        while offset < len(view):
+            signature = bytes(view[offset:offset+4])
+            if signature in END_SIGNATURES:
+                break
+            if (signature != LOCAL_SIGNATURE
+                    or offset + LOCAL_HEADER.size > len(view)):
+                raise ValueError(
+                    'no local header at offset {}'.format(offset))
+            (signature, version, flags, method, time, date, crc32,
+             compressed_size, file_size, filename_size,
+             extra_size) = LOCAL_HEADER.unpack_from(view, offset)
+            start = offset + LOCAL_HEADER.size
+            filename = bytes(view[start:start+filename_size])
+            start += filename_size
+            zip64 = ZIP64_MARKER in (file_size, compressed_size)
+            if zip64:
+                file_size, compressed_size = zip64_sizes(
+                    view[start:start+extra_size], file_size, compressed_size)
+            data_offset = start + extra_size
+            if flags & DATA_DESCRIPTOR_FLAG and not compressed_size:
+                # The sizes follow the data, so there is no way to find
+                # the next header without the central directory.
+                raise ValueError(
+                    'sizes of {!r} are in a data descriptor'.format(filename))
+            yield ZipHeader(offset, filename, method, crc32,
+                            compressed_size, file_size, data_offset)
+            offset = data_offset + compressed_size
+            if flags & DATA_DESCRIPTOR_FLAG:
+                # The sizes were also written to the local header, but the
+                # descriptor after the data still has to be skipped.
+                offset += descriptor_size(view, offset, zip64)
+
+
+def scan_file(filename):
+    """Yield a ZipHeader for each member of a ZIP file, using mmap.
+
+    The operating system only reads the pages that are touched, so the
+    file can be larger than memory.
+    """
+    with open(filename, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if hasattr(m, 'madvise'):
+                # Only the pages holding headers are needed, so turn off
+                # read-ahead, which would read the member data as well.
+                m.madvise(mmap.MADV_RANDOM)
+            yield from scan_headers(m)
+
+
+if __name__ == '__main__':
+    import sys
+
+    for header in scan_file(sys.argv[1] if len(sys.argv) > 1 else 'myfile.zip'):
+        print(header.filename, hex(header.crc32),
+              header.compressed_size, header.file_size)
+
+# $ python3 zip_headers.py example.zip
+# b'zipfile.md' 0x479ea939 410 695
+# b'bad_example.zip' 0xd3235501 45 45
+# b'README.txt' 0xb739e0d5 12 12
+# b'zipfile_is_zipfile.py' 0xd7a24775 131 193
@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import struct
+import time
+import zipfile
+
+from zip_headers import scan_file, zip64_sizes
+
+
+def make_archive(filename, size):
+    """Write a ZIP file of about size bytes, storing members of 4-256 KB.
+
+    Every tenth member is written with ZIP64 extra fields.
+    """
+    rng = random.Random(0)
+    chunk = memoryview(os.urandom(256 * 1024))
+    total = 0
+    i = 0
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_STORED) as zf:
+        while total < size:
+            length = rng.randint(4 * 1024, 256 * 1024)
+            name = 'dir{:03d}/member{}.bin'.format(i // 1000, i)
+            with zf.open(name, 'w', force_zip64=(i % 10 == 0)) as f:
+                f.write(chunk[:length])
+            total += length
+            i += 1
+
+
+def read_everything(filename):
+    """The struct-module.py approach: read the file, unpack copied slices."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    count = 0
+    start = 0
+    while data[start:start+4] == b'PK\x03\x04':
+        start += 14
+        fields = struct.unpack('<IIIHH', data[start:start+16])
+        crc32, comp_size, uncomp_size, filenamesize, extra_size = fields
+
+        start += 16
+        filename = data[start:start+filenamesize]
+        start += filenamesize
+        extra = data[start:start+extra_size]
+        uncomp_size, comp_size = zip64_sizes(extra, uncomp_size, comp_size)
+        count += 1
+
+        start += extra_size + comp_size     # skip to the next header
+    return count
+
+
+def scan_mmap(filename):
+    return sum(1 for header in scan_file(filename))
+
+
+def physical_memory():
+    return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=float, default=1,
+                        help='archive size in GB')
+    parser.add_argument('--filename', default='zip_headers_benchmark.zip')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the archive to reuse it in the next run')
+    args = parser.parse_args()
+
+    size = int(args.size * 2**30)
+    if not os.path.exists(args.filename) or os.path.getsize(args.filename) < size:
+        make_archive(args.filename, size)
+    archive_size = os.path.getsize(args.filename)
+    print('archive: {:.2f} GB'.format(archive_size / 2**30))
+
+    template = '{:<16} {:>8} {:>9} {:>10} {:>12}'
+    print(template.format('approach', 'headers', 'seconds', 'GB/s', 'headers/s'))
+    print(template.format('-' * 16, '-' * 8, '-' * 9, '-' * 10, '-' * 12))
+    for name, func in [('mmap scanner', scan_mmap),
+                       ('read everything', read_everything)]:
+        if func is read_everything and archive_size > physical_memory():
+            print(template.format(name, '-', 'larger than memory', '', ''))
+            continue
+        start = time.perf_counter()
+        count = func(args.filename)
+        elapsed = time.perf_counter() - start
+        print(template.format(
+            name, count, '{:.3f}'.format(elapsed),
+            '{:.1f}'.format(archive_size / elapsed / 2**30),
+            '{:.0f}'.format(count / elapsed)))
+
+    if not args.keep:
+        os.remove(args.filename)
@@ -0,0 +1,108 @@
+# codecs_benchmark.py
+import argparse
+import codecs
+import io
+import time
+
+import codecs_invertcaps_register  # noqa: registers invertcaps
+import codecs_invertcaps_fast  # noqa: registers invertcaps_fast
+
+CODECS = ["invertcaps", "invertcaps_fast", "rot13", "zlib", "bz2"]
+
+# The rot13 StreamReader starts from an empty bytes buffer, so it can
+# not read the str data that rot13 produces.
+UNSUPPORTED = {("rot13", "stream r")}
+
+
+def sample(name, size):
+    text = "The quick brown fox jumps over the lazy dog. " * (size // 45 + 1)
+    text = text[:size]
+    if name in ("zlib", "bz2"):
+        return text.encode("ascii")
+    return text
+
+
+def chunks(data, chunk_size):
+    return [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def run_encode(name, data, encoded, chunk_size):
+    codecs.encode(data, name)
+
+
+def run_decode(name, data, encoded, chunk_size):
+    codecs.decode(encoded, name)
+
+
+def run_incremental_encode(name, data, encoded, chunk_size):
+    encoder = codecs.getincrementalencoder(name)()
+    for chunk in chunks(data, chunk_size):
+        encoder.encode(chunk)
+    encoder.encode(data[:0], final=True)
+
+
+def run_incremental_decode(name, data, encoded, chunk_size):
+    decoder = codecs.getincrementaldecoder(name)()
+    for chunk in chunks(encoded, chunk_size):
+        decoder.decode(chunk)
+    decoder.decode(encoded[:0], final=True)
+
+
+def run_stream_write(name, data, encoded, chunk_size):
+    # A StreamWriter calls the stateless encoder for every write(), so
+    # the compression codecs would produce one stream per call. Write
+    # everything at once to keep the output readable.
+    buffer = io.StringIO() if isinstance(encoded, str) else io.BytesIO()
+    writer = codecs.getwriter(name)(buffer)
+    writer.write(data)
+    writer.flush()
+
+
+def run_stream_read(name, data, encoded, chunk_size):
+    codecs.getreader(name)(io.BytesIO(encoded)).read()
+
+
+MODES = [
+    ("encode", run_encode),
+    ("decode", run_decode),
+    ("inc enc", run_incremental_encode),
+    ("inc dec", run_incremental_decode),
+    ("stream w", run_stream_write),
+    ("stream r", run_stream_read),
+]
+
+
+def measure(func, name, data, encoded, chunk_size, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(name, data, encoded, chunk_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(data) / best / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=4, help="MB of data per codec")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("codecs", nargs="*", default=CODECS)
+    args = parser.parse_args()
+
+    print("MB/s of unencoded data, best of {} runs".format(args.repeat))
+    print()
+    template = "{:<16}" + " {:>9}" * len(MODES)
+    print(template.format("codec", *[mode for mode, func in MODES]))
+    print(template.format("-" * 16, *["-" * 9] * len(MODES)))
+    for name in args.codecs:
+        data = sample(name, args.size * 2**20)
+        encoded = codecs.encode(data, name)
+        results = []
+        for mode, func in MODES:
+            if (name, mode) in UNSUPPORTED:
+                results.append("n/a")
+                continue
+            speed = measure(func, name, data, encoded, args.chunk_size, args.repeat)
+            results.append("{:.1f}".format(speed))
+        print(template.format(name, *results))
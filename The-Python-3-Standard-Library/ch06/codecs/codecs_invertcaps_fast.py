@@ -0,0 +1,95 @@
+# codecs_invertcaps_fast.py
+import codecs
+import string
+
+# bytes.translate() maps every byte through a 256 byte table in C,
+# without the per-character dictionary lookups of charmap_encode().
+TABLE = bytes.maketrans(
+    (string.ascii_lowercase + string.ascii_uppercase).encode("ascii"),
+    (string.ascii_uppercase + string.ascii_lowercase).encode("ascii"),
+)
+
+
+def invertcaps_encode(input, errors="strict"):
+    # latin-1 maps the first 256 code points straight to bytes, the
+    # same range the charmap version supports.
+    return input.encode("latin-1", errors).translate(TABLE), len(input)
+
+
+def invertcaps_decode(input, errors="strict"):
+    return bytes(input).translate(TABLE).decode("latin-1"), len(input)
+
+
+class InvertCapsCodec(codecs.Codec):
+    "Stateless encoder/decoder"
+
+    def encode(self, input, errors="strict"):
+        return invertcaps_encode(input, errors)
+
+    def decode(self, input, errors="strict"):
+        return invertcaps_decode(input, errors)
+
+
+class InvertCapsIncrementalEncoder(codecs.IncrementalEncoder):
+    def encode(self, input, final=False):
+        return invertcaps_encode(input, self.errors)[0]
+
+
+class InvertCapsIncrementalDecoder(codecs.IncrementalDecoder):
+    def decode(self, input, final=False):
+        return invertcaps_decode(input, self.errors)[0]
+
+
+class InvertCapsStreamReader(InvertCapsCodec, codecs.StreamReader):
+    pass
+
+
+class InvertCapsStreamWriter(InvertCapsCodec, codecs.StreamWriter):
+    pass
+
+
+def find_invertcaps_fast(encoding):
+    """Return the codec for 'invertcaps_fast'."""
+    if encoding == "invertcaps_fast":
+        return codecs.CodecInfo(
+            name="invertcaps_fast",
+            encode=invertcaps_encode,
+            decode=invertcaps_decode,
+            incrementalencoder=InvertCapsIncrementalEncoder,
+            incrementaldecoder=InvertCapsIncrementalDecoder,
+            streamreader=InvertCapsStreamReader,
+            streamwriter=InvertCapsStreamWriter,
+        )
+    return None
+
+
+codecs.register(find_invertcaps_fast)
+
+if __name__ == "__main__":
+    import io
+
+    text = "abcDEF"
+    encoded_text, consumed = codecs.getencoder("invertcaps_fast")(text)
+    print(
+        'Encoded "{}" to "{}", consuming {} characters'.format(
+            text, encoded_text, consumed
+        )
+    )
+
+    buffer = io.BytesIO()
+    writer = codecs.getwriter("invertcaps_fast")(buffer)
+    writer.write("abcDEF")
+    print("StreamWriter buffer contents:", buffer.getvalue())
+
+    # The decoder has no state, so it can be given input in blocks of
+    # any size instead of one byte at a time.
+    decoder = codecs.getincrementaldecoder("invertcaps_fast")()
+    encoded_text = encoded_text * 4
+    decoded_text_parts = []
+    for i in range(0, len(encoded_text), 8):
+        decoded_text_parts.append(decoder.decode(encoded_text[i : i + 8]))
+    decoded_text_parts.append(decoder.decode(b"", final=True))
+    decoded_text = "".join(decoded_text_parts)
+    print(
+        "IncrementalDecoder converted {!r} to {!r}".format(encoded_text, decoded_text)
+    )
@@ -0,0 +1,217 @@
+# codecs_socket_transport.py
+import asyncio
+import codecs
+import socketserver
+import struct
+
+RECV_SIZE = 64 * 1024
+LENGTH = struct.Struct("!I")
+
+# A length prefix is trusted only up to this many bytes, so a corrupt or
+# hostile peer can not make the receiver allocate gigabytes.
+MAX_MESSAGE = 16 * 1024 * 1024
+
+
+def check_framing(encoding, framing):
+    if framing not in ("newline", "length"):
+        raise ValueError("unknown framing {!r}".format(framing))
+    # Splitting on the byte b"\n" only works if the encoding writes a
+    # newline as that byte and never uses it inside another character,
+    # as ASCII compatible encodings do. UTF-16 and UTF-32 do not.
+    if framing == "newline" and "\n".encode(encoding) != b"\n":
+        raise ValueError(
+            "newline framing needs an ASCII compatible encoding, not {!r}".format(
+                encoding
+            )
+        )
+
+
+def frame(text, encoding="utf-8", framing="newline"):
+    """Encode text as one message with the given framing."""
+    check_framing(encoding, framing)
+    data = text.encode(encoding)
+    if framing == "length":
+        return LENGTH.pack(len(data)) + data
+    if b"\n" in data:
+        raise ValueError("newline framed messages can not contain newlines")
+    return data + b"\n"
+
+
+class EchoUntilEOF(socketserver.BaseRequestHandler):
+    def handle(self):
+        """Echo bytes back to the client until it closes the connection."""
+        while True:
+            data = self.request.recv(RECV_SIZE)
+            if not data:
+                break
+            self.request.sendall(data)
+
+
+class TextTransport:
+    """Send and receive text over a connected socket.
+
+    Messages are framed either by a trailing newline or by a 4 byte
+    length prefix. A newline byte never appears inside a multi-byte
+    UTF-8 sequence, so newline framing can split the raw bytes before
+    decoding; it is refused for encodings where that is not true.
+    Messages longer than max_size bytes raise ValueError. recv_text()
+    returns whatever text has arrived, using an incremental decoder
+    that holds on to partial multi-byte sequences until the rest of
+    their bytes arrive.
+    """
+
+    def __init__(
+        self, sock, encoding="utf-8", framing="newline", max_size=MAX_MESSAGE
+    ):
+        check_framing(encoding, framing)
+        self.sock = sock
+        self.encoding = encoding
+        self.framing = framing
+        self.max_size = max_size
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._buffer = bytearray()
+        self._chunk = bytearray(RECV_SIZE)
+
+    def send(self, text):
+        self.sock.sendall(frame(text, self.encoding, self.framing))
+
+    def send_many(self, messages):
+        """Send several messages with one system call."""
+        self.sock.sendall(
+            b"".join(frame(text, self.encoding, self.framing) for text in messages)
+        )
+
+    def _fill(self):
+        n = self.sock.recv_into(self._chunk)
+        self._buffer += memoryview(self._chunk)[:n]
+        return n
+
+    def recv_text(self):
+        """Return the decoded text received so far, or "" at EOF."""
+        while True:
+            if self._buffer:
+                data = bytes(self._buffer)
+                self._buffer.clear()
+            else:
+                n = self.sock.recv_into(self._chunk)
+                if not n:
+                    return self._decoder.decode(b"", final=True)
+                data = self._chunk[:n]
+            text = self._decoder.decode(data)
+            if text:
+                return text
+
+    def recv(self):
+        """Return the next message, or None at EOF."""
+        while True:
+            if self.framing == "newline":
+                end = self._buffer.find(b"\n")
+                if end != -1:
+                    data = self._buffer[:end]
+                    del self._buffer[: end + 1]
+                    return data.decode(self.encoding)
+                if len(self._buffer) > self.max_size:
+                    raise ValueError("message is larger than max_size")
+            elif len(self._buffer) >= LENGTH.size:
+                (size,) = LENGTH.unpack_from(self._buffer)
+                if size > self.max_size:
+                    raise ValueError(
+                        "message of {} bytes is larger than max_size".format(size)
+                    )
+                end = LENGTH.size + size
+                if len(self._buffer) >= end:
+                    data = self._buffer[LENGTH.size : end]
+                    del self._buffer[:end]
+                    return data.decode(self.encoding)
+            if not self._fill():
+                if self._buffer:
+                    raise EOFError("connection closed inside a message")
+                return None
+
+
+class AsyncTextTransport:
+    """asyncio version of TextTransport, framing only.
+
+    Newline framed messages must fit within the limit given to
+    asyncio.open_connection(), 64 KB by default.
+    """
+
+    def __init__(
+        self, reader, writer, encoding="utf-8", framing="newline", max_size=MAX_MESSAGE
+    ):
+        check_framing(encoding, framing)
+        self.reader = reader
+        self.writer = writer
+        self.encoding = encoding
+        self.framing = framing
+        self.max_size = max_size
+
+    async def send(self, text):
+        self.writer.write(frame(text, self.encoding, self.framing))
+        await self.writer.drain()
+
+    async def send_many(self, messages):
+        self.writer.writelines(
+            frame(text, self.encoding, self.framing) for text in messages
+        )
+        await self.writer.drain()
+
+    async def recv(self):
+        try:
+            if self.framing == "newline":
+                data = await self.reader.readuntil(b"\n")
+                return data[:-1].decode(self.encoding)
+            (size,) = LENGTH.unpack(await self.reader.readexactly(LENGTH.size))
+            if size > self.max_size:
+                raise ValueError(
+                    "message of {} bytes is larger than max_size".format(size)
+                )
+            return (await self.reader.readexactly(size)).decode(self.encoding)
+        except asyncio.IncompleteReadError as err:
+            if err.partial:
+                raise EOFError("connection closed inside a message") from err
+            return None
+
+
+if __name__ == "__main__":
+    import socket
+    import threading
+
+    server = socketserver.TCPServer(("localhost", 0), EchoUntilEOF)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+
+    for framing in ["newline", "length"]:
+        with socket.create_connection(server.server_address) as s:
+            transport = TextTransport(s, framing=framing)
+            transport.send_many(["français", "日本語", "ascii"])
+            s.shutdown(socket.SHUT_WR)
+            print(framing, "framed messages:")
+            while True:
+                message = transport.recv()
+                if message is None:
+                    break
+                print("  Received:", repr(message))
+
+    # Send the bytes of a multi-byte character one at a time.
+    with socket.create_connection(server.server_address) as s:
+        transport = TextTransport(s)
+        print("Incremental text:")
+        for b in "ç".encode("utf-8"):
+            s.sendall(bytes([b]))
+        s.shutdown(socket.SHUT_WR)
+        print("  Received:", repr(transport.recv_text()))
+
+    async def async_client(address):
+        reader, writer = await asyncio.open_connection(*address)
+        transport = AsyncTextTransport(reader, writer, framing="length")
+        await transport.send("français")
+        print("asyncio Received:", repr(await transport.recv()))
+        writer.close()
+        await writer.wait_closed()
+
+    asyncio.run(async_client(server.server_address))
+
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,134 @@
+# codecs_socket_transport_benchmark.py
+import argparse
+import asyncio
+import socket
+import socketserver
+import statistics
+import threading
+import time
+
+from codecs_socket_transport import AsyncTextTransport, EchoUntilEOF, TextTransport
+
+SMALL_MESSAGE = "petit déjeuner à la française, s'il vous plaît"
+BULK_MESSAGE = "données " * 8192
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+
+def sync_small(address, framing, count):
+    latencies = []
+    with socket.create_connection(address) as s:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = TextTransport(s, framing=framing)
+        for i in range(count):
+            start = time.perf_counter()
+            transport.send(SMALL_MESSAGE)
+            assert transport.recv() == SMALL_MESSAGE
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def sync_bulk(address, framing, count):
+    with socket.create_connection(address) as s:
+        transport = TextTransport(s, framing=framing)
+
+        # Send from another thread so the echoed data is read while
+        # sending, otherwise both sides block on full buffers.
+        def sender():
+            for i in range(count):
+                transport.send(BULK_MESSAGE)
+            s.shutdown(socket.SHUT_WR)
+
+        t = threading.Thread(target=sender)
+        t.start()
+        received = 0
+        while transport.recv() is not None:
+            received += 1
+        t.join()
+    assert received == count
+
+
+async def async_small(address, framing, count):
+    reader, writer = await asyncio.open_connection(*address)
+    transport = AsyncTextTransport(reader, writer, framing=framing)
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        await transport.send(SMALL_MESSAGE)
+        assert await transport.recv() == SMALL_MESSAGE
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    await writer.wait_closed()
+    return latencies
+
+
+async def async_bulk(address, framing, count):
+    # Raise the stream's line length limit above the message size.
+    reader, writer = await asyncio.open_connection(*address, limit=2**20)
+    transport = AsyncTextTransport(reader, writer, framing=framing)
+
+    async def sender():
+        for i in range(count):
+            await transport.send(BULK_MESSAGE)
+        writer.write_eof()
+
+    task = asyncio.create_task(sender())
+    received = 0
+    while await transport.recv() is not None:
+        received += 1
+    await task
+    writer.close()
+    await writer.wait_closed()
+    assert received == count
+
+
+CLIENTS = [
+    ("sync newline", "newline", sync_small, sync_bulk),
+    ("sync length", "length", sync_small, sync_bulk),
+    ("async newline", "newline", async_small, async_bulk),
+    ("async length", "length", async_small, async_bulk),
+]
+
+
+def run(func, *args):
+    if asyncio.iscoroutinefunction(func):
+        return asyncio.run(func(*args))
+    return func(*args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small", type=int, default=5000, help="round trips")
+    parser.add_argument("--bulk", type=int, default=64, help="MB of bulk data")
+    args = parser.parse_args()
+
+    server = Server(("localhost", 0), EchoUntilEOF)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    address = server.server_address
+
+    bulk_size = len(BULK_MESSAGE.encode("utf-8"))
+    bulk_count = args.bulk * 2**20 // bulk_size
+
+    template = "{:<14} {:>9} {:>9} {:>9} {:>9}"
+    print(template.format("client", "msgs/s", "p50 (us)", "p99 (us)", "bulk MB/s"))
+    print(template.format("-" * 14, "-" * 9, "-" * 9, "-" * 9, "-" * 9))
+    for name, framing, small, bulk in CLIENTS:
+        latencies = run(small, address, framing, args.small)
+        start = time.perf_counter()
+        run(bulk, address, framing, bulk_count)
+        elapsed = time.perf_counter() - start
+        print(
+            template.format(
+                name,
+                "{:.0f}".format(len(latencies) / sum(latencies)),
+                "{:.0f}".format(statistics.median(latencies) * 1e6),
+                "{:.0f}".format(statistics.quantiles(latencies, n=100)[98] * 1e6),
+                "{:.1f}".format(bulk_count * bulk_size / elapsed / 2**20),
+            )
+        )
+
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,118 @@
+# codecs_transform_stream.py
+import bz2
+import codecs
+import io
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+BUFFER_SIZE = 256 * 1024
+
+# Decompressor factories for the codecs module's transform codecs,
+# keyed by their canonical names.
+DECOMPRESSORS = {
+    "zlib": zlib.decompressobj,
+    "bz2": bz2.BZ2Decompressor,
+}
+
+# Codecs whose data can be several compressed streams one after the
+# other. codecs.decode() reads all of them for bz2, but only the
+# first for zlib.
+MULTI_STREAM = {"bz2"}
+
+
+class DecodingRawIO(io.RawIOBase):
+    """Raw binary stream of the data decoded from a compressed stream.
+
+    readinto() decompresses at most as many bytes as the caller's
+    buffer holds, so memory use stays bounded no matter how large the
+    decompressed data is. Wrapping the object in io.BufferedReader
+    provides fast read(), readline(), and iteration.
+    """
+
+    def __init__(self, stream, encoding):
+        name = codecs.lookup(encoding).name
+        if name not in DECOMPRESSORS:
+            raise LookupError("no streaming decoder for {!r}".format(encoding))
+        self._stream = stream
+        self._factory = DECOMPRESSORS[name]
+        self._multi_stream = name in MULTI_STREAM
+        self._decompressor = self._factory()
+        self._pending = b""
+        # zlib keeps input it could not use in unconsumed_tail, while
+        # bz2 keeps it internally and reports needs_input instead.
+        self._has_tail = hasattr(self._decompressor, "unconsumed_tail")
+
+    def readable(self):
+        return True
+
+    def _next_input(self):
+        if self._pending:
+            data, self._pending = self._pending, b""
+            return data
+        decompressor = self._decompressor
+        if self._has_tail:
+            if decompressor.unconsumed_tail:
+                return decompressor.unconsumed_tail
+        elif not decompressor.needs_input:
+            return b""
+        data = self._stream.read(CHUNK_SIZE)
+        if not data:
+            raise EOFError("compressed stream ended before the end-of-stream marker")
+        return data
+
+    def _next_stream(self):
+        """Start a new decompressor if another stream follows."""
+        if not self._multi_stream:
+            return False
+        data = self._decompressor.unused_data or self._stream.read(CHUNK_SIZE)
+        if not data:
+            return False
+        self._decompressor = self._factory()
+        self._pending = data
+        return True
+
+    def readinto(self, b):
+        while True:
+            decompressor = self._decompressor
+            if decompressor.eof:
+                if not self._next_stream():
+                    return 0
+                continue
+            out = decompressor.decompress(self._next_input(), len(b))
+            if out:
+                b[: len(out)] = out
+                return len(out)
+
+
+def open_decoded(stream, encoding, buffer_size=BUFFER_SIZE, text=None):
+    """Return a buffered reader for the data in a compressed stream.
+
+    Pass a text encoding, such as "utf-8", to get a text stream.
+    """
+    reader = io.BufferedReader(DecodingRawIO(stream, encoding), buffer_size)
+    if text:
+        return io.TextIOWrapper(reader, encoding=text)
+    return reader
+
+
+if __name__ == "__main__":
+    text = b"abcdefghijklmnopqrstuvwxyz\n" * 5000
+
+    for encoding in ["zlib", "bz2"]:
+        compressed = codecs.encode(text, encoding)
+        print("{:<5} compressed length:".format(encoding), len(compressed))
+
+        with open_decoded(io.BytesIO(compressed), encoding) as stream:
+            first_line = stream.readline()
+            print("Read first line      :", repr(first_line))
+
+            buffer = bytearray(10)
+            stream.readinto(buffer)
+            print("readinto() 10 bytes  :", repr(bytes(buffer)))
+
+            count = sum(1 for line in stream)
+            print("Remaining lines      :", count)
+
+        with open_decoded(io.BytesIO(compressed), encoding, text="utf-8") as stream:
+            print("Same as original     :", stream.read() == text.decode("utf-8"))
+        print()
@@ -0,0 +1,93 @@
+# codecs_transform_stream_benchmark.py
+import argparse
+import codecs
+import io
+import time
+
+from codecs_transform_stream import open_decoded
+
+
+def make_log(size):
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = "2017-06-{:02d} 12:{:02d}:{:02d} INFO request {} took {} ms\n"
+        line = line.format(i % 30 + 1, i % 60, i % 59, i, i % 997).encode("ascii")
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return b"".join(lines)
+
+
+def stream_reader_read(compressed, encoding):
+    # StreamReader.readline() calls the stateless decoder on partial
+    # input, which fails for the compression codecs, so the only way
+    # to get lines from it is to read everything and split.
+    reader = codecs.getreader(encoding)(io.BytesIO(compressed))
+    return sum(1 for line in reader.read().splitlines(keepends=True))
+
+
+def incremental_lines(compressed, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    partial = b""
+    for i in range(0, len(compressed), 64 * 1024):
+        data = partial + decoder.decode(compressed[i : i + 64 * 1024])
+        lines = data.splitlines(keepends=True)
+        partial = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        yield from lines
+    # The bz2 decoder returns "" instead of b"" once the stream ends.
+    data = partial + (decoder.decode(b"", final=True) or b"")
+    if data:
+        yield data
+
+
+def incremental_decoder(compressed, encoding):
+    return sum(1 for line in incremental_lines(compressed, encoding))
+
+
+def buffered(compressed, encoding):
+    with open_decoded(io.BytesIO(compressed), encoding) as stream:
+        return sum(1 for line in stream)
+
+
+def buffered_text(compressed, encoding):
+    with open_decoded(io.BytesIO(compressed), encoding, text="utf-8") as stream:
+        return sum(1 for line in stream)
+
+
+READERS = [
+    ("StreamReader.read()", stream_reader_read),
+    ("incremental decoder", incremental_decoder),
+    ("open_decoded()", buffered),
+    ("open_decoded(text)", buffered_text),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=64, help="MB of log data")
+    args = parser.parse_args()
+
+    data = make_log(args.size * 2**20)
+    expected = data.count(b"\n")
+
+    template = "{:<5} {:<20} {:>8} {:>9} {:>10}"
+    print(template.format("codec", "reader", "seconds", "MB/s", "lines/s"))
+    print(template.format("-" * 5, "-" * 20, "-" * 8, "-" * 9, "-" * 10))
+    for encoding in ["zlib", "bz2"]:
+        compressed = codecs.encode(data, encoding)
+        for name, func in READERS:
+            start = time.perf_counter()
+            count = func(compressed, encoding)
+            elapsed = time.perf_counter() - start
+            assert count == expected, (name, count, expected)
+            print(
+                template.format(
+                    encoding,
+                    name,
+                    "{:.2f}".format(elapsed),
+                    "{:.1f}".format(len(data) / elapsed / 2**20),
+                    "{:,.0f}".format(count / elapsed),
+                )
+            )
@@ -0,0 +1,290 @@
+# filecmp_tree.py
+import concurrent.futures
+import filecmp
+import os
+import queue
+import sqlite3
+
+BUFFER_SIZE = 1024 * 1024
+
+# Files are compared in batches, so that a pool task is not created for
+# every small file.
+BATCH_SIZE = 64
+
+SCHEMA = """
+create table if not exists comparison (
+    left           text not null,
+    right          text not null,
+    left_size      integer not null,
+    left_mtime     real not null,
+    right_size     integer not null,
+    right_mtime    real not null,
+    same           integer not null,
+    primary key (left, right)
+) without rowid;
+"""
+
+
+class TreeComparison:
+    """The differences between two directories.
+
+    The attributes have the same names and meanings as those of
+    filecmp.dircmp, but are computed by compare_trees() instead of
+    when they are first used, and the lists are sorted.
+    """
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.left_list = []
+        self.right_list = []
+        self.common = []
+        self.left_only = []
+        self.right_only = []
+        self.common_dirs = []
+        self.common_files = []
+        self.common_funny = []
+        self.same_files = []
+        self.diff_files = []
+        self.funny_files = []
+        self.subdirs = {}
+
+    def report(self):
+        # The same output as filecmp.dircmp.report().
+        print("diff", self.left, self.right)
+        if self.left_only:
+            print("Only in", self.left, ":", self.left_only)
+        if self.right_only:
+            print("Only in", self.right, ":", self.right_only)
+        if self.same_files:
+            print("Identical files :", self.same_files)
+        if self.diff_files:
+            print("Differing files :", self.diff_files)
+        if self.funny_files:
+            print("Trouble with common files :", self.funny_files)
+        if self.common_dirs:
+            print("Common subdirectories :", self.common_dirs)
+        if self.common_funny:
+            print("Common funny cases :", self.common_funny)
+
+    def report_full_closure(self):
+        self.report()
+        for subdir in self.subdirs.values():
+            print()
+            subdir.report_full_closure()
+
+
+def open_cache(filename):
+    """Open the SQLite cache of comparison results, creating it if needed."""
+    conn = sqlite3.connect(filename)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def list_directory(path, ignore):
+    """Return a dict mapping the names in path to (kind, signature).
+
+    kind is "dir", "file", or "other", and signature is the size and
+    modification time of a file, as used by filecmp.cmp(). os.scandir()
+    reports the type of each entry, so only files are stat()ed. Like
+    dircmp, links are followed.
+    """
+    contents = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name in ignore:
+                continue
+            try:
+                if entry.is_dir():
+                    contents[entry.name] = ("dir", None)
+                elif entry.is_file():
+                    st = entry.stat()
+                    contents[entry.name] = ("file", (st.st_size, st.st_mtime))
+                else:
+                    contents[entry.name] = ("other", None)
+            except OSError:
+                contents[entry.name] = ("other", None)
+    return contents
+
+
+def same_contents(left, right, buffer_size=BUFFER_SIZE):
+    """Compare two files of the same size, stopping at the first difference."""
+    with open(left, "rb", buffering=0) as f1, open(right, "rb", buffering=0) as f2:
+        while True:
+            data = f1.read(buffer_size)
+            if data != f2.read(buffer_size):
+                return False
+            if not data:
+                return True
+
+
+def compare_files(files):
+    """Compare a batch of (name, key, signatures) tuples from scan().
+
+    Return a list with True or False for each, or None if a file could
+    not be read.
+    """
+    results = []
+    for name, key, signatures in files:
+        try:
+            results.append(same_contents(*key))
+        except OSError:
+            results.append(None)
+    return results
+
+
+def scan(node, ignore, shallow, cached):
+    """Fill in node from the contents of both directories.
+
+    Return the common files whose contents still have to be compared,
+    as (name, key, signatures) tuples, and the keys of the results
+    that were found in cached.
+    """
+    left = list_directory(node.left, ignore)
+    right = list_directory(node.right, ignore)
+    node.left_list = sorted(left)
+    node.right_list = sorted(right)
+    node.common = [name for name in node.left_list if name in right]
+    node.left_only = [name for name in node.left_list if name not in right]
+    node.right_only = [name for name in node.right_list if name not in left]
+
+    to_compare = []
+    reused = []
+    for name in node.common:
+        (left_kind, left_sig), (right_kind, right_sig) = left[name], right[name]
+        if left_kind != right_kind or left_kind == "other":
+            node.common_funny.append(name)
+        elif left_kind == "dir":
+            node.common_dirs.append(name)
+        else:
+            node.common_files.append(name)
+            # The same shortcuts as filecmp.cmp().
+            if shallow and left_sig == right_sig:
+                node.same_files.append(name)
+            elif left_sig[0] != right_sig[0]:
+                node.diff_files.append(name)
+            else:
+                key = (
+                    os.path.abspath(os.path.join(node.left, name)),
+                    os.path.abspath(os.path.join(node.right, name)),
+                )
+                signatures = left_sig + right_sig
+                result = cached.get(key)
+                if result is not None and result[:4] == signatures:
+                    reused.append(key)
+                    if result[4]:
+                        node.same_files.append(name)
+                    else:
+                        node.diff_files.append(name)
+                else:
+                    to_compare.append((name, key, signatures))
+    return to_compare, reused
+
+
+def compare_trees(
+    left, right, shallow=True, ignore=None, hide=None, workers=None, cache=None
+):
+    """Compare two directory trees, returning a TreeComparison.
+
+    shallow, ignore, and hide mean the same as for filecmp.dircmp.
+    Directories are listed and files compared by a pool of threads,
+    since both spend most of their time waiting for the file system.
+    Files are read in large chunks and compared until the first
+    difference.
+
+    If cache is a connection from open_cache(), the results of earlier
+    comparisons are used for files whose sizes and modification times
+    have not changed since, and the cache is updated at the end.
+    """
+    if ignore is None:
+        ignore = filecmp.DEFAULT_IGNORES
+    if hide is None:
+        hide = [os.curdir, os.pardir]
+    ignore = set(ignore) | set(hide)
+
+    cached = {}
+    if cache is not None:
+        for row in cache.execute("select * from comparison"):
+            cached[row[:2]] = row[2:]
+    results = {}
+
+    root = TreeComparison(left, right)
+    nodes = [root]
+    # Each finished future is put in done with its node, and for file
+    # comparisons the batch of files it compared.
+    done = queue.SimpleQueue()
+    outstanding = 0
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+
+        def submit(node, batch, func, *args):
+            nonlocal outstanding
+            future = pool.submit(func, *args)
+            future.add_done_callback(lambda f: done.put((f, node, batch)))
+            outstanding += 1
+
+        submit(root, None, scan, root, ignore, shallow, cached)
+        while outstanding:
+            future, node, batch = done.get()
+            outstanding -= 1
+            if batch is None:
+                to_compare, reused = future.result()
+                for key in reused:
+                    results[key] = cached[key]
+                for start in range(0, len(to_compare), BATCH_SIZE):
+                    batch = to_compare[start : start + BATCH_SIZE]
+                    submit(node, batch, compare_files, batch)
+                for name in node.common_dirs:
+                    subdir = TreeComparison(
+                        os.path.join(node.left, name), os.path.join(node.right, name)
+                    )
+                    node.subdirs[name] = subdir
+                    nodes.append(subdir)
+                    submit(subdir, None, scan, subdir, ignore, shallow, cached)
+                continue
+
+            for (name, key, signatures), same in zip(batch, future.result()):
+                if same is None:
+                    node.funny_files.append(name)
+                    continue
+                if same:
+                    node.same_files.append(name)
+                else:
+                    node.diff_files.append(name)
+                results[key] = signatures + (same,)
+
+    for node in nodes:
+        node.same_files.sort()
+        node.diff_files.sort()
+        node.funny_files.sort()
+
+    if cache is not None:
+        prefixes = (
+            os.path.join(os.path.abspath(left), ""),
+            os.path.join(os.path.abspath(right), ""),
+        )
+        with cache:
+            # Forget files under these trees that are gone, or are no
+            # longer compared by their contents.
+            cache.executemany(
+                "delete from comparison where left = ? and right = ?",
+                [
+                    key
+                    for key in cached
+                    if key not in results
+                    and key[0].startswith(prefixes[0])
+                    and key[1].startswith(prefixes[1])
+                ],
+            )
+            cache.executemany(
+                "insert or replace into comparison values (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    key + value
+                    for key, value in results.items()
+                    if cached.get(key) != value
+                ],
+            )
+    return root
+
+
+if __name__ == "__main__":
+    compare_trees("example/dir1", "example/dir2").report_full_closure()
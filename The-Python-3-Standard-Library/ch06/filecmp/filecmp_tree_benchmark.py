@@ -0,0 +1,151 @@
+# filecmp_tree_benchmark.py
+import argparse
+import filecmp
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from filecmp_tree import compare_trees, open_cache
+
+
+def make_trees(root, count, seed=0):
+    """Write two trees of count files each, in directories of 1000 files.
+
+    The right tree is written after the left one, so the modification
+    times differ and the contents of every common file have to be
+    compared. One file in a hundred has a changed byte, and one in two
+    hundred each has a different size, is only on the left, or is only
+    on the right.
+    """
+    rng = random.Random(seed)
+    pool = os.urandom(16 * 1024 * 1024)
+    files = []
+    for i in range(count):
+        size = min(int(rng.lognormvariate(8, 1)) + 1, 1024 * 1024)
+        offset = rng.randrange(len(pool) - size)
+        name = os.path.join("dir{:03d}".format(i // 1000), "file{}.bin".format(i))
+        files.append((name, pool[offset : offset + size]))
+
+    for side in ["left", "right"]:
+        for i, (name, data) in enumerate(files):
+            path = os.path.join(root, side, name)
+            if i % 1000 == 0:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            change = rng.random() if side == "right" else 1
+            if change < 0.005:
+                continue  # only on the left
+            elif change < 0.01:
+                data += b"!"
+            elif change < 0.02:
+                middle = len(data) // 2
+                data = data[:middle] + bytes([data[middle] ^ 1]) + data[middle + 1 :]
+            with open(path, "wb") as f:
+                f.write(data)
+            if 0.02 <= change < 0.025:
+                # An extra file, only on the right.
+                with open(path + ".new", "wb") as f:
+                    f.write(data)
+
+
+def summarize(comparison):
+    """Return the results of a dircmp or TreeComparison as sorted tuples."""
+    result = []
+    nodes = [comparison]
+    while nodes:
+        node = nodes.pop()
+        result.append(
+            (node.left, node.right)
+            + tuple(
+                tuple(sorted(getattr(node, name)))
+                for name in [
+                    "left_only",
+                    "right_only",
+                    "same_files",
+                    "diff_files",
+                    "funny_files",
+                    "common_dirs",
+                    "common_funny",
+                ]
+            )
+        )
+        nodes.extend(node.subdirs.values())
+    return sorted(result)
+
+
+def stdlib_dircmp(left, right):
+    filecmp.clear_cache()
+    return summarize(filecmp.dircmp(left, right))
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--root", help="directory for the trees, kept to reuse in the next run"
+    )
+    parser.add_argument(
+        "--drop-caches",
+        action="store_true",
+        help="empty the page cache before each run (Linux, needs root)",
+    )
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp()
+    marker = "{}.complete-{}".format(root.rstrip("/"), args.files)
+    if not (args.root and os.path.exists(marker)):
+        start = time.perf_counter()
+        make_trees(root, args.files)
+        print("trees written in {:.0f} s".format(time.perf_counter() - start))
+        if args.root:
+            open(marker, "w").close()
+    left = os.path.join(root, "left")
+    right = os.path.join(root, "right")
+    cache_dir = tempfile.mkdtemp()
+    cache = open_cache(os.path.join(cache_dir, "comparisons.db"))
+
+    def tree(**kwargs):
+        return lambda: summarize(compare_trees(left, right, **kwargs))
+
+    try:
+        runs = [
+            ("filecmp.dircmp", lambda: stdlib_dircmp(left, right)),
+            ("compare_trees, 1 thread", tree(workers=1)),
+            (
+                "compare_trees, {} threads".format(args.workers),
+                tree(workers=args.workers),
+            ),
+            ("  with a new cache", tree(workers=args.workers, cache=cache)),
+            ("  with the cache up to date", tree(workers=args.workers, cache=cache)),
+        ]
+        template = "{:<30} {:>8}"
+        print(template.format("", "seconds"))
+        print(template.format("-" * 30, "-" * 8))
+        results = []
+        for name, func in runs:
+            if args.drop_caches:
+                drop_caches()
+            start = time.perf_counter()
+            results.append(func())
+            elapsed = time.perf_counter() - start
+            print(template.format(name, "{:.1f}".format(elapsed)))
+        assert all(result == results[0] for result in results)
+        print()
+        print(
+            "{} directories, {} differing files".format(
+                len(results[0]), sum(len(node[5]) for node in results[0])
+            )
+        )
+    finally:
+        cache.close()
+        shutil.rmtree(cache_dir)
+        if not args.root:
+            shutil.rmtree(root)
@@ -0,0 +1,200 @@
+# shutil_copytree_parallel.py
+import collections
+import concurrent.futures
+import errno
+import os
+import shutil
+import stat
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# The FICLONE ioctl from linux/fs.h, which makes a file share the
+# blocks of another on file systems such as Btrfs and XFS.
+FICLONE = 0x40049409
+
+# Small files are copied in batches, so a pool task is not created for
+# every file. A batch is sent to the pool when it holds BATCH_SIZE
+# files or BATCH_BYTES bytes.
+BATCH_SIZE = 32
+BATCH_BYTES = 8 * 1024 * 1024
+
+# Errors that mean a fast path is not supported for this pair of files.
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL}
+
+# Devices where cloning has failed, so it is not tried again.
+_no_clone = set()
+
+
+def copy_file(src, dst):
+    """Copy the data of src to dst, returning the method that was used.
+
+    The methods are tried from fastest to slowest: cloning the file
+    with FICLONE, which copies no data at all, os.copy_file_range(),
+    which copies it inside the kernel, and finally shutil.copyfile().
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        dev = os.fstat(fdst.fileno()).st_dev
+        if size and fcntl is not None and dev not in _no_clone:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return "clone"
+            except OSError as err:
+                if err.errno not in UNSUPPORTED:
+                    raise
+                _no_clone.add(dev)
+        if size and hasattr(os, "copy_file_range"):
+            copied = 0
+            try:
+                while copied < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if not n:
+                        break  # the file was truncated while copying
+                    copied += n
+                return "copy_file_range"
+            except OSError as err:
+                if copied or err.errno not in UNSUPPORTED:
+                    raise
+    shutil.copyfile(src, dst)
+    return "copyfile"
+
+
+def copy_batch(files):
+    """Copy the data and then the metadata of each (src, dst, size).
+
+    Return (src, dst, size, error) for each file, where error is the
+    exception that stopped it from being copied or None.
+    """
+    results = []
+    for src, dst, size in files:
+        try:
+            copy_file(src, dst)
+            shutil.copystat(src, dst)
+            results.append((src, dst, size, None))
+        except OSError as err:
+            results.append((src, dst, size, err))
+    return results
+
+
+def copytree_parallel(
+    src, dst, symlinks=False, ignore=None, dirs_exist_ok=False, workers=8, progress=None
+):
+    """Copy a directory tree like shutil.copytree(), using a pool of threads.
+
+    The calling thread walks src and creates the directories and links,
+    and the pool copies the files, in batches. Each file's permissions
+    and times are copied once its data is written, and those of the
+    directories after all of the files, so adding files does not change
+    them. No more than 4 batches per thread are waiting at any time.
+
+    progress is called in the calling thread with the source, the
+    destination, and the size of each file that has been copied. Errors
+    are collected and raised together as shutil.Error at the end.
+    """
+    errors = []
+    directories = []
+    pending = collections.deque()
+    batch = []
+    batch_bytes = 0
+
+    def finish(limit):
+        """Wait until at most limit batches are pending."""
+        while len(pending) > limit:
+            for src_name, dst_name, size, error in pending.popleft().result():
+                if error is not None:
+                    errors.append((src_name, dst_name, str(error)))
+                elif progress is not None:
+                    progress(src_name, dst_name, size)
+
+    def flush():
+        nonlocal batch, batch_bytes
+        if batch:
+            pending.append(pool.submit(copy_batch, batch))
+            batch = []
+            batch_bytes = 0
+            finish(workers * 4)
+
+    os.makedirs(dst, exist_ok=dirs_exist_ok)
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        stack = [(src, dst)]
+        while stack:
+            src_dir, dst_dir = stack.pop()
+            directories.append((src_dir, dst_dir))
+            try:
+                with os.scandir(src_dir) as it:
+                    entries = list(it)
+            except OSError as err:
+                errors.append((src_dir, dst_dir, str(err)))
+                continue
+            ignored = set()
+            if ignore is not None:
+                ignored = ignore(os.fspath(src_dir), [e.name for e in entries])
+            for entry in entries:
+                if entry.name in ignored:
+                    continue
+                src_name = entry.path
+                dst_name = os.path.join(dst_dir, entry.name)
+                try:
+                    if symlinks and entry.is_symlink():
+                        os.symlink(os.readlink(src_name), dst_name)
+                        shutil.copystat(src_name, dst_name, follow_symlinks=False)
+                    elif entry.is_dir():
+                        os.makedirs(dst_name, exist_ok=dirs_exist_ok)
+                        stack.append((src_name, dst_name))
+                    else:
+                        st = entry.stat()
+                        if not stat.S_ISREG(st.st_mode):
+                            # Reading a named pipe or a device would block
+                            # or never end, so report it as copytree() does.
+                            if stat.S_ISFIFO(st.st_mode):
+                                message = "`{}` is a named pipe"
+                            else:
+                                message = "`{}` is not a regular file"
+                            raise shutil.SpecialFileError(message.format(src_name))
+                        size = st.st_size
+                        batch.append((src_name, dst_name, size))
+                        batch_bytes += size
+                        if len(batch) >= BATCH_SIZE or batch_bytes >= BATCH_BYTES:
+                            flush()
+                except OSError as err:
+                    errors.append((src_name, dst_name, str(err)))
+        flush()
+        finish(0)
+
+    for src_dir, dst_dir in reversed(directories):
+        try:
+            shutil.copystat(src_dir, dst_dir)
+        except OSError as err:
+            errors.append((src_dir, dst_dir, str(err)))
+    if errors:
+        raise shutil.Error(errors)
+    return dst
+
+
+if __name__ == "__main__":
+    import glob
+    import pprint
+
+    copied = collections.Counter()
+
+    def count_copies(src, dst, size):
+        copied["files"] += 1
+        copied["bytes"] += size
+
+    print("BEFORE:")
+    pprint.pprint(glob.glob("/tmp/example/*"))
+    print()
+
+    copytree_parallel(
+        "../shutil",
+        "/tmp/example",
+        ignore=shutil.ignore_patterns("*.py"),
+        progress=count_copies,
+    )
+    print("copied {files} files, {bytes} bytes".format(**copied))
+
+    print("\nAFTER:")
+    pprint.pprint(glob.glob("/tmp/example/*"))
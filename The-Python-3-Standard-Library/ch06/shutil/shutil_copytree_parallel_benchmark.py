@@ -0,0 +1,100 @@
+# shutil_copytree_parallel_benchmark.py
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from shutil_copytree_parallel import copy_file, copytree_parallel
+
+
+def make_tree(root, count, size, seed=0):
+    """Write count files of about size bytes, in directories of 1000."""
+    rng = random.Random(seed)
+    pool = os.urandom(max(2 * size, 16 * 1024 * 1024))
+    for i in range(count):
+        directory = os.path.join(root, "dir{:03d}".format(i // 1000))
+        if i % 1000 == 0:
+            os.makedirs(directory)
+        length = rng.randint(size // 2, size * 3 // 2)
+        offset = rng.randrange(len(pool) - length)
+        with open(os.path.join(directory, "file{}.bin".format(i)), "wb") as f:
+            f.write(pool[offset : offset + length])
+
+
+def drop_caches():
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small-files", type=int, default=50000)
+    parser.add_argument("--large-files", type=int, default=16)
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=1, help="report the best run")
+    parser.add_argument(
+        "--drop-caches",
+        action="store_true",
+        help="empty the page cache before each run (Linux, needs root)",
+    )
+    args = parser.parse_args()
+
+    trees = [
+        ("small files", args.small_files, 4 * 1024),
+        ("large files", args.large_files, 64 * 1024 * 1024),
+    ]
+    copiers = [("shutil.copytree", shutil.copytree)]
+    workers = 1
+    while workers <= args.max_workers:
+        copiers.append(
+            (
+                "parallel, {} thread{}".format(workers, "s" if workers > 1 else ""),
+                lambda s, d, w=workers: copytree_parallel(s, d, workers=w),
+            )
+        )
+        workers *= 4
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        method = os.path.join(tmpdir, "method")
+        with open(method, "wb") as f:
+            f.write(b"x")
+        print("fast path:", copy_file(method, method + ".copy"))
+        print("times include writing the copies to disk with os.sync()")
+
+        for label, count, size in trees:
+            src = os.path.join(tmpdir, "src")
+            dst = os.path.join(tmpdir, "dst")
+            make_tree(src, count, size)
+            total = sum(
+                os.path.getsize(os.path.join(d, f))
+                for d, _, files in os.walk(src)
+                for f in files
+            )
+            print()
+            print("{}: {} files, {:.0f} MB".format(label, count, total / 2**20))
+            template = "{:<22} {:>8} {:>8} {:>8}"
+            print(template.format("", "seconds", "files/s", "MB/s"))
+            print(template.format("-" * 22, "-" * 8, "-" * 8, "-" * 8))
+            for name, copytree in copiers:
+                elapsed = None
+                for i in range(args.repeat):
+                    os.sync()
+                    if args.drop_caches:
+                        drop_caches()
+                    start = time.perf_counter()
+                    copytree(src, dst)
+                    os.sync()
+                    run = time.perf_counter() - start
+                    elapsed = run if elapsed is None else min(elapsed, run)
+                    shutil.rmtree(dst)
+                print(
+                    template.format(
+                        name,
+                        "{:.2f}".format(elapsed),
+                        "{:.0f}".format(count / elapsed),
+                        "{:.0f}".format(total / elapsed / 2**20),
+                    )
+                )
+            shutil.rmtree(src)
@@ -0,0 +1,355 @@
+# sqlite3_aggregates.py
+import bisect
+import collections
+import heapq
+import itertools
+import json
+import math
+import operator
+import sqlite3
+
+db_filename = "todo.db"
+
+MASK64 = 2**64 - 1
+
+
+def hash64(value):
+    """Spread the bits of hash(value) over 64 bits.
+
+    hash() of a small integer is the integer itself, so its high bits
+    would all be 0 without the mixing steps of SplitMix64.
+    """
+    h = hash(value) & MASK64
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & MASK64
+    return h ^ (h >> 31)
+
+
+class Mode:
+    """The most common value. Ties go to the value seen first."""
+
+    def __init__(self):
+        self.counter = collections.Counter()
+
+    def step(self, value):
+        if value is not None:
+            self.counter[value] += 1
+
+    def inverse(self, value):
+        if value is not None:
+            self.counter[value] -= 1
+            if not self.counter[value]:
+                del self.counter[value]
+
+    def value(self):
+        if not self.counter:
+            return None
+        return self.counter.most_common(1)[0][0]
+
+    finalize = value
+
+
+def sqlite_order(value):
+    """Sort key putting values of different types in SQLite's order.
+
+    Numbers come before text, and text before blobs.
+    """
+    if isinstance(value, str):
+        return (1, value)
+    if isinstance(value, bytes):
+        return (2, value)
+    return (0, value)
+
+
+class Median:
+    """The exact median, the mean of the middle two for an even count.
+
+    Values of different types are ordered as SQLite orders them. When
+    the middle two are not both numbers, the lower one is the median.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.is_sorted = False
+
+    def step(self, value):
+        if value is None:
+            return
+        if self.is_sorted:
+            # Used as a window function, the values are kept sorted
+            # once value() has been called, so each row costs one insort
+            # instead of sorting the whole frame again.
+            bisect.insort(self.values, value, key=sqlite_order)
+        else:
+            self.values.append(value)
+
+    def _sort(self):
+        if not self.is_sorted:
+            try:
+                # Values of a single type sort faster without a key.
+                self.values.sort()
+            except TypeError:
+                self.values.sort(key=sqlite_order)
+            self.is_sorted = True
+
+    def inverse(self, value):
+        if value is not None:
+            self._sort()
+            key = sqlite_order(value)
+            del self.values[bisect.bisect_left(self.values, key, key=sqlite_order)]
+
+    def value(self):
+        if not self.values:
+            return None
+        self._sort()
+        middle = len(self.values) // 2
+        low, high = self.values[middle - 1], self.values[middle]
+        if len(self.values) % 2:
+            return high
+        if isinstance(low, (str, bytes)) or isinstance(high, (str, bytes)):
+            return low
+        return (low + high) / 2
+
+    finalize = value
+
+
+class ApproxCountDistinct:
+    """Estimate the number of distinct values with HyperLogLog.
+
+    Each value is hashed, the first PRECISION bits of the hash pick one
+    of 2**PRECISION registers, and the register keeps the longest run of
+    leading zeros seen in the rest, plus one. The standard error is
+    1.04 / sqrt(2**PRECISION), 0.8% with the 16 KB of registers used here.
+    """
+
+    PRECISION = 14
+
+    def __init__(self):
+        self.registers = bytearray(1 << self.PRECISION)
+
+    def step(self, value):
+        if value is None:
+            return
+        h = hash64(value)
+        index = h >> (64 - self.PRECISION)
+        rest = h & ((1 << (64 - self.PRECISION)) - 1)
+        rank = 65 - self.PRECISION - rest.bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def finalize(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small sets.
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class ApproxQuantile:
+    """Estimate the q quantile of the values with a merging t-digest.
+
+    Values are collected in a buffer, and when it is full they are
+    sorted and merged into a list of centroids, each a mean and the
+    number of values it stands for. The k1 scale function of the
+    t-digest keeps the centroids near the ends of the distribution
+    small, so extreme quantiles are accurate. No more than about
+    COMPRESSION centroids are kept.
+    """
+
+    COMPRESSION = 200
+    BUFFER_SIZE = 5000
+
+    def __init__(self):
+        self.means = []
+        self.weights = []
+        self.buffer = []
+        self.q = None
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def step(self, value, q):
+        if value is None:
+            return
+        if self.q is None:
+            if not 0 <= q <= 1:
+                raise ValueError("quantile must be between 0 and 1")
+            self.q = q
+        self.buffer.append(value)
+        if len(self.buffer) >= self.BUFFER_SIZE:
+            self._merge()
+
+    def _limit(self, q):
+        """Return the q at which a centroid starting at q must end."""
+        scale = self.COMPRESSION / (2 * math.pi)
+        k = scale * math.asin(2 * q - 1) + 1
+        if k >= scale * math.pi / 2:
+            return 1.0
+        return (math.sin(k / scale) + 1) / 2
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        self.minimum = min(self.minimum, min(self.buffer))
+        self.maximum = max(self.maximum, max(self.buffer))
+        values = self.means + self.buffer
+        counts = self.weights + [1] * len(self.buffer)
+        self.buffer = []
+        order = sorted(range(len(values)), key=values.__getitem__)
+        values = list(map(values.__getitem__, order))
+        counts = list(map(counts.__getitem__, order))
+        cumulative = list(itertools.accumulate(counts))
+        total = cumulative[-1]
+        # Each centroid takes all of the points up to its limit, found
+        # with bisect, so the loop runs once per centroid, not per value.
+        means = []
+        weights = []
+        start = 0
+        done = 0
+        while start < len(values):
+            end = bisect.bisect_right(cumulative, total * self._limit(done / total))
+            end = max(end, start + 1)
+            weight = cumulative[end - 1] - done
+            products = map(operator.mul, values[start:end], counts[start:end])
+            means.append(sum(products) / weight)
+            weights.append(weight)
+            done = cumulative[end - 1]
+            start = end
+        self.means = means
+        self.weights = weights
+
+    def finalize(self):
+        self._merge()
+        if not self.means:
+            return None
+        total = sum(self.weights)
+        target = self.q * total
+        # Each centroid is placed at the middle of the values it covers,
+        # and the estimate is interpolated between them.
+        previous_mean, previous_center = self.minimum, 0.0
+        seen = 0
+        for mean, weight in zip(self.means, self.weights):
+            center = seen + weight / 2
+            if target < center:
+                span = center - previous_center
+                if not span:
+                    return mean
+                fraction = (target - previous_center) / span
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_mean, previous_center = mean, center
+            seen += weight
+        span = total - previous_center
+        fraction = (target - previous_center) / span if span else 1
+        return previous_mean + (self.maximum - previous_mean) * fraction
+
+
+def encode_blob(value):
+    """Give BLOB values to json.dumps() as text, as hex() does in SQL."""
+    if isinstance(value, bytes):
+        return value.hex().upper()
+    raise TypeError("cannot encode {!r} as JSON".format(type(value).__name__))
+
+
+class TopK:
+    """The k most common values, as a JSON list of [value, count] pairs.
+
+    The Space-Saving algorithm keeps CAPACITY_FACTOR * k counters. When a
+    new value arrives and they are all in use, the smallest counter is
+    given to the new value, keeping its count, so counts can be too high
+    but by no more than the count that was taken over. Any value making
+    up more than 1 / (CAPACITY_FACTOR * k) of the rows is always found.
+    BLOB values are given in the JSON as hex strings.
+    """
+
+    CAPACITY_FACTOR = 10
+
+    def __init__(self):
+        self.counts = {}
+        # Entries are (count, sequence number, value). The sequence
+        # number breaks ties, so values of different types, which
+        # cannot be compared, never are.
+        self.heap = []
+        self.sequence = itertools.count()
+        self.k = None
+
+    def step(self, value, k):
+        if value is None:
+            return
+        if self.k is None:
+            if k < 1:
+                raise ValueError("k must be at least 1")
+            self.k = k
+            self.capacity = k * self.CAPACITY_FACTOR
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.capacity:
+            counts[value] = 1
+            heapq.heappush(self.heap, (1, next(self.sequence), value))
+        else:
+            # The heap is only updated when a counter is taken over, so
+            # entries can be out of date. Pop until one is current.
+            heap = self.heap
+            while True:
+                count, _, smallest = heap[0]
+                if counts[smallest] == count:
+                    break
+                entry = (counts[smallest], next(self.sequence), smallest)
+                heapq.heapreplace(heap, entry)
+            del counts[smallest]
+            counts[value] = count + 1
+            heapq.heapreplace(heap, (count + 1, next(self.sequence), value))
+
+    def finalize(self):
+        if self.k is None:
+            return None
+        top = heapq.nlargest(self.k, self.counts.items(), key=lambda item: item[1])
+        return json.dumps(top, default=encode_blob)
+
+
+def register(conn):
+    """Add the aggregates to conn.
+
+    mode() and median() can also be used as window functions, when the
+    sqlite3 module supports them.
+    """
+    for name, cls in [("mode", Mode), ("median", Median)]:
+        if hasattr(conn, "create_window_function"):
+            conn.create_window_function(name, 1, cls)
+        else:
+            conn.create_aggregate(name, 1, cls)
+    conn.create_aggregate("approx_count_distinct", 1, ApproxCountDistinct)
+    conn.create_aggregate("approx_quantile", 2, ApproxQuantile)
+    conn.create_aggregate("top_k", 2, TopK)
+
+
+if __name__ == "__main__":
+    with sqlite3.connect(db_filename) as conn:
+        register(conn)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+        select mode(deadline), median(priority),
+               approx_count_distinct(details),
+               approx_quantile(id, 0.5), top_k(status, 2)
+        from task where project = 'pymotw'
+        """
+        )
+        names = [d[0] for d in cursor.description]
+        for name, value in zip(names, cursor.fetchone()):
+            print("{:<32} {}".format(name, value))
+
+        print()
+        cursor.execute(
+            """
+        select id, priority,
+               median(priority) over (order by id rows 1 preceding)
+        from task where project = 'pymotw'
+        order by id
+        """
+        )
+        for row in cursor.fetchall():
+            print("{:2d} {:d} {}".format(*row))
@@ -0,0 +1,174 @@
+# sqlite3_aggregates_benchmark.py
+import argparse
+import json
+import random
+import sqlite3
+import time
+import tracemalloc
+
+import sqlite3_aggregates
+
+
+def create_table(conn, count, seed=0):
+    """Fill an event table with count rows.
+
+    user_id is spread evenly over count / 3 users, category follows a
+    long-tailed distribution, and amount a log-normal one.
+    """
+    rng = random.Random(seed)
+    users = max(count // 3, 1)
+    conn.execute("create table event (user_id integer, category text, amount real)")
+    conn.executemany(
+        "insert into event values (?, ?, ?)",
+        (
+            (
+                rng.randrange(users),
+                "category{}".format(int(rng.paretovariate(1.0))),
+                rng.lognormvariate(3, 1),
+            )
+            for _ in range(count)
+        ),
+    )
+
+
+def timed(conn, sql, trace=False):
+    """Return the seconds taken to run sql, its result, and peak memory."""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    (result,) = conn.execute(sql).fetchone()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, result, peak
+
+
+def relative_error(estimate, exact):
+    return "{:.3%}".format(abs(estimate - exact) / exact)
+
+
+def quantile_error(conn, rows):
+    """Return a function giving the relative error of a quantile, and
+    the fraction of the rows below it."""
+
+    def error(estimate, exact):
+        (below,) = conn.execute(
+            "select count(*) from event where amount < ?", (estimate,)
+        ).fetchone()
+        return "{}, q={:.4f}".format(relative_error(estimate, exact), below / rows)
+
+    return error
+
+
+def top_k_error(estimate, exact):
+    """Count the values of exact found in estimate, and their largest
+    error in count."""
+    found = dict(json.loads(estimate))
+    expected = dict(json.loads(exact))
+    worst = max(
+        abs(found[value] - count) / count
+        for value, count in expected.items()
+        if value in found
+    )
+    common = len(found.keys() & expected.keys())
+    return "{}/{}, {:.2%}".format(common, len(expected), worst)
+
+
+def mode_error(estimate, exact):
+    [(value, count)] = json.loads(exact)
+    return "same" if estimate == value else "differs"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="measure the peak memory used in Python, which slows the queries",
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    start = time.perf_counter()
+    create_table(conn, args.rows)
+    elapsed = time.perf_counter() - start
+    print("{:,} rows created in {:.0f} s".format(args.rows, elapsed))
+    sqlite3_aggregates.register(conn)
+
+    top = """
+    select json_group_array(json_array(category, n)) from (
+        select category, count(*) as n from event
+        group by category order by n desc limit {}
+    )
+    """
+    offset = "select amount from event order by amount limit 1 offset {}"
+
+    # (label, the query, the SQL giving the exact answer, error function)
+    comparisons = [
+        (
+            "approx_count_distinct",
+            "select approx_count_distinct(user_id) from event",
+            "select count(distinct user_id) from event",
+            relative_error,
+        ),
+        (
+            "median",
+            "select median(amount) from event",
+            None,
+            None,
+        ),
+        (
+            "approx_quantile, 0.5",
+            "select approx_quantile(amount, 0.5) from event",
+            "select median(amount) from event",
+            quantile_error(conn, args.rows),
+        ),
+        (
+            "approx_quantile, 0.99",
+            "select approx_quantile(amount, 0.99) from event",
+            offset.format(int(args.rows * 0.99)),
+            quantile_error(conn, args.rows),
+        ),
+        (
+            "approx_quantile, 0.999",
+            "select approx_quantile(amount, 0.999) from event",
+            offset.format(int(args.rows * 0.999)),
+            quantile_error(conn, args.rows),
+        ),
+        (
+            "mode",
+            "select mode(category) from event",
+            top.format(1),
+            mode_error,
+        ),
+        (
+            "top_k, 10",
+            "select top_k(category, 10) from event",
+            top.format(10),
+            top_k_error,
+        ),
+    ]
+    template = "{:<23} {:>8} {:>11} {:>8} {:>18}"
+    print(template.format("", "seconds", "memory", "exact s", "error"))
+    print(template.format("-" * 23, "-" * 8, "-" * 11, "-" * 8, "-" * 18))
+    exact_results = {}
+    for name, sql, exact_sql, error in comparisons:
+        seconds, result, peak = timed(conn, sql, args.memory)
+        exact_seconds = ""
+        if exact_sql is not None:
+            if exact_sql not in exact_results:
+                exact_results[exact_sql] = timed(conn, exact_sql)
+            elapsed, exact, _ = exact_results[exact_sql]
+            exact_seconds = "{:.1f}".format(elapsed)
+        print(
+            template.format(
+                name,
+                "{:.1f}".format(seconds),
+                "{:,.0f} KB".format(peak / 1024) if args.memory else "",
+                exact_seconds,
+                error(result, exact) if error else "",
+            )
+        )
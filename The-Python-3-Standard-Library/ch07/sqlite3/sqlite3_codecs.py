@@ -0,0 +1,320 @@
+# sqlite3_codecs.py
+import array
+import pickle
+import sqlite3
+import struct
+
+
+class PickleCodec:
+    """Store any object with pickle, as in sqlite3_custom_type.py."""
+
+    def encode(self, obj):
+        return pickle.dumps(obj)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+
+class StructCodec:
+    """Store the fields of cls in a fixed layout with struct.
+
+    fmt has one code for each name in fields, and objects are created
+    again by calling cls with the values in the same order.
+    """
+
+    def __init__(self, cls, fmt, fields):
+        self.cls = cls
+        self.fields = fields
+        self.struct = struct.Struct("<" + fmt)
+
+    def encode(self, obj):
+        return self.struct.pack(*[getattr(obj, name) for name in self.fields])
+
+    def decode(self, data):
+        return self.cls(*self.struct.unpack(data))
+
+
+# Type tags of VarintCodec. Integers from 0 to 127 are stored as a
+# single byte holding the value, so the tags start at 128.
+NONE, FALSE, TRUE, INT, FLOAT, STR, BYTES, LIST, DICT = range(128, 137)
+
+_double = struct.Struct("<d")
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _write_value(out, value):
+    if value is None:
+        out.append(NONE)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif isinstance(value, int):
+        if 0 <= value < 128:
+            out.append(value)
+        else:
+            out.append(INT)
+            # Zigzag encoding keeps small negative numbers short.
+            _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out.append(FLOAT)
+        out += _double.pack(value)
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        out.append(STR)
+        _write_varint(out, len(encoded))
+        out += encoded
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(BYTES)
+        _write_varint(out, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    elif isinstance(value, dict):
+        out.append(DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _write_value(out, key)
+            _write_value(out, item)
+    else:
+        raise TypeError("cannot encode {!r}".format(type(value).__name__))
+
+
+def _read_value(data, pos):
+    tag = data[pos]
+    pos += 1
+    if tag < 128:
+        return tag, pos
+    if tag == INT:
+        n, pos = _read_varint(data, pos)
+        return (n >> 1) ^ -(n & 1), pos
+    if tag == FLOAT:
+        return _double.unpack_from(data, pos)[0], pos + 8
+    if tag in (STR, BYTES):
+        size, pos = _read_varint(data, pos)
+        value = data[pos : pos + size]
+        return (value.decode("utf-8") if tag == STR else value), pos + size
+    if tag == LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == DICT:
+        count, pos = _read_varint(data, pos)
+        items = {}
+        for _ in range(count):
+            key, pos = _read_value(data, pos)
+            items[key], pos = _read_value(data, pos)
+        return items, pos
+    if tag == NONE:
+        return None, pos
+    if tag in (TRUE, FALSE):
+        return tag == TRUE, pos
+    raise ValueError("unknown type tag {}".format(tag))
+
+
+class VarintCodec:
+    """Store the fields of cls in a compact self-describing format.
+
+    Like MessagePack, each value starts with a tag byte giving its type,
+    integers are stored in as few bytes as they need, and small ones in
+    the tag byte itself. Fields may hold None, bool, int, float, str,
+    bytes, and lists and dicts of them.
+    """
+
+    def __init__(self, cls, fields):
+        self.cls = cls
+        self.fields = fields
+
+    def encode(self, obj):
+        out = bytearray()
+        for name in self.fields:
+            _write_value(out, getattr(obj, name))
+        return bytes(out)
+
+    def decode(self, data):
+        values = []
+        pos = 0
+        for _ in self.fields:
+            value, pos = _read_value(data, pos)
+            values.append(value)
+        return self.cls(*values)
+
+
+class ArrayCodec:
+    """Store a sequence of numbers as the bytes of an array.array.
+
+    Values are decoded as an array of the same typecode, which uses much
+    less memory than a list and supports the same operations.
+    """
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+
+    def encode(self, values):
+        if not isinstance(values, array.array) or values.typecode != self.typecode:
+            values = array.array(self.typecode, values)
+        return values.tobytes()
+
+    def decode(self, data):
+        values = array.array(self.typecode)
+        values.frombytes(data)
+        return values
+
+
+_missing = object()
+
+
+class LazyValue:
+    """Hold the stored bytes of a value, and decode them when needed.
+
+    Attributes, items, iteration, len(), truth testing, str() and
+    equality are passed to the decoded value, which is decoded only
+    once. Setting an attribute or an item changes the decoded value,
+    which is encoded again when the LazyValue is saved. A LazyValue
+    saved back to the database without being decoded is stored as the
+    same bytes, so copying rows costs nothing to convert.
+    """
+
+    __slots__ = ("_data", "_codec", "_value")
+
+    def __init__(self, data, codec):
+        self._data = data
+        self._codec = codec
+        self._value = _missing
+
+    def get(self):
+        """Return the decoded value."""
+        if self._value is _missing:
+            self._value = self._codec.decode(self._data)
+        return self._value
+
+    def __getattr__(self, name):
+        if name in LazyValue.__slots__:
+            # Not set yet, as when copy or pickle builds a new instance.
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        if name in LazyValue.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.get(), name, value)
+
+    def __getitem__(self, key):
+        return self.get()[key]
+
+    def __setitem__(self, key, value):
+        self.get()[key] = value
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __len__(self):
+        return len(self.get())
+
+    def __bool__(self):
+        return bool(self.get())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyValue):
+            other = other.get()
+        return self.get() == other
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Copies start again from the bytes, as they would be stored,
+        # since the marker for a value not decoded yet cannot be copied.
+        return LazyValue, (_adapt_lazy(self), self._codec)
+
+    def __str__(self):
+        return str(self.get())
+
+    def __repr__(self):
+        if self._value is _missing:
+            return "<LazyValue {} bytes>".format(len(self._data))
+        return "<LazyValue {}>".format(self._value)
+
+
+def _adapt_lazy(value):
+    if value._value is _missing:
+        return value._data
+    return value._codec.encode(value._value)
+
+
+sqlite3.register_adapter(LazyValue, _adapt_lazy)
+
+
+def register(name, cls, codec, lazy=False):
+    """Use codec for objects of type cls, and for columns of type name.
+
+    Like register_converter(), the converter only applies to connections
+    opened with detect_types. With lazy=True, values read from the
+    database are returned as LazyValue objects.
+    """
+    if cls is not None:
+        sqlite3.register_adapter(cls, codec.encode)
+    if lazy:
+        sqlite3.register_converter(name, lambda data: LazyValue(data, codec))
+    else:
+        sqlite3.register_converter(name, codec.decode)
+
+
+class MyObj:
+
+    def __init__(self, arg):
+        self.arg = arg
+
+    def __str__(self):
+        return "MyObj({!r})".format(self.arg)
+
+
+if __name__ == "__main__":
+    register("MyObj", MyObj, VarintCodec(MyObj, ["arg"]), lazy=True)
+
+    to_save = [
+        (MyObj("this is a value to save"),),
+        (MyObj(42),),
+    ]
+
+    with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as conn:
+        conn.execute(
+            """
+        create table obj (
+            id    integer primary key autoincrement not null,
+            data  MyObj
+        )
+        """
+        )
+        cursor = conn.cursor()
+        cursor.executemany("insert into obj (data) values (?)", to_save)
+
+        cursor.execute("select id, data, length(data) from obj")
+        for obj_id, obj, size in cursor.fetchall():
+            print("Retrieved", obj_id, repr(obj), "from", size, "bytes")
+            print("  arg is", repr(obj.arg))
+            print("  now", repr(obj))
+            print()
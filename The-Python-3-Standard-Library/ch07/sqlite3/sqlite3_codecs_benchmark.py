@@ -0,0 +1,140 @@
+# sqlite3_codecs_benchmark.py
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlite3_codecs import (
+    ArrayCodec,
+    PickleCodec,
+    StructCodec,
+    VarintCodec,
+    register,
+)
+
+
+class Reading:
+    def __init__(self, sensor, timestamp, value):
+        self.sensor = sensor
+        self.timestamp = timestamp
+        self.value = value
+
+
+class Vector(list):
+    pass
+
+
+def make_readings(count, seed=0):
+    rng = random.Random(seed)
+    start = 1600000000
+    return [
+        (Reading(rng.randrange(1000), start + i, rng.gauss(20, 5)),)
+        for i in range(count)
+    ]
+
+
+def make_vectors(count, size=32, seed=0):
+    rng = random.Random(seed)
+    return [(Vector(rng.random() for _ in range(size)),) for _ in range(count)]
+
+
+def run(directory, type_name, rows, use):
+    """Insert rows into a new database and read them back.
+
+    Return the seconds taken to insert, to read each value by selecting
+    it and passing it to use, to select the values without using them,
+    and the size of the database.
+    The garbage collector is turned off while timing, as timeit does,
+    since the rows held in memory would make each collection slow.
+    """
+    filename = os.path.join(directory, "{}.db".format(type_name))
+    conn = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute(
+        "create table data (id integer primary key, value {})".format(type_name)
+    )
+    gc.disable()
+    start = time.perf_counter()
+    with conn:
+        conn.executemany("insert into data (value) values (?)", rows)
+    insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (value,) in conn.execute("select value from data"):
+        use(value)
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (value,) in conn.execute("select value from data"):
+        pass
+    select = time.perf_counter() - start
+    gc.enable()
+    conn.close()
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    return insert, read, select, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--vectors", type=int, default=200000)
+    args = parser.parse_args()
+
+    def use_reading(reading):
+        return reading.value
+
+    def use_vector(vector):
+        return vector[0]
+
+    reading_fields = ["sensor", "timestamp", "value"]
+    cases = [
+        (
+            "Reading",
+            Reading,
+            make_readings(args.rows),
+            use_reading,
+            [
+                ("pickle", PickleCodec(), False),
+                ("struct", StructCodec(Reading, "Hqd", reading_fields), False),
+                ("varint", VarintCodec(Reading, reading_fields), False),
+                ("struct, lazy", StructCodec(Reading, "Hqd", reading_fields), True),
+                ("varint, lazy", VarintCodec(Reading, reading_fields), True),
+            ],
+        ),
+        (
+            "Vector",
+            Vector,
+            make_vectors(args.vectors),
+            use_vector,
+            [
+                ("pickle", PickleCodec(), False),
+                ("array", ArrayCodec("d"), False),
+                ("array, lazy", ArrayCodec("d"), True),
+            ],
+        ),
+    ]
+
+    template = "{:<8} {:<13} {:>10} {:>10} {:>10} {:>9} {:>6}"
+    print(template.format("", "", "insert/s", "read/s", "select/s", "bytes/row", "MB"))
+    print(template.format("-" * 8, "-" * 13, *["-" * 10] * 3, "-" * 9, "-" * 6))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for type_label, cls, rows, use, codecs in cases:
+            for codec_label, codec, lazy in codecs:
+                type_name = "{}{}".format(type_label, codec_label.replace(", ", "_"))
+                register(type_name, cls, codec, lazy=lazy)
+                insert, read, select, size = run(tmpdir, type_name, rows, use)
+                count = len(rows)
+                print(
+                    template.format(
+                        type_label,
+                        codec_label,
+                        "{:,.0f}".format(count / insert),
+                        "{:,.0f}".format(count / read),
+                        "{:,.0f}".format(count / select),
+                        "{:.0f}".format(size / count),
+                        "{:.1f}".format(size / 2**20),
+                    )
+                )
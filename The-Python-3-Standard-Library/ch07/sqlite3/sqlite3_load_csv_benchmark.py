@@ -0,0 +1,112 @@
+# sqlite3_load_csv_benchmark.py
+import argparse
+import csv
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+INDEXES = """
+create index task_deadline on task (deadline);
+create index task_project_priority on task (project, priority);
+"""
+
+
+def write_tasks(filename, count, seed=0):
+    """Write count random tasks in the format of tasks.csv."""
+    rng = random.Random(seed)
+    verbs = ["write about", "revise", "review", "test", "publish", "outline"]
+    first = datetime.date(2016, 1, 1).toordinal()
+    dates = [
+        datetime.date.fromordinal(first + i).isoformat() for i in range(10 * 365)
+    ]
+    with open(filename, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["deadline", "project", "priority", "details"])
+        for i in range(count):
+            writer.writerow(
+                [
+                    rng.choice(dates),
+                    "project{}".format(rng.randrange(100)),
+                    rng.randint(1, 3),
+                    "{} module {}".format(rng.choice(verbs), i),
+                ]
+            )
+
+
+def create_db(directory):
+    """Create an empty todo.db in directory, with indexes on task."""
+    db = os.path.join(directory, "todo.db")
+    if os.path.exists(db):
+        os.remove(db)
+    with open(os.path.join(HERE, "todo_schema.sql"), "rt") as f:
+        schema = f.read()
+    with sqlite3.connect(db) as conn:
+        conn.executescript(schema + INDEXES)
+    conn.close()
+    return db
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument(
+        "--root", help="directory for tasks.csv, kept to reuse in the next run"
+    )
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp()
+    data = os.path.join(root, "tasks-{}.csv".format(args.rows))
+    if not os.path.exists(data):
+        start = time.perf_counter()
+        write_tasks(data + ".tmp", args.rows)
+        os.replace(data + ".tmp", data)
+        print("{} written in {:.0f} s".format(data, time.perf_counter() - start))
+    print(
+        "{:,} rows, {:.0f} MB of CSV, 2 indexes on task".format(
+            args.rows, os.path.getsize(data) / 2**20
+        )
+    )
+
+    bulk = [sys.executable, os.path.join(HERE, "sqlite3_load_csv_bulk.py")]
+    runs = [
+        (
+            "sqlite3_load_csv.py",
+            [sys.executable, os.path.join(HERE, "sqlite3_load_csv.py"), data],
+        ),
+        ("bulk, keeping indexes", bulk + ["--quiet", "--keep-indexes", data]),
+        ("bulk, deferring indexes", bulk + ["--quiet", data]),
+        ("  with --fast", bulk + ["--quiet", "--fast", data]),
+    ]
+    template = "{:<24} {:>8} {:>10}"
+    print(template.format("", "seconds", "rows/s"))
+    print(template.format("-" * 24, "-" * 8, "-" * 10))
+    try:
+        for name, command in runs:
+            db = create_db(root)
+            os.sync()
+            start = time.perf_counter()
+            subprocess.run(command, cwd=root, check=True, stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            with sqlite3.connect(db) as conn:
+                (count,) = conn.execute("select count(*) from task").fetchone()
+                (check,) = conn.execute("pragma integrity_check").fetchone()
+            conn.close()
+            assert count == args.rows and check == "ok", (count, check)
+            print(
+                template.format(
+                    name, "{:.1f}".format(elapsed), "{:,.0f}".format(count / elapsed)
+                )
+            )
+    finally:
+        if args.root:
+            os.remove(os.path.join(root, "todo.db"))
+        else:
+            shutil.rmtree(root)
@@ -0,0 +1,166 @@
+# sqlite3_load_csv_bulk.py
+import argparse
+import contextlib
+import csv
+import itertools
+import operator
+import sqlite3
+import sys
+import time
+
+db_filename = "todo.db"
+
+# The columns read from the CSV file, in the order of the parameters.
+COLUMNS = ["details", "priority", "deadline", "project"]
+
+SQL = """
+insert into task (details, priority, status, deadline, project)
+values (?, ?, 'active', ?, ?)
+"""
+
+# Rows inserted in each transaction.
+BATCH_SIZE = 100000
+
+
+def read_rows(csv_file):
+    """Return an iterator of tuples of the values of COLUMNS in csv_file."""
+    csv_reader = csv.reader(csv_file)
+    header = next(csv_reader)
+    getter = operator.itemgetter(*[header.index(name) for name in COLUMNS])
+    return map(getter, csv_reader)
+
+
+@contextlib.contextmanager
+def fast_pragmas(conn):
+    """Use a write-ahead log and skip syncing to disk while loading.
+
+    With synchronous=OFF a power failure during the load can corrupt the
+    database, so the previous settings are restored afterwards.
+    """
+    journal_mode = conn.execute("pragma journal_mode").fetchone()[0]
+    synchronous = conn.execute("pragma synchronous").fetchone()[0]
+    conn.execute("pragma journal_mode=wal")
+    conn.execute("pragma synchronous=off")
+    try:
+        yield
+    finally:
+        conn.execute("pragma synchronous={}".format(synchronous))
+        conn.execute("pragma journal_mode={}".format(journal_mode))
+
+
+@contextlib.contextmanager
+def deferred_indexes(conn, table):
+    """Drop the indexes of table, and create them again afterwards.
+
+    Building an index once over all of the rows is faster than updating
+    it for every row inserted. Unique and partial indexes are kept,
+    since dropping them would let the load insert rows they reject.
+    An index that cannot be created again is reported on stderr, the
+    others are still created, and sqlite3.IntegrityError is raised.
+    """
+    indexes = []
+    for seq, name, unique, origin, partial in conn.execute(
+        "pragma index_list({})".format(table)
+    ).fetchall():
+        if origin == "c" and not unique and not partial:
+            (sql,) = conn.execute(
+                "select sql from sqlite_master where type = 'index' and name = ?",
+                (name,),
+            ).fetchone()
+            indexes.append((name, sql))
+    for name, sql in indexes:
+        conn.execute('drop index "{}"'.format(name))
+    failed = []
+    try:
+        yield [name for name, sql in indexes]
+    finally:
+        for name, sql in indexes:
+            try:
+                conn.execute(sql)
+            except sqlite3.Error as err:
+                print("cannot create index {}: {}".format(name, err), file=sys.stderr)
+                failed.append(name)
+        conn.commit()
+    if failed:
+        raise sqlite3.IntegrityError(
+            "indexes not created again: {}".format(", ".join(failed))
+        )
+
+
+def bulk_load(conn, rows, batch_size=BATCH_SIZE, progress=None):
+    """Insert rows into the task table, batch_size rows per transaction.
+
+    progress is called with the number of rows loaded and the seconds
+    taken so far after each transaction. Return the number of rows.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    start = time.perf_counter()
+    count = 0
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        conn.execute("begin")
+        try:
+            conn.executemany(SQL, batch)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        count += len(batch)
+        if progress is not None:
+            progress(count, time.perf_counter() - start)
+    return count
+
+
+def show_progress(count, elapsed):
+    print(
+        "\r{:>12,} rows {:>10,.0f} rows/s".format(count, count / elapsed),
+        end="",
+        file=sys.stderr,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data_filename")
+    parser.add_argument("--db", default=db_filename)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="use journal_mode=WAL and synchronous=OFF while loading",
+    )
+    parser.add_argument(
+        "--keep-indexes",
+        action="store_true",
+        help="update the indexes of task while loading instead of afterwards",
+    )
+    parser.add_argument("--quiet", action="store_true", help="do not show progress")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        csv_file = stack.enter_context(open(args.data_filename, "rt", newline=""))
+        conn = stack.enter_context(contextlib.closing(sqlite3.connect(args.db)))
+        if args.fast:
+            stack.enter_context(fast_pragmas(conn))
+        if not args.keep_indexes:
+            stack.enter_context(deferred_indexes(conn, "task"))
+        start = time.perf_counter()
+        count = bulk_load(
+            conn,
+            read_rows(csv_file),
+            args.batch_size,
+            None if args.quiet else show_progress,
+        )
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        "loaded {:,} rows in {:.1f} s, {:,.0f} rows/s".format(
+            count, elapsed, count / elapsed if elapsed else 0
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# sqlite3_pool.py
+import collections
+import concurrent.futures
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.request
+
+db_filename = "todo.db"
+
+# Compiled statements kept by each connection. Running the same SQL text
+# again, with different parameters, reuses the prepared statement.
+CACHED_STATEMENTS = 256
+
+# Writes waiting in the queue are committed together, up to this many
+# in one transaction.
+WRITE_BATCH = 64
+
+
+class ConnectionPool:
+    """Share a database between threads.
+
+    Readers check out one of up to size read-only connections with
+    connection(), and give it back when the with block ends. Writes are
+    passed to write() and run one at a time by a thread that owns the
+    only connection able to change the database, so writers never
+    compete for its lock, and writes that arrive together are committed
+    together. The database is switched to write-ahead logging, which
+    lets the readers keep going while a write is being committed.
+
+    stats counts the checkouts, how many of them had to wait for a
+    connection and for how long, the connections opened, and the writes
+    and commits.
+    """
+
+    def __init__(self, filename, size=8, timeout=5.0):
+        self.filename = filename
+        self.size = size
+        self.timeout = timeout
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._writer = sqlite3.connect(
+            filename,
+            timeout=timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        self._writer.execute("pragma journal_mode=wal")
+        # In WAL mode, NORMAL only syncs at checkpoints. A power failure
+        # can lose the last commits but cannot corrupt the database.
+        self._writer.execute("pragma synchronous=normal")
+        self._writes = queue.Queue()
+        self._write_thread = threading.Thread(
+            name="sqlite3 writer", target=self._write_loop, daemon=True
+        )
+        self._write_thread.start()
+
+    def _connect(self):
+        uri = "file:{}?mode=ro".format(
+            urllib.request.pathname2url(os.path.abspath(self.filename))
+        )
+        return sqlite3.connect(
+            uri,
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+
+    def _count(self, **values):
+        with self._lock:
+            self.stats.update(values)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._opened -= 1
+                raise
+            self._count(opened=1)
+            return conn
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                "no connection free after {} seconds".format(self.timeout)
+            ) from None
+        self._count(waited=1, wait_seconds=time.perf_counter() - start)
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Check out a read-only connection for the calling thread."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed pool.")
+        conn = self._checkout()
+        self._count(checkouts=1)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._idle.put(conn)
+            if closed:
+                conn.close()
+
+    def write(self, func, *args):
+        """Run func(conn, *args) with the writer connection.
+
+        Return a concurrent.futures.Future for the result of func, which
+        is set once the changes are committed. If func raises an
+        exception its changes are rolled back. func runs inside a
+        transaction, so it must not commit or roll back itself.
+        """
+        future = concurrent.futures.Future()
+        # Checked under the lock, so a job can not be queued after the
+        # sentinel from close(), where it would never run.
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed pool.")
+            self._writes.put((future, func, args))
+        return future
+
+    def _write_loop(self):
+        running = True
+        while running:
+            jobs = [self._writes.get()]
+            while len(jobs) < WRITE_BATCH:
+                try:
+                    jobs.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            if None in jobs:
+                running = False
+            jobs = [
+                (future, func, args)
+                for future, func, args in filter(None, jobs)
+                if future.set_running_or_notify_cancel()
+            ]
+            if jobs:
+                self._run_writes(jobs)
+
+    def _run_writes(self, jobs):
+        """Run jobs in one transaction, each in its own savepoint.
+
+        A job that raises an exception only rolls back its own changes.
+        If the transaction fails, all of the jobs fail with it, except
+        those that have not run yet when SQLite rolls it back, which are
+        run again in a new one. Any exception is caught, so a job can not
+        stop the writer thread and leave the futures of the jobs queued
+        after it waiting forever.
+        """
+        conn = self._writer
+        results = []
+        remaining = []
+        try:
+            conn.execute("begin immediate")
+            if len(jobs) == 1:
+                # No other changes to protect, so the transaction will do.
+                future, func, args = jobs[0]
+                try:
+                    results.append((future, func(conn, *args), None))
+                except BaseException as err:
+                    # Some errors make SQLite roll back by itself.
+                    if conn.in_transaction:
+                        conn.execute("rollback")
+                    results.append((future, None, err))
+            else:
+                for i, (future, func, args) in enumerate(jobs):
+                    conn.execute("savepoint job")
+                    try:
+                        results.append((future, func(conn, *args), None))
+                    except BaseException as err:
+                        if not conn.in_transaction:
+                            # SQLite rolled back the whole transaction,
+                            # and the jobs before this one with it.
+                            remaining = jobs[i + 1 :]
+                            results = [(f, None, err) for f, _, _ in jobs[: i + 1]]
+                            break
+                        conn.execute("rollback to job")
+                        results.append((future, None, err))
+                    conn.execute("release job")
+            if conn.in_transaction:
+                conn.execute("commit")
+                self._count(commits=1)
+        except BaseException as err:
+            if conn.in_transaction:
+                conn.execute("rollback")
+            results = [(future, None, err) for future, func, args in jobs]
+            remaining = []
+        for future, result, err in results:
+            if err is None:
+                self._count(writes=1)
+                future.set_result(result)
+            else:
+                self._count(write_errors=1)
+                future.set_exception(err)
+        if remaining:
+            self._run_writes(remaining)
+
+    def close(self):
+        """Finish the queued writes and close the connections."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._writes.put(None)
+        self._write_thread.join()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        # The last connection to close checkpoints the WAL and removes
+        # it, which the read-only connections can not do.
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    results = {}
+
+    def count_tasks(pool, status):
+        with pool.connection() as conn:
+            cursor = conn.execute(
+                "select count(*) from task where status = ?", (status,)
+            )
+            results[status] = cursor.fetchone()[0]
+
+    def set_status(conn, task_id, status):
+        conn.execute("update task set status = ? where id = ?", (status, task_id))
+
+    with ConnectionPool(db_filename, size=2) as pool:
+        update = pool.write(set_status, 3, "active")
+        threads = [
+            threading.Thread(target=count_tasks, args=(pool, status))
+            for status in ["active", "done", "waiting"]
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        update.result()
+
+    for status, count in sorted(results.items()):
+        print("{:<8} {}".format(status, count))
+    print()
+    for name, value in sorted(pool.stats.items()):
+        print("{:<12} {:.4g}".format(name, value))
@@ -0,0 +1,214 @@
+# sqlite3_pool_benchmark.py
+import argparse
+import collections
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlite3_pool import ConnectionPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+READ = """
+select id, priority, details, status, deadline from task
+where project = ? and deadline >= ?
+order by deadline limit 10
+"""
+WRITE = "update task set status = ?, completed_on = ? where id = ?"
+
+
+def create_db(filename, count, seed=0):
+    """Create a todo.db with count tasks spread over 100 projects."""
+    rng = random.Random(seed)
+    with open(os.path.join(HERE, "todo_schema.sql"), "rt") as f:
+        schema = f.read()
+    with sqlite3.connect(filename) as conn:
+        conn.executescript(schema)
+        conn.execute("create index task_project_deadline on task (project, deadline)")
+        conn.executemany(
+            "insert into project (name) values (?)",
+            [("project{}".format(i),) for i in range(100)],
+        )
+        conn.executemany(
+            """
+        insert into task (priority, details, status, deadline, project)
+        values (?, ?, 'active', ?, ?)
+        """,
+            (
+                (
+                    rng.randint(1, 3),
+                    "task {}".format(i),
+                    "2017-{:02d}-{:02d}".format(rng.randint(1, 12), rng.randint(1, 28)),
+                    "project{}".format(rng.randrange(100)),
+                )
+                for i in range(count)
+            ),
+        )
+    conn.close()
+
+
+def operations(rng, count, write_fraction):
+    """Return a function that picks the next operation for a thread."""
+
+    def choose():
+        if rng.random() < write_fraction:
+            return "write", (
+                rng.choice(["active", "done", "waiting"]),
+                "2017-06-{:02d}".format(rng.randint(1, 28)),
+                rng.randint(1, count),
+            )
+        return "read", (
+            "project{}".format(rng.randrange(100)),
+            "2017-{:02d}-01".format(rng.randint(1, 12)),
+        )
+
+    return choose
+
+
+def per_thread(filename, wal):
+    """Give each thread its own connection, as in sqlite3_threading.py."""
+    if wal:
+        with sqlite3.connect(filename) as conn:
+            conn.execute("pragma journal_mode=wal")
+        conn.close()
+
+    def worker(choose, stop, counts):
+        conn = sqlite3.connect(filename, timeout=5.0)
+        if wal:
+            conn.execute("pragma synchronous=normal")
+        try:
+            while not stop.is_set():
+                kind, params = choose()
+                try:
+                    if kind == "read":
+                        conn.execute(READ, params).fetchall()
+                    else:
+                        with conn:
+                            conn.execute(WRITE, params)
+                    counts[kind] += 1
+                except sqlite3.OperationalError:
+                    counts["errors"] += 1
+        finally:
+            conn.close()
+
+    return worker, None
+
+
+def pooled(filename, size):
+    pool = ConnectionPool(filename, size=size)
+
+    def write(conn, params):
+        conn.execute(WRITE, params)
+
+    def worker(choose, stop, counts):
+        while not stop.is_set():
+            kind, params = choose()
+            try:
+                if kind == "read":
+                    with pool.connection() as conn:
+                        conn.execute(READ, params).fetchall()
+                else:
+                    pool.write(write, params).result()
+                counts[kind] += 1
+            except (sqlite3.OperationalError, TimeoutError):
+                counts["errors"] += 1
+
+    return worker, pool
+
+
+def run(setup, threads, seconds, count, write_fraction):
+    worker, pool = setup()
+    stop = threading.Event()
+    counts = [collections.Counter() for _ in range(threads)]
+    workers = [
+        threading.Thread(
+            target=worker,
+            args=(operations(random.Random(i), count, write_fraction), stop, counts[i]),
+        )
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if pool is not None:
+        pool.close()
+    total = sum(counts, collections.Counter())
+    return elapsed, total, pool.stats if pool is not None else collections.Counter()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writes", type=float, default=0.1, help="fraction of writes")
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--max-threads", type=int, default=64)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    template = "{:<28} {:>7} {:>8} {:>8} {:>7} {:>9} {:>10}"
+    print(
+        "{:,} tasks, {:.0%} writes, {:.0f} s per run".format(
+            args.tasks, args.writes, args.seconds
+        )
+    )
+    print(
+        template.format(
+            "", "threads", "reads/s", "writes/s", "errors", "pool wait", "per commit"
+        )
+    )
+    print(
+        template.format("-" * 28, "-" * 7, "-" * 8, "-" * 8, "-" * 7, "-" * 9, "-" * 10)
+    )
+    try:
+        setups = [
+            ("connection per thread", lambda f: per_thread(f, wal=False)),
+            ("  in WAL mode", lambda f: per_thread(f, wal=True)),
+            (
+                "ConnectionPool, size {}".format(args.pool_size),
+                lambda f: pooled(f, args.pool_size),
+            ),
+        ]
+        for name, setup in setups:
+            for threads in [1, 2, 4, 8, 16, 32, 64]:
+                if threads > args.max_threads:
+                    break
+                filename = os.path.join(tmpdir, "todo.db")
+                for suffix in ["", "-wal", "-shm"]:
+                    if os.path.exists(filename + suffix):
+                        os.remove(filename + suffix)
+                create_db(filename, args.tasks)
+                elapsed, total, stats = run(
+                    lambda: setup(filename),
+                    threads,
+                    args.seconds,
+                    args.tasks,
+                    args.writes,
+                )
+                wait = per_commit = ""
+                if stats["checkouts"]:
+                    wait = "{:.0%}".format(stats["waited"] / stats["checkouts"])
+                if stats["commits"]:
+                    per_commit = "{:.1f}".format(stats["writes"] / stats["commits"])
+                print(
+                    template.format(
+                        name,
+                        threads,
+                        "{:.0f}".format(total["read"] / elapsed),
+                        "{:.0f}".format(total["write"] / elapsed),
+                        total["errors"],
+                        wait,
+                        per_commit,
+                    )
+                )
+    finally:
+        shutil.rmtree(tmpdir)
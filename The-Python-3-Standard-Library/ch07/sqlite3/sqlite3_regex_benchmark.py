@@ -0,0 +1,97 @@
+# sqlite3_regex_benchmark.py
+import argparse
+import random
+import re
+import sqlite3
+import time
+
+import sqlite3_regex_functions
+
+
+def regexp(pattern, input):
+    # The function from sqlite3_regex.py.
+    return bool(re.match(pattern, input))
+
+
+def create_db(count, seed=0):
+    """Return an in-memory database with count tasks."""
+    rng = random.Random(seed)
+    verbs = ["write about", "Write About", "revise", "review", "test", "publish"]
+    conn = sqlite3.connect(":memory:")
+    conn.execute("create table task (id integer primary key, details text)")
+    conn.executemany(
+        "insert into task (details) values (?)",
+        (
+            ("{} module{} in chapter {}".format(rng.choice(verbs), i, i % 20),)
+            for i in range(count)
+        ),
+    )
+    return conn
+
+
+def best(conn, sql, params, repeat):
+    """Return the fastest time to run sql, and its result."""
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = conn.execute(sql, params).fetchall()
+        run = time.perf_counter() - start
+        elapsed = run if elapsed is None else min(elapsed, run)
+    return elapsed, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3, help="report the best run")
+    args = parser.parse_args()
+
+    conn = create_db(args.rows)
+    count = "select count(*) from task where details regexp ?"
+    queries = [
+        ("example pattern", count, (".*[wW]rite [aA]bout.*",)),
+        ("prefix", count, ("revise",)),
+        (
+            "extract",
+            "select count(regexp_extract(details, 'chapter (\\d+)', 1)) from task",
+            (),
+        ),
+        (
+            "replace",
+            "select max(regexp_replace(details, '\\d+', '#')) from task",
+            (),
+        ),
+    ]
+
+    print("{:,} rows".format(args.rows))
+    template = "{:<16} {:>14} {:>14} {:>8}"
+    print(template.format("query", "sqlite3_regex", "functions", "speedup"))
+    print(template.format("-" * 16, "-" * 14, "-" * 14, "-" * 8))
+    for name, sql, params in queries:
+        if "regexp " in sql:
+            conn.create_function("regexp", 2, regexp)
+            before, expected = best(conn, sql, params, args.repeat)
+            before_text = "{:.2f} s".format(before)
+        else:
+            before, expected, before_text = None, None, ""
+        sqlite3_regex_functions.register(conn)
+        after, result = best(conn, sql, params, args.repeat)
+        assert expected is None or result == expected, (result, expected)
+        print(
+            template.format(
+                name,
+                before_text,
+                "{:.2f} s".format(after),
+                "{:.2f}x".format(before / after) if before else "",
+            )
+        )
+
+    like, _ = best(
+        conn,
+        "select count(*) from task where details like ?",
+        ("%write about%",),
+        args.repeat,
+    )
+    print(template.format("like, built in", "", "{:.2f} s".format(like), ""))
+    print()
+    print(sqlite3_regex_functions.compile_pattern.cache_info())
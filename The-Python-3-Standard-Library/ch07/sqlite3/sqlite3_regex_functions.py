@@ -0,0 +1,75 @@
+# sqlite3_regex_functions.py
+import functools
+import re
+import sqlite3
+
+db_filename = "todo.db"
+
+# Compiled patterns kept between calls. A query usually uses the same
+# pattern for every row, so a small cache is enough.
+CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def compile_pattern(pattern):
+    return re.compile(pattern)
+
+
+def regexp(pattern, input):
+    """Implement "input REGEXP pattern", with the rules of re.match()."""
+    if pattern is None or input is None:
+        return None
+    return compile_pattern(pattern).match(input) is not None
+
+
+def regexp_extract(input, pattern, group=0):
+    """Return the given group of the first match of pattern in input."""
+    if pattern is None or input is None:
+        return None
+    match = compile_pattern(pattern).search(input)
+    if match is None:
+        return None
+    return match.group(group)
+
+
+def regexp_replace(input, pattern, replacement):
+    """Return input with every match of pattern replaced."""
+    if pattern is None or input is None or replacement is None:
+        return None
+    return compile_pattern(pattern).sub(replacement, input)
+
+
+def register(conn):
+    """Add the regular expression functions to conn.
+
+    They are registered as deterministic, since their results depend
+    only on their arguments, which lets SQLite use them in indexes and
+    evaluate them once for constant arguments.
+    """
+    conn.create_function("regexp", 2, regexp, deterministic=True)
+    conn.create_function("regexp_extract", 2, regexp_extract, deterministic=True)
+    conn.create_function("regexp_extract", 3, regexp_extract, deterministic=True)
+    conn.create_function("regexp_replace", 3, regexp_replace, deterministic=True)
+
+
+if __name__ == "__main__":
+    with sqlite3.connect(db_filename) as conn:
+        register(conn)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            select id, regexp_extract(details, '\\w+$'),
+                   regexp_replace(details, '^write about', 'wrote about')
+            from task
+            where details regexp :pattern
+            order by deadline, priority
+            """,
+            {"pattern": ".*[wW]rite [aA]bout.*"},
+        )
+
+        for task_id, topic, details in cursor.fetchall():
+            print("{:2d} {:<8} {}".format(task_id, topic, details))
+
+    print()
+    print(compile_pattern.cache_info())
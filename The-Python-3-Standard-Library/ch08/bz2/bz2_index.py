@@ -0,0 +1,228 @@
+# bz2_index.py
+import bisect
+import bz2
+import collections
+import io
+import mmap
+import os
+import struct
+
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+MAGIC_BITS = 48
+CRC_BITS = 32
+
+INDEX_MAGIC = b"BZIDX1\n"
+INDEX_HEADER = struct.Struct("<QQI")  # source size, mtime, count
+INDEX_ENTRY = struct.Struct("<QQQ")  # start bit, end bit, uncompressed
+
+Block = collections.namedtuple("Block", "start end uncompressed")
+
+
+def read_bits(data, start, count):
+    """Return count bits of data starting at bit start, as an int."""
+    first = start // 8
+    last = (start + count + 7) // 8
+    value = int.from_bytes(data[first:last], "big")
+    return (value >> (8 * (last - first) - (start % 8) - count)) & (
+        (1 << count) - 1
+    )
+
+
+def find_bits(data, pattern):
+    """Return the bit offsets of every 48-bit pattern in data.
+
+    bzip2 blocks are not aligned to bytes, so the pattern is searched
+    for at each of the eight possible bit shifts. The whole bytes of
+    the shifted pattern are found with bytes.find() and the candidate
+    is then checked bit by bit.
+    """
+    found = []
+    for shift in range(8):
+        shifted = (pattern << (8 - shift)).to_bytes(7, "big")
+        key = shifted[1:6] if shift else shifted[0:6]
+        skip = 1 if shift else 0
+        pos = data.find(key)
+        while pos != -1:
+            start = (pos - skip) * 8 + shift
+            if start >= 0 and read_bits(data, start, MAGIC_BITS) == pattern:
+                found.append(start)
+            pos = data.find(key, pos + 1)
+    return sorted(found)
+
+
+def block_stream(data, start, end):
+    """Wrap the block between two bit offsets as a complete bz2 stream.
+
+    A stream with one block needs a header, the block, and an end of
+    stream marker followed by the combined CRC, which for a single
+    block is just the block's own CRC.
+    """
+    count = end - start
+    block = read_bits(data, start, count)
+    crc = (block >> (count - MAGIC_BITS - CRC_BITS)) & 0xFFFFFFFF
+    value = (block << (MAGIC_BITS + CRC_BITS)) | (EOS_MAGIC << CRC_BITS) | crc
+    count += MAGIC_BITS + CRC_BITS
+    padding = -count % 8
+    return b"BZh9" + (value << padding).to_bytes((count + padding) // 8, "big")
+
+
+def decompress_block(data, start, end):
+    return bz2.decompress(block_stream(data, start, end))
+
+
+def build_index(filename):
+    """Return the bit range and uncompressed offset of every block.
+
+    A block ends where the next block or end of stream marker begins.
+    The search can report false markers inside compressed data, so
+    each block is decompressed to make sure it is complete, which
+    also gives its uncompressed size.
+    """
+    blocks = []
+    total = 0
+    with open(filename, "rb") as input:
+        with mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            starts = find_bits(data, BLOCK_MAGIC)
+            ends = sorted(starts + find_bits(data, EOS_MAGIC))
+            covered = 0
+            for start in starts:
+                if start < covered:
+                    continue
+                for end in ends[bisect.bisect_right(ends, start) :]:
+                    try:
+                        out = decompress_block(data, start, end)
+                    except (OSError, ValueError):
+                        continue
+                    blocks.append(Block(start, end, total))
+                    total += len(out)
+                    covered = end
+                    break
+    return blocks
+
+
+def index_filename(filename):
+    return filename + ".idx"
+
+
+def save_index(filename, blocks):
+    st = os.stat(filename)
+    with open(index_filename(filename), "wb") as output:
+        output.write(INDEX_MAGIC)
+        output.write(INDEX_HEADER.pack(st.st_size, st.st_mtime_ns, len(blocks)))
+        for block in blocks:
+            output.write(INDEX_ENTRY.pack(*block))
+
+
+def load_index(filename):
+    """Return the saved blocks, or None if missing or stale."""
+    try:
+        input = open(index_filename(filename), "rb")
+    except FileNotFoundError:
+        return None
+    with input:
+        if input.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        size, mtime, count = INDEX_HEADER.unpack(input.read(INDEX_HEADER.size))
+        st = os.stat(filename)
+        if (size, mtime) != (st.st_size, st.st_mtime_ns):
+            return None
+        return [
+            Block(*INDEX_ENTRY.unpack(input.read(INDEX_ENTRY.size)))
+            for i in range(count)
+        ]
+
+
+class IndexedBz2Reader(io.RawIOBase):
+    """Read a bz2 file, decompressing only the blocks that are needed.
+
+    The most recently used block is kept, so sequential reads within
+    a block do not decompress it again.
+    """
+
+    def __init__(self, filename, blocks):
+        self._file = open(filename, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._blocks = blocks
+        self._offsets = [b.uncompressed for b in blocks]
+        self._pos = 0
+        self._current = None
+        self._current_data = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            raise io.UnsupportedOperation("can not seek from the end")
+        if offset < 0:
+            raise ValueError("negative seek position {}".format(offset))
+        self._pos = offset
+        return self._pos
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+        super().close()
+
+    def readinto(self, b):
+        i = bisect.bisect_right(self._offsets, self._pos) - 1
+        if i < 0:
+            return 0
+        block = self._blocks[i]
+        if block is not self._current:
+            self._current = block
+            self._current_data = decompress_block(
+                self._data, block.start, block.end
+            )
+        start = self._pos - block.uncompressed
+        out = self._current_data[start : start + len(b)]
+        b[: len(out)] = out
+        self._pos += len(out)
+        return len(out)
+
+
+def open_indexed(filename):
+    """Open filename for reading, building its index if needed."""
+    blocks = load_index(filename)
+    if blocks is None:
+        blocks = build_index(filename)
+        save_index(filename, blocks)
+    return io.BufferedReader(IndexedBz2Reader(filename, blocks))
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    words = open("lorem.txt", "rb").read().split()
+    data = b" ".join(random.choices(words, k=150000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "example.bz2")
+        with bz2.open(filename, "wb", compresslevel=1) as output:
+            output.write(data)
+
+        with open_indexed(filename) as input_file:
+            print("Blocks:")
+            for block in load_index(filename):
+                print(
+                    "  bits {:>9} - {:>9} -> {:>8}".format(
+                        block.start, block.end, block.uncompressed
+                    )
+                )
+
+            offset = 500000
+            input_file.seek(offset)
+            print("Starting at position {} for 20 bytes:".format(offset))
+            partial = input_file.read(20)
+            print(partial)
+            print(partial == data[offset : offset + 20])
@@ -0,0 +1,73 @@
+# bz2_index_benchmark.py
+import argparse
+import bz2
+import os
+import random
+import tempfile
+import time
+
+import bz2_index
+
+
+def random_reads(input_file, offsets, size):
+    start = time.perf_counter()
+    for offset in offsets:
+        input_file.seek(offset)
+        input_file.read(size)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--size", type=int, default=16, help="uncompressed size in MB"
+    )
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--read-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    words = open("lorem.txt", "rb").read().split()
+    data = b" ".join(random.choices(words, k=args.size * 2**20 // 5))
+    data = data[: args.size * 2**20]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "data.bz2")
+        with bz2.open(filename, "wb") as output:
+            output.write(data)
+        print(
+            "{:,} bytes compressed to {:,}".format(
+                len(data), os.stat(filename).st_size
+            )
+        )
+
+        start = time.perf_counter()
+        blocks = bz2_index.build_index(filename)
+        bz2_index.save_index(filename, blocks)
+        print(
+            "Built index with {} blocks in {:.2f} seconds".format(
+                len(blocks), time.perf_counter() - start
+            )
+        )
+        print()
+
+        offsets = [
+            random.randrange(len(data) - args.read_size)
+            for i in range(args.reads)
+        ]
+        template = "{:<12} {:>8} {:>12}"
+        print(template.format("reader", "seconds", "ms per read"))
+        print(template.format("-" * 12, "-" * 8, "-" * 12))
+        readers = [
+            ("BZ2File", lambda: bz2.open(filename, "rb")),
+            ("indexed", lambda: bz2_index.open_indexed(filename)),
+        ]
+        for name, opener in readers:
+            with opener() as input_file:
+                elapsed = random_reads(input_file, offsets, args.read_size)
+            print(
+                template.format(
+                    name,
+                    "{:.2f}".format(elapsed),
+                    "{:.2f}".format(elapsed / args.reads * 1000),
+                )
+            )
@@ -0,0 +1,88 @@
+# bz2_parallel.py
+import bz2
+import collections
+import concurrent.futures
+import os
+import time
+
+# bzip2 works on blocks of at most 900 KB at level 9, so splitting
+# the input at the same size costs almost nothing in compression.
+BLOCK_SIZE = 900 * 1000
+
+
+def compress_file(input, output, level=9, block_size=BLOCK_SIZE, workers=None):
+    """Write input to output as a series of concatenated bz2 streams.
+
+    Each block is compressed independently in a thread pool, since
+    the bz2 module releases the GIL while it compresses. bunzip2 and
+    bz2.decompress() both read every stream in the file, so the
+    result decompresses to the original data.
+    """
+    workers = workers or os.cpu_count()
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        while True:
+            block = input.read(block_size)
+            if not block:
+                break
+            pending.append(executor.submit(bz2.compress, block, level))
+            if len(pending) >= workers * 2:
+                output.write(pending.popleft().result())
+        while pending:
+            output.write(pending.popleft().result())
+
+
+if __name__ == "__main__":
+    import argparse
+    import io
+    import random
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--size", type=int, default=16, help="size of the test data in MB"
+    )
+    parser.add_argument("--level", type=int, default=9)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Highly repetitive input sends bzip2 into its slow fallback
+    # sort, so build the test data from randomly chosen words.
+    words = open("lorem.txt", "rb").read().split()
+    data = b" ".join(random.choices(words, k=args.size * 2**20 // 5))
+    data = data[: args.size * 2**20]
+
+    start = time.perf_counter()
+    expected = bz2.compress(data, args.level)
+    baseline = time.perf_counter() - start
+
+    template = "{:>7} {:>8} {:>8} {:>10} {:>7}"
+    print(template.format("threads", "seconds", "MB/s", "size", "speedup"))
+    print(template.format("-" * 7, "-" * 8, "-" * 8, "-" * 10, "-" * 7))
+    print(
+        template.format(
+            "bz2",
+            "{:.2f}".format(baseline),
+            "{:.1f}".format(args.size / baseline),
+            len(expected),
+            "1.0",
+        )
+    )
+
+    workers = 1
+    while workers <= args.max_workers:
+        output = io.BytesIO()
+        start = time.perf_counter()
+        compress_file(io.BytesIO(data), output, args.level, workers=workers)
+        elapsed = time.perf_counter() - start
+        compressed = output.getvalue()
+        assert bz2.decompress(compressed) == data
+        print(
+            template.format(
+                workers,
+                "{:.2f}".format(elapsed),
+                "{:.1f}".format(args.size / elapsed),
+                len(compressed),
+                "{:.1f}".format(baseline / elapsed),
+            )
+        )
+        workers *= 2
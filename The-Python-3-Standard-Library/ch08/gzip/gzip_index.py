@@ -0,0 +1,319 @@
+# gzip_index.py
+import bisect
+import collections
+import gzip
+import io
+import os
+import struct
+import zlib
+
+INTERVAL = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+WINDOW_SIZE = 32 * 1024
+SYNC_MARKER = b"\x00\x00\xff\xff"
+
+INDEX_MAGIC = b"GZIDX1\n"
+INDEX_HEADER = struct.Struct("<QQI")  # source size, mtime, count
+INDEX_ENTRY = struct.Struct("<QQI")  # compressed, uncompressed, window
+GZIP_TRAILER_SIZE = 8  # CRC-32 and size of each member
+
+Checkpoint = collections.namedtuple(
+    "Checkpoint", "compressed uncompressed window"
+)
+
+
+def write_checkpointed(input, output, interval=INTERVAL, level=9):
+    """Copy input to output as gzip data that can be indexed.
+
+    A full flush every interval bytes ends the current deflate block
+    on a byte boundary, marks it with an empty stored block, and
+    resets the compressor's history. The result is still one ordinary
+    gzip stream.
+    """
+    with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=level) as gz:
+        while True:
+            block = input.read(interval)
+            if not block:
+                break
+            gz.write(block)
+            gz.flush(zlib.Z_FULL_FLUSH)
+
+
+def new_decompressor(checkpoint):
+    if not checkpoint.window:
+        # The start of a gzip member, including its header
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    else:
+        return zlib.decompressobj(-zlib.MAX_WBITS, zdict=checkpoint.window)
+
+
+def is_restart_point(probe, checkpoint, decompressor):
+    """Check that decompression can restart cleanly at checkpoint.
+
+    A fresh raw decompressor primed with the window must produce the
+    same output as the decompressor that has read the whole file so
+    far. Deflate back-references reach at most 32 KB, so once more
+    than that has been produced the rest of the stream can not refer
+    to anything before the checkpoint.
+    """
+    probe.seek(checkpoint.compressed)
+    data = probe.read(4 * WINDOW_SIZE)
+    try:
+        restarted = new_decompressor(checkpoint).decompress(data)
+    except zlib.error:
+        return False
+    expected = decompressor.copy().decompress(data)
+    return bool(restarted) and restarted == expected[: len(restarted)]
+
+
+def build_index(filename, interval=INTERVAL):
+    """Return checkpoints at least interval bytes apart.
+
+    Candidate checkpoints are the empty stored blocks written by a
+    sync or full flush, found by searching for their 00 00 ff ff
+    marker. Each candidate records the compressed offset just after
+    the marker, the amount of data decompressed up to that point, and
+    the last 32 KB of that data to prime a new decompressor.
+
+    A file can hold several gzip members one after the other, as
+    gzip.open() reads them. The start of each member is a checkpoint
+    too, with an empty window, since nothing in it refers back.
+    """
+    checkpoints = [Checkpoint(0, 0, b"")]
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    window = b""
+    total = 0
+    offset = 0
+    tail = b""
+    with open(filename, "rb") as input, open(filename, "rb") as probe:
+        while True:
+            chunk = input.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            # Split the chunk just after each marker, including one
+            # that started at the end of the previous chunk.
+            search = tail + chunk
+            ends = []
+            i = search.find(SYNC_MARKER)
+            while i != -1:
+                end = i + len(SYNC_MARKER) - len(tail)
+                if end > 0:
+                    ends.append(end)
+                i = search.find(SYNC_MARKER, i + 1)
+
+            start = 0
+            for end in ends + [len(chunk)]:
+                data = chunk[start:end]
+                position = offset + start
+                start = end
+                while data:
+                    if decompressor.eof:
+                        # Another member follows the one that ended.
+                        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                        if total - checkpoints[-1].uncompressed >= interval:
+                            checkpoints.append(Checkpoint(position, total, b""))
+                    out = decompressor.decompress(data)
+                    total += len(out)
+                    window = (window + out[-WINDOW_SIZE:])[-WINDOW_SIZE:]
+                    data = decompressor.unused_data
+                    position = offset + end - len(data)
+                if end == len(chunk) or decompressor.eof:
+                    continue
+                if total - checkpoints[-1].uncompressed < interval:
+                    continue
+                checkpoint = Checkpoint(offset + end, total, window)
+                if is_restart_point(probe, checkpoint, decompressor):
+                    checkpoints.append(checkpoint)
+            offset += len(chunk)
+            tail = chunk[-(len(SYNC_MARKER) - 1) :]
+    return checkpoints
+
+
+def index_filename(filename):
+    return filename + ".idx"
+
+
+def save_index(filename, checkpoints):
+    st = os.stat(filename)
+    with open(index_filename(filename), "wb") as output:
+        output.write(INDEX_MAGIC)
+        output.write(
+            INDEX_HEADER.pack(st.st_size, st.st_mtime_ns, len(checkpoints))
+        )
+        for checkpoint in checkpoints:
+            output.write(
+                INDEX_ENTRY.pack(
+                    checkpoint.compressed,
+                    checkpoint.uncompressed,
+                    len(checkpoint.window),
+                )
+            )
+            output.write(checkpoint.window)
+
+
+def load_index(filename):
+    """Return the saved checkpoints, or None if missing or stale."""
+    try:
+        input = open(index_filename(filename), "rb")
+    except FileNotFoundError:
+        return None
+    with input:
+        if input.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        size, mtime, count = INDEX_HEADER.unpack(
+            input.read(INDEX_HEADER.size)
+        )
+        st = os.stat(filename)
+        if (size, mtime) != (st.st_size, st.st_mtime_ns):
+            return None
+        checkpoints = []
+        for i in range(count):
+            compressed, uncompressed, length = INDEX_ENTRY.unpack(
+                input.read(INDEX_ENTRY.size)
+            )
+            checkpoints.append(
+                Checkpoint(compressed, uncompressed, input.read(length))
+            )
+    return checkpoints
+
+
+class IndexedGzipReader(io.RawIOBase):
+    """Read a gzip file, seeking by way of an index of checkpoints.
+
+    A seek only has to decompress from the closest checkpoint before
+    the new position, instead of from the start of the file.
+    """
+
+    def __init__(self, filename, checkpoints):
+        self._file = open(filename, "rb")
+        self._checkpoints = checkpoints
+        self._offsets = [c.uncompressed for c in checkpoints]
+        self._pos = 0
+        self._decompressor = None
+        self._raw = False
+        self._stream_pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            raise io.UnsupportedOperation("can not seek from the end")
+        if offset < 0:
+            raise ValueError("negative seek position {}".format(offset))
+        self._pos = offset
+        return self._pos
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+    def _restart(self, checkpoint):
+        self._file.seek(checkpoint.compressed)
+        self._decompressor = new_decompressor(checkpoint)
+        self._raw = bool(checkpoint.window)
+        self._stream_pos = checkpoint.uncompressed
+
+    def _next_member(self):
+        """Start decompressing the gzip member after the current one.
+
+        Return the data to give the new decompressor, or b"" at the end
+        of the file.
+        """
+        data = self._decompressor.unused_data
+        if self._raw:
+            # A raw deflate stream stops before the member's trailer.
+            while len(data) < GZIP_TRAILER_SIZE:
+                more = self._file.read(CHUNK_SIZE)
+                if not more:
+                    raise EOFError("compressed file ended inside a trailer")
+                data += more
+            data = data[GZIP_TRAILER_SIZE:]
+            self._raw = False
+        data = data or self._file.read(CHUNK_SIZE)
+        if data:
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        return data
+
+    def _next_output(self, limit):
+        while True:
+            decompressor = self._decompressor
+            if decompressor.eof:
+                data = self._next_member()
+                if not data:
+                    return b""
+                decompressor = self._decompressor
+            else:
+                data = decompressor.unconsumed_tail or self._file.read(CHUNK_SIZE)
+                if not data:
+                    raise EOFError("compressed file ended before the end of stream")
+            out = decompressor.decompress(data, limit)
+            if out:
+                self._stream_pos += len(out)
+                return out
+
+    def readinto(self, b):
+        i = bisect.bisect_right(self._offsets, self._pos) - 1
+        checkpoint = self._checkpoints[i]
+        if (
+            self._decompressor is None
+            or self._stream_pos > self._pos
+            or self._stream_pos < checkpoint.uncompressed
+        ):
+            self._restart(checkpoint)
+
+        # Discard data between the checkpoint and the read position.
+        while self._stream_pos < self._pos:
+            skip = min(self._pos - self._stream_pos, CHUNK_SIZE)
+            if not self._next_output(skip):
+                return 0
+
+        out = self._next_output(len(b))
+        b[: len(out)] = out
+        self._pos += len(out)
+        return len(out)
+
+
+def open_indexed(filename, interval=INTERVAL):
+    """Open filename for reading, building its index if needed."""
+    checkpoints = load_index(filename)
+    if checkpoints is None:
+        checkpoints = build_index(filename, interval)
+        save_index(filename, checkpoints)
+    return io.BufferedReader(IndexedGzipReader(filename, checkpoints))
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    lorem = open("lorem.txt", "rb").read()
+    data = b"".join(b"%06d " % i + lorem for i in range(2000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "example.txt.gz")
+        with open(filename, "wb") as output:
+            write_checkpointed(io.BytesIO(data), output, interval=256 * 1024)
+
+        with open_indexed(filename, interval=256 * 1024) as input_file:
+            print("Checkpoints:")
+            for checkpoint in load_index(filename):
+                print(
+                    "  {:>8} -> {:>8}".format(
+                        checkpoint.compressed, checkpoint.uncompressed
+                    )
+                )
+
+            offset = 1000000
+            input_file.seek(offset)
+            print("Starting at position {} for 20 bytes:".format(offset))
+            partial = input_file.read(20)
+            print(partial)
+            print(partial == data[offset : offset + 20])
@@ -0,0 +1,178 @@
+# tarfile_index.py
+import bisect
+import collections
+import mmap
+import os
+import struct
+import tarfile
+import zlib
+
+INDEX_MAGIC = b"TARIDX1\n"
+INDEX_HEADER = struct.Struct("<QQI")  # archive size, mtime, count
+# name offset, name length, header offset, data offset, size, CRC
+INDEX_ENTRY = struct.Struct("<QIQQQI")
+
+Member = collections.namedtuple("Member", "name offset offset_data size crc")
+
+
+def index_filename(filename):
+    return filename + ".idx"
+
+
+def save_index(filename):
+    """Write a sidecar index of the regular files in a tar archive.
+
+    A tar archive has no table of contents, so building the index
+    reads every header once. A CRC of each member's data is stored as
+    well, since tar headers only have a checksum for the header itself.
+    The archive must not be compressed, so members can be read by
+    seeking straight to their data.
+    """
+    st = os.stat(filename)
+    members = {}
+    with tarfile.open(filename, "r:") as t:
+        for member in t:
+            if not member.isfile():
+                continue
+            crc = 0
+            f = t.extractfile(member)
+            while True:
+                data = f.read(1024 * 1024)
+                if not data:
+                    break
+                crc = zlib.crc32(data, crc)
+            # A later member with the same name replaces an earlier one,
+            # as with getmember().
+            members[member.name.encode("utf-8")] = (member, crc)
+    names = []
+    entries = []
+    name_offset = 0
+    for name in sorted(members):
+        member, crc = members[name]
+        entries.append(
+            INDEX_ENTRY.pack(
+                name_offset,
+                len(name),
+                member.offset,
+                member.offset_data,
+                member.size,
+                crc,
+            )
+        )
+        names.append(name)
+        name_offset += len(name)
+    with open(index_filename(filename), "wb") as output:
+        output.write(INDEX_MAGIC)
+        output.write(INDEX_HEADER.pack(st.st_size, st.st_mtime_ns, len(entries)))
+        output.write(b"".join(entries))
+        output.write(b"".join(names))
+
+
+class MemberIndex:
+    """Sorted member index, read in place from a memory mapped sidecar."""
+
+    def __init__(self, data):
+        self._data = data
+        size, mtime, self.count = INDEX_HEADER.unpack_from(data, len(INDEX_MAGIC))
+        self._entries = len(INDEX_MAGIC) + INDEX_HEADER.size
+        self._names = self._entries + INDEX_ENTRY.size * self.count
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._data, self._entries + INDEX_ENTRY.size * i)
+
+    def __getitem__(self, i):
+        """Return the encoded name of entry i, so bisect can search names."""
+        name_offset, name_length = struct.unpack_from(
+            "<QI", self._data, self._entries + INDEX_ENTRY.size * i
+        )
+        start = self._names + name_offset
+        return self._data[start : start + name_length]
+
+    def find(self, name):
+        """Return the entry for name, or raise KeyError."""
+        key = name.encode("utf-8")
+        i = bisect.bisect_left(self, key)
+        if i == len(self) or self[i] != key:
+            raise KeyError(name)
+        return self.entry(i)
+
+    def close(self):
+        self._data.close()
+
+
+def load_index(filename):
+    """Return a MemberIndex, or None if the sidecar is missing or stale."""
+    try:
+        input = open(index_filename(filename), "rb")
+    except FileNotFoundError:
+        return None
+    with input:
+        if input.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        size, mtime, count = INDEX_HEADER.unpack(input.read(INDEX_HEADER.size))
+        st = os.stat(filename)
+        if (size, mtime) != (st.st_size, st.st_mtime_ns):
+            return None
+        # The mapping stays valid after the file is closed.
+        return MemberIndex(mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class IndexedTarFile:
+    """Read single members of a tar archive by way of a sidecar index.
+
+    TarFile.getmember() reads every header in the archive before it can
+    find a name. Here a lookup is a binary search of the index, and a
+    read is one seek to the member's data.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index = load_index(filename)
+        if self.index is None:
+            save_index(filename)
+            self.index = load_index(filename)
+        self.fp = open(filename, "rb")
+
+    def getmember(self, name):
+        name_offset, name_length, *fields = self.index.find(name)
+        return Member(name, *fields)
+
+    def getnames(self):
+        return [self.index[i].decode("utf-8") for i in range(len(self.index))]
+
+    def read(self, name):
+        """Return the data of a member, after checking its CRC."""
+        member = self.getmember(name)
+        self.fp.seek(member.offset_data)
+        data = self.fp.read(member.size)
+        if len(data) != member.size or zlib.crc32(data) != member.crc:
+            raise tarfile.ReadError("CRC check failed for {!r}".format(name))
+        return data
+
+    def close(self):
+        self.index.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    with IndexedTarFile("example.tar") as t:
+        print("Index:", index_filename("example.tar"))
+        print("Names:", t.getnames())
+        for filename in ["./tarfile_getnames.py", "notthere.txt"]:
+            try:
+                member = t.getmember(filename)
+            except KeyError:
+                print("ERROR: Did not find {} in tar archive".format(filename))
+            else:
+                print(member)
+                print(filename, ":")
+                print(t.read(filename).decode("utf-8"))
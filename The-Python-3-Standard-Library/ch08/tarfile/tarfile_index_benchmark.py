@@ -0,0 +1,78 @@
+# tarfile_index_benchmark.py
+import argparse
+import io
+import os
+import random
+import tarfile
+import tempfile
+import time
+
+from tarfile_index import IndexedTarFile, index_filename, save_index
+
+
+def make_archive(filename, count):
+    with tarfile.open(filename, "w") as t:
+        for i in range(count):
+            data = b"member %d\n" % i
+            info = tarfile.TarInfo("dir{:04d}/file{}.txt".format(i // 100, i))
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+
+
+def tarfile_cold(filename, name):
+    with tarfile.open(filename, "r") as t:
+        return t.extractfile(name).read()
+
+
+def indexed_cold(filename, name):
+    with IndexedTarFile(filename) as t:
+        return t.read(name)
+
+
+def per_lookup(func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    return (time.perf_counter() - start) / len(names) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "members.tar")
+        make_archive(filename, args.members)
+        with tarfile.open(filename, "r") as t:
+            names = random.Random(0).sample(t.getnames(), args.lookups)
+
+        start = time.perf_counter()
+        save_index(filename)
+        build = time.perf_counter() - start
+        print("{} members".format(args.members))
+        print(
+            "index built in {:.2f} s, {} bytes".format(
+                build, os.path.getsize(index_filename(filename))
+            )
+        )
+        print()
+
+        template = "{:<26} {:>10}"
+        print(template.format("single member read", "ms"))
+        print(template.format("-" * 26, "-" * 10))
+        results = [
+            ("TarFile, open each time", lambda n: tarfile_cold(filename, n)),
+            ("indexed, open each time", lambda n: indexed_cold(filename, n)),
+        ]
+        with tarfile.open(filename, "r") as t, IndexedTarFile(filename) as it:
+            # Once getmembers() has read every header, TarFile looks
+            # names up in memory.
+            t.getmembers()
+            results.append(
+                ("TarFile, already open", lambda n: t.extractfile(n).read())
+            )
+            results.append(("indexed, already open", it.read))
+            for name, func in results:
+                print(template.format(name, "{:.3f}".format(per_lookup(func, names))))
@@ -0,0 +1,195 @@
+# tarfile_parallel.py
+import collections
+import concurrent.futures
+import os
+import struct
+import tarfile
+import zlib
+
+BLOCK_SIZE = 1024 * 1024
+
+# deflate can refer back at most 32 KB, so that is all of the
+# previous data a compressor needs to see.
+WINDOW_SIZE = 32 * 1024
+
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# Files in these formats are already compressed, and deflating them
+# again costs time without saving space.
+COMPRESSED_EXTENSIONS = set(
+    ".7z .bz2 .gif .gz .jar .jpeg .jpg .mkv .mov .mp3 .mp4 .png .tgz .webp "
+    ".whl .xz .zip .zst".split()
+)
+
+COMPRESSED_SIGNATURES = [
+    b"\x1f\x8b",  # gzip
+    b"BZh",  # bz2
+    b"\xfd7zXZ\x00",  # xz
+    b"PK\x03\x04",  # zip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"7z\xbc\xaf\x27\x1c",  # 7-zip
+    b"\x89PNG",  # png
+    b"\xff\xd8\xff",  # jpeg
+    b"GIF8",  # gif
+]
+
+
+def is_compressed(name, head):
+    """Guess from the name or first bytes if data is already compressed."""
+    if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    return any(head.startswith(s) for s in COMPRESSED_SIGNATURES)
+
+
+def compress_block(block, dictionary, last, level):
+    """Compress one block as raw deflate data.
+
+    Every block except the last ends with a sync flush, so the
+    compressed blocks can be concatenated into one deflate stream.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(block) + compressor.flush(mode)
+
+
+def list_files(root):
+    """Return sorted (path, arcname) pairs for everything under root.
+
+    Directories are listed as well as files, so that empty ones are
+    kept in the archive.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            files.append((path, os.path.relpath(path, root)))
+    files.sort(key=lambda f: f[1])
+    return files
+
+
+class ParallelGzipWriter:
+    """Write-only gzip file that compresses blocks in a pool of workers.
+
+    Data is collected into blocks that are compressed in parallel and
+    written in order, so the output is one ordinary gzip stream. The
+    output is only ever appended to, so it can be a pipe or socket.
+    Changing level starts a new block, which lets a caller store data
+    that is already compressed with level 0.
+    """
+
+    def __init__(
+        self, fileobj, level=6, workers=None, executor=None, block_size=BLOCK_SIZE
+    ):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count()
+        executor = executor or concurrent.futures.ThreadPoolExecutor
+        self._pool = executor(self.workers)
+        self._pending = collections.deque()
+        self._level = level
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+        self.closed = False
+        fileobj.write(GZIP_HEADER)
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        if level != self._level:
+            self._submit(last=False)
+            self._level = level
+
+    def _submit(self, last):
+        if not self._buffer and not last:
+            return
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        self._pending.append(
+            self._pool.submit(
+                compress_block, block, self._dictionary, last, self._level
+            )
+        )
+        self._dictionary = (self._dictionary + block)[-WINDOW_SIZE:]
+        while len(self._pending) > self.workers * 2:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        view = memoryview(data).cast("B")
+        while view:
+            space = self.block_size - len(self._buffer)
+            self._buffer += view[:space]
+            view = view[space:]
+            if len(self._buffer) == self.block_size:
+                self._submit(last=False)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._submit(last=True)
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+        self._pool.shutdown()
+        self.fileobj.write(struct.pack("<II", self._crc, self._size & 0xFFFFFFFF))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_tar_gz(output, files, level=6, workers=None, executor=None):
+    """Write files, a list of (path, arcname), as a gzip compressed tar.
+
+    A directory in files is added by itself, without its contents.
+    """
+    with ParallelGzipWriter(output, level, workers, executor) as gz:
+        with tarfile.open(fileobj=gz, mode="w") as tar:
+            for path, arcname in files:
+                if os.path.isdir(path):
+                    tar.add(path, arcname, recursive=False)
+                    continue
+                with open(path, "rb") as f:
+                    head = f.read(16)
+                if is_compressed(arcname, head):
+                    # Store the member, then go back to compressing.
+                    gz.level = 0
+                    tar.add(path, arcname)
+                    gz.level = level
+                else:
+                    tar.add(path, arcname)
+
+
+if __name__ == "__main__":
+    files = [
+        ("README.txt", "README.txt"),
+        ("tarfile_parallel.py", "tarfile_parallel.py"),
+        ("tarfile_compression.tar.gz", "tarfile_compression.tar.gz"),
+    ]
+    with open("tarfile_parallel.tar.gz", "wb") as output:
+        write_tar_gz(output, files)
+
+    fmt = "{:<30} {:<10}"
+    filename = "tarfile_parallel.tar.gz"
+    print(fmt.format(filename, os.stat(filename).st_size), end=" ")
+    print([m.name for m in tarfile.open(filename, "r:gz").getmembers()])
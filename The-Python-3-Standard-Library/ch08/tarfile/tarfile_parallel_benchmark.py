@@ -0,0 +1,84 @@
+# tarfile_parallel_benchmark.py
+import argparse
+import concurrent.futures
+import os
+import tarfile
+import tempfile
+import time
+
+from tarfile_parallel import list_files, write_tar_gz
+from tarfile_parallel_extract_benchmark import make_archive
+
+
+def stdlib_tar_gz(output, files):
+    # tarfile uses compresslevel 9 by default, match write_tar_gz() instead.
+    with tarfile.open(output, "w:gz", compresslevel=6) as tar:
+        for path, arcname in files:
+            tar.add(path, arcname, recursive=False)
+
+
+def parallel_tar_gz(output, files, workers, executor=None):
+    with open(output, "wb") as f:
+        write_tar_gz(f, files, workers=workers, executor=executor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, "tree")
+        archive = os.path.join(tmpdir, "tree.tar.gz")
+        make_archive(archive, args.files)
+        with tarfile.open(archive) as tar:
+            tar.extractall(root, filter="data")
+        files = list_files(root)
+        sizes = [
+            os.path.getsize(path) for path, arcname in files if os.path.isfile(path)
+        ]
+        total = sum(sizes) / 2**20
+        print("{} files, {:.1f} MB".format(len(sizes), total))
+        print()
+
+        runs = [("w:gz", lambda output: stdlib_tar_gz(output, files))]
+        workers = 1
+        while workers <= args.max_workers:
+            runs.append(
+                (
+                    "{} threads".format(workers),
+                    lambda output, w=workers: parallel_tar_gz(output, files, w),
+                )
+            )
+            workers *= 2
+        runs.append(
+            (
+                "{} processes".format(args.max_workers),
+                lambda output: parallel_tar_gz(
+                    output,
+                    files,
+                    args.max_workers,
+                    concurrent.futures.ProcessPoolExecutor,
+                ),
+            )
+        )
+
+        template = "{:<14} {:>8} {:>8} {:>11}"
+        print(template.format("builder", "seconds", "MB/s", "size"))
+        print(template.format("-" * 14, "-" * 8, "-" * 8, "-" * 11))
+        for name, build in runs:
+            output = os.path.join(tmpdir, "out.tar.gz")
+            start = time.perf_counter()
+            build(output)
+            elapsed = time.perf_counter() - start
+            with tarfile.open(output, "r:gz") as tar:
+                assert len(tar.getmembers()) == len(files)
+            print(
+                template.format(
+                    name,
+                    "{:.2f}".format(elapsed),
+                    "{:.1f}".format(total / elapsed),
+                    os.path.getsize(output),
+                )
+            )
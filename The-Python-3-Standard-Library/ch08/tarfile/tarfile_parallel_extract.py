@@ -0,0 +1,187 @@
+# tarfile_parallel_extract.py
+import collections
+import concurrent.futures
+import os
+import tarfile
+
+CHUNK_SIZE = 1024 * 1024
+
+# Stop reading the archive while this much data is waiting to be
+# written, so memory use does not depend on the size of the archive.
+MAX_PENDING = 64 * 1024 * 1024
+
+
+def set_attrs(target, member):
+    if member.mode is not None:
+        os.chmod(target, member.mode)
+    if member.mtime is not None:
+        os.utime(target, (member.mtime, member.mtime))
+
+
+def write_file(target, data, member):
+    """Write a whole file and set its mode and time."""
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+    set_attrs(target, member)
+
+
+def create_file(target, size):
+    """Create an empty file, reserving space for size bytes if possible.
+
+    Reserving the space up front lets the file system lay the file out
+    in one piece, even though its chunks may be written out of order.
+    """
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                pass  # not supported by this file system
+    finally:
+        os.close(fd)
+
+
+def write_chunk(target, data, offset):
+    """Write one chunk of a file that create_file() made."""
+    fd = os.open(target, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
+
+
+def extract_parallel(name, path=".", workers=None, filter=tarfile.data_filter):
+    """Extract all members of the archive name into path.
+
+    The archive is read once, in stream mode, so a compressed archive
+    is only decompressed once, by the calling thread. Regular files are
+    handed to a pool of threads, which check them with filter and write
+    them. filter is tarfile.data_filter by default, which rejects
+    absolute paths, paths and links that lead outside of path, and
+    special files, and removes unsafe permission bits.
+
+    Links change where later paths lead, so before a link is checked
+    and created all of the files before it are finished. Every member
+    is therefore checked against the same files and links it would see
+    if the archive were extracted one member at a time. Files larger
+    than CHUNK_SIZE are created and preallocated by the calling thread,
+    and their chunks written by the pool.
+    """
+    dest = os.path.realpath(path)
+    directories = []
+    large_files = []
+    created = {dest}
+
+    def make_parents(target):
+        parent = os.path.dirname(target)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+
+    def extract_file(member, data):
+        member = filter(member, dest)
+        if member is not None:
+            target = os.path.join(dest, member.name)
+            make_parents(target)
+            write_file(target, data, member)
+
+    pool = concurrent.futures.ThreadPoolExecutor(workers)
+    with pool, tarfile.open(name, "r|*") as t:
+        # Futures for the submitted writes, and the bytes they hold.
+        pending = collections.deque()
+        pending_bytes = 0
+
+        def wait_for(limit=None):
+            """Wait until at most limit bytes, or no writes, are pending."""
+            nonlocal pending_bytes
+            while pending and (limit is None or pending_bytes > limit):
+                future, size = pending.popleft()
+                future.result()
+                pending_bytes -= size
+
+        def submit(size, func, *args):
+            nonlocal pending_bytes
+            pending.append((pool.submit(func, *args), size))
+            pending_bytes += size
+            wait_for(MAX_PENDING)
+
+        names = set()
+        for member in t:
+            if member.name in names:
+                # A later member replaces an earlier one with the same
+                # name, so the earlier one has to be written first.
+                wait_for()
+            names.add(member.name)
+            if member.isreg() and member.size <= CHUNK_SIZE:
+                data = t.extractfile(member).read()
+                submit(len(data), extract_file, member, data)
+                continue
+
+            if member.issym() or member.islnk():
+                wait_for()
+            member = filter(member, dest)
+            if member is None:
+                continue
+            target = os.path.join(dest, member.name)
+            if member.isdir():
+                if target not in created:
+                    os.makedirs(target, exist_ok=True)
+                    created.add(target)
+                directories.append((target, member))
+            elif member.isreg():
+                make_parents(target)
+                create_file(target, member.size)
+                source = t.extractfile(member)
+                offset = 0
+                while offset < member.size:
+                    data = source.read(CHUNK_SIZE)
+                    submit(len(data), write_chunk, target, data, offset)
+                    offset += len(data)
+                large_files.append((target, member))
+            elif member.issym() or member.islnk():
+                make_parents(target)
+                if os.path.lexists(target):
+                    os.unlink(target)
+                if member.issym():
+                    os.symlink(member.linkname, target)
+                else:
+                    os.link(os.path.join(dest, member.linkname), target)
+        wait_for()
+
+    for target, member in large_files:
+        set_attrs(target, member)
+    # Set directory times last, since adding files to them changes them.
+    for target, member in reversed(directories):
+        set_attrs(target, member)
+
+
+if __name__ == "__main__":
+    import io
+
+    os.mkdir("outdir")
+    extract_parallel("example.tar", "outdir")
+    print(sorted(os.listdir("outdir")))
+
+    # Build an archive with a member that tries to escape.
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as t:
+        data = b"not allowed\n"
+        info = tarfile.TarInfo("../escaped.txt")
+        info.size = len(data)
+        t.addfile(info, io.BytesIO(data))
+    with open("outdir/bad.tar", "wb") as f:
+        f.write(buffer.getvalue())
+    try:
+        extract_parallel("outdir/bad.tar", "outdir")
+    except tarfile.FilterError as err:
+        print("ERROR:", type(err).__name__, err.tarinfo.name)
@@ -0,0 +1,89 @@
+# tarfile_parallel_extract_benchmark.py
+import argparse
+import io
+import os
+import random
+import shutil
+import tarfile
+import tempfile
+import time
+
+from tarfile_parallel_extract import extract_parallel
+
+WORDS = open(__file__).read().split()
+
+
+def make_archive(filename, count, seed=0):
+    """Write a gzip compressed tar of count small text files."""
+    rng = random.Random(seed)
+    with tarfile.open(filename, "w:gz", compresslevel=6) as t:
+        for i in range(count):
+            size = rng.randint(512, 16 * 1024)
+            data = " ".join(rng.choices(WORDS, k=size // 5)).encode("utf-8")[:size]
+            info = tarfile.TarInfo("dir{:03d}/file{}.txt".format(i // 500, i))
+            info.size = len(data)
+            info.mtime = 1700000000
+            t.addfile(info, io.BytesIO(data))
+
+
+def stdlib_extractall(filename, path):
+    with tarfile.open(filename, "r:*") as t:
+        t.extractall(path, filter="data")
+
+
+def stdlib_unpack_archive(filename, path):
+    shutil.unpack_archive(filename, path, filter="data")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="report the best run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "files.tar.gz")
+        make_archive(filename, args.files)
+        print(
+            "{} files, {:.1f} MB compressed".format(
+                args.files, os.path.getsize(filename) / 2**20
+            )
+        )
+        print()
+
+        runs = [
+            ("extractall", stdlib_extractall),
+            ("unpack_archive", stdlib_unpack_archive),
+        ]
+        workers = 1
+        while workers <= args.max_workers:
+            runs.append(
+                (
+                    "{} threads".format(workers),
+                    lambda f, p, w=workers: extract_parallel(f, p, workers=w),
+                )
+            )
+            workers *= 2
+
+        template = "{:<15} {:>8} {:>8}"
+        print(template.format("extractor", "seconds", "files/s"))
+        print(template.format("-" * 15, "-" * 8, "-" * 8))
+        for name, extract in runs:
+            output = os.path.join(tmpdir, "out")
+            best = None
+            for i in range(args.repeat):
+                # Flush the files of the last run first, so writing them
+                # back does not slow down this one.
+                os.sync()
+                start = time.perf_counter()
+                extract(filename, output)
+                elapsed = time.perf_counter() - start
+                assert len(os.listdir(output)) == (args.files + 499) // 500
+                shutil.rmtree(output)
+                best = elapsed if best is None else min(best, elapsed)
+            print(
+                template.format(
+                    name, "{:.2f}".format(best), "{:.0f}".format(args.files / best)
+                )
+            )
@@ -0,0 +1,195 @@
+# zipfile_index.py
+import bisect
+import mmap
+import os
+import struct
+import zipfile
+
+INDEX_MAGIC = b"ZIPIDX3\n"
+INDEX_HEADER = struct.Struct("<QQI")  # archive size, mtime, count
+# name offset, name length, header offset, compressed size, size, CRC,
+# compression type, flags
+INDEX_ENTRY = struct.Struct("<QIQQQIHH")
+
+# Signature, then the lengths of the name and extra field, from the
+# local file header that comes before each member's data.
+LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+def index_filename(filename):
+    return filename + ".idx"
+
+
+def save_index(filename):
+    """Write a sidecar index of the members of a ZIP archive.
+
+    The entries are sorted by name, and the names are stored after the
+    fixed-size entries, so a lookup can binary search the index in
+    place without loading it.
+    """
+    st = os.stat(filename)
+    with zipfile.ZipFile(filename) as zf:
+        # A later member with the same name replaces an earlier one, as
+        # with ZipFile.getinfo().
+        members = {info.filename.encode("utf-8"): info for info in zf.infolist()}
+    names = []
+    entries = []
+    name_offset = 0
+    for name in sorted(members):
+        info = members[name]
+        entries.append(
+            INDEX_ENTRY.pack(
+                name_offset,
+                len(name),
+                info.header_offset,
+                info.compress_size,
+                info.file_size,
+                info.CRC,
+                info.compress_type,
+                info.flag_bits,
+            )
+        )
+        names.append(name)
+        name_offset += len(name)
+    with open(index_filename(filename), "wb") as output:
+        output.write(INDEX_MAGIC)
+        output.write(INDEX_HEADER.pack(st.st_size, st.st_mtime_ns, len(entries)))
+        output.write(b"".join(entries))
+        output.write(b"".join(names))
+
+
+class MemberIndex:
+    """Sorted member index, read in place from a memory mapped sidecar."""
+
+    def __init__(self, data):
+        self._data = data
+        size, mtime, self.count = INDEX_HEADER.unpack_from(data, len(INDEX_MAGIC))
+        self._entries = len(INDEX_MAGIC) + INDEX_HEADER.size
+        self._names = self._entries + INDEX_ENTRY.size * self.count
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._data, self._entries + INDEX_ENTRY.size * i)
+
+    def __getitem__(self, i):
+        """Return the encoded name of entry i, so bisect can search names."""
+        name_offset, name_length = struct.unpack_from(
+            "<QI", self._data, self._entries + INDEX_ENTRY.size * i
+        )
+        start = self._names + name_offset
+        return self._data[start : start + name_length]
+
+    def find(self, name):
+        """Return the entry for name, or raise KeyError."""
+        key = name.encode("utf-8")
+        i = bisect.bisect_left(self, key)
+        if i == len(self) or self[i] != key:
+            raise KeyError(name)
+        return self.entry(i)
+
+    def close(self):
+        self._data.close()
+
+
+def load_index(filename):
+    """Return a MemberIndex, or None if the sidecar is missing or stale."""
+    try:
+        input = open(index_filename(filename), "rb")
+    except FileNotFoundError:
+        return None
+    with input:
+        if input.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        size, mtime, count = INDEX_HEADER.unpack(input.read(INDEX_HEADER.size))
+        st = os.stat(filename)
+        if (size, mtime) != (st.st_size, st.st_mtime_ns):
+            return None
+        # The mapping stays valid after the file is closed.
+        return MemberIndex(mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class IndexedZipFile:
+    """Read single members of a ZIP archive by way of a sidecar index.
+
+    ZipFile parses the whole central directory when it is opened. Here
+    only the index entry for the requested name is read, then the
+    member's local header and data.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index = load_index(filename)
+        if self.index is None:
+            save_index(filename)
+            self.index = load_index(filename)
+        self.fp = open(filename, "rb")
+
+    def getinfo(self, name):
+        (
+            name_offset,
+            name_length,
+            header_offset,
+            compress_size,
+            file_size,
+            crc,
+            compress_type,
+            flag_bits,
+        ) = self.index.find(name)
+        info = zipfile.ZipInfo(name)
+        info.header_offset = header_offset
+        info.compress_size = compress_size
+        info.file_size = file_size
+        info.CRC = crc
+        info.compress_type = compress_type
+        info.flag_bits = flag_bits
+        return info
+
+    def namelist(self):
+        return [self.index[i].decode("utf-8") for i in range(len(self.index))]
+
+    def open(self, name):
+        """Return a file object for the member, which checks its CRC."""
+        info = self.getinfo(name)
+        if info.flag_bits & 0x1:
+            # As ZipFile.open() does when no password is given
+            raise RuntimeError(
+                "File {!r} is encrypted, password required for extraction".format(name)
+            )
+        self.fp.seek(info.header_offset)
+        signature, name_length, extra_length = LOCAL_HEADER.unpack(
+            self.fp.read(LOCAL_HEADER.size)
+        )
+        if signature != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile("bad local file header for {!r}".format(name))
+        self.fp.seek(name_length + extra_length, os.SEEK_CUR)
+        return zipfile.ZipExtFile(self.fp, "r", info)
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def close(self):
+        self.index.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    with IndexedZipFile("example.zip") as zf:
+        print("Index:", index_filename("example.zip"))
+        print("Names:", zf.namelist())
+        for filename in ["README.txt", "notthere.txt"]:
+            try:
+                info = zf.getinfo(filename)
+            except KeyError:
+                print("ERROR: Did not find {} in zip file".format(filename))
+            else:
+                print("{} is {} bytes".format(info.filename, info.file_size))
+                print(repr(zf.read(filename)[:40]))
@@ -0,0 +1,69 @@
+# zipfile_index_benchmark.py
+import argparse
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from zipfile_index import IndexedZipFile, index_filename, save_index
+
+
+def make_archive(filename, count):
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(count):
+            zf.writestr("dir{:04d}/file{}.txt".format(i // 100, i), b"member %d\n" % i)
+
+
+def zipfile_cold(filename, name):
+    with zipfile.ZipFile(filename) as zf:
+        return zf.read(name)
+
+
+def indexed_cold(filename, name):
+    with IndexedZipFile(filename) as zf:
+        return zf.read(name)
+
+
+def per_lookup(func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    return (time.perf_counter() - start) / len(names) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "members.zip")
+        make_archive(filename, args.members)
+        with zipfile.ZipFile(filename) as zf:
+            names = random.Random(0).sample(zf.namelist(), args.lookups)
+
+        start = time.perf_counter()
+        save_index(filename)
+        build = time.perf_counter() - start
+        print("{} members".format(args.members))
+        print(
+            "index built in {:.2f} s, {} bytes".format(
+                build, os.path.getsize(index_filename(filename))
+            )
+        )
+        print()
+
+        template = "{:<26} {:>10}"
+        print(template.format("single member read", "ms"))
+        print(template.format("-" * 26, "-" * 10))
+        results = [
+            ("ZipFile, open each time", lambda n: zipfile_cold(filename, n)),
+            ("indexed, open each time", lambda n: indexed_cold(filename, n)),
+        ]
+        with zipfile.ZipFile(filename) as zf, IndexedZipFile(filename) as izf:
+            results.append(("ZipFile, already open", zf.read))
+            results.append(("indexed, already open", izf.read))
+            for name, func in results:
+                print(template.format(name, "{:.3f}".format(per_lookup(func, names))))
@@ -0,0 +1,249 @@
+# zipfile_parallel.py
+import collections
+import concurrent.futures
+import os
+import struct
+import zipfile
+import zlib
+
+BLOCK_SIZE = 1024 * 1024
+
+# deflate can refer back at most 32 KB, so that is all of the
+# previous block a compressor needs to see.
+WINDOW_SIZE = 32 * 1024
+
+# Files in these formats are already compressed, and deflating them
+# again costs time without saving space.
+COMPRESSED_EXTENSIONS = set(
+    ".7z .bz2 .gif .gz .jar .jpeg .jpg .mkv .mov .mp3 .mp4 .png .tgz .webp "
+    ".whl .xz .zip .zst".split()
+)
+
+COMPRESSED_SIGNATURES = [
+    b"\x1f\x8b",  # gzip
+    b"BZh",  # bz2
+    b"\xfd7zXZ\x00",  # xz
+    b"PK\x03\x04",  # zip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"7z\xbc\xaf\x27\x1c",  # 7-zip
+    b"\x89PNG",  # png
+    b"\xff\xd8\xff",  # jpeg
+    b"GIF8",  # gif
+]
+
+DATA_DESCRIPTOR = struct.Struct("<LLLL")
+DATA_DESCRIPTOR64 = struct.Struct("<LLQQ")
+DATA_DESCRIPTOR_SIGNATURE = 0x08074B50
+USE_DATA_DESCRIPTOR = 0x08
+
+
+def is_compressed(name, head):
+    """Guess from the name or first bytes if data is already compressed."""
+    if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    return any(head.startswith(s) for s in COMPRESSED_SIGNATURES)
+
+
+def compress_block(block, dictionary, last, level):
+    """Compress one block of a member as raw deflate data.
+
+    Every block except the last ends with a sync flush, so the
+    compressed blocks can be concatenated into one deflate stream.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(block) + compressor.flush(mode)
+
+
+def read_blocks(input, block_size):
+    """Yield (block, dictionary, last) for each block of input."""
+    dictionary = b""
+    block = input.read(block_size)
+    while True:
+        following = input.read(block_size)
+        yield block, dictionary, not following
+        if not following:
+            break
+        dictionary = block[-WINDOW_SIZE:]
+        block = following
+
+
+def list_files(root):
+    """Return sorted (path, arcname) pairs for everything under root.
+
+    Directories are listed as well as files, so that empty ones are
+    kept in the archive.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            files.append((path, os.path.relpath(path, root)))
+    files.sort(key=lambda f: f[1])
+    return files
+
+
+class _MemberWriter:
+    """Write members to a ZipFile from precompressed data.
+
+    The CRC and sizes are not known when the local header is written,
+    so they follow the data in a data descriptor. The output therefore
+    never has to seek, and can be a pipe or socket.
+
+    ZipFile has no public way to add data that is already compressed,
+    so this uses the internal attributes in ZIPFILE_ATTRIBUTES, which
+    ZipFile.write() uses in the same way. They are not part of the
+    documented API, so supported() checks for them first.
+    """
+
+    ZIPFILE_ATTRIBUTES = ("fp", "start_dir", "_seekable", "_didModify", "_writecheck")
+
+    @classmethod
+    def supported(cls, zf):
+        return all(hasattr(zf, name) for name in cls.ZIPFILE_ATTRIBUTES)
+
+    def __init__(self, zf):
+        self.zf = zf
+        self.compress_size = 0
+
+    def start(self, zinfo):
+        zf = self.zf
+        zinfo.flag_bits = USE_DATA_DESCRIPTOR
+        zinfo.CRC = 0
+        zinfo.compress_size = 0
+        self.zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.fp.write(zinfo.FileHeader(self.zip64))
+        self.compress_size = 0
+
+    def data(self, data):
+        self.zf.fp.write(data)
+        self.compress_size += len(data)
+
+    def end(self, zinfo, crc):
+        zf = self.zf
+        zinfo.CRC = crc
+        zinfo.compress_size = self.compress_size
+        descriptor = DATA_DESCRIPTOR64 if self.zip64 else DATA_DESCRIPTOR
+        zf.fp.write(
+            descriptor.pack(
+                DATA_DESCRIPTOR_SIGNATURE, crc, zinfo.compress_size, zinfo.file_size
+            )
+        )
+        zf.start_dir = zf.fp.tell()
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def write_zip(
+    output, files, level=6, workers=None, executor=None, block_size=BLOCK_SIZE
+):
+    """Write files, a list of (path, arcname), to a new ZIP archive.
+
+    Blocks of every member are deflated by a pool of workers, and
+    written to the archive in the order of files, so the same input
+    always produces the same archive. zlib releases the GIL while it
+    compresses, so a ThreadPoolExecutor runs the blocks in parallel;
+    pass a ProcessPoolExecutor class as executor to use processes
+    instead. Only a few blocks per worker are in flight at a time, so
+    memory use does not depend on the size of the files.
+
+    A directory in files is added as a directory entry, without its
+    contents. With a version of zipfile that _MemberWriter does not
+    support, the members are compressed one at a time with
+    ZipFile.write().
+    """
+    workers = workers or os.cpu_count()
+    executor = executor or concurrent.futures.ThreadPoolExecutor
+    with zipfile.ZipFile(output, "w") as zf:
+        if not _MemberWriter.supported(zf):
+            _write_serial(zf, files, level)
+            return
+        with executor(workers) as pool:
+            _write_parallel(zf, pool, files, level, workers, block_size)
+
+
+def _compress_type(arcname, head, level):
+    if level and not is_compressed(arcname, head):
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+
+def _write_serial(zf, files, level):
+    for path, arcname in files:
+        if os.path.isdir(path):
+            zf.write(path, arcname)
+            continue
+        with open(path, "rb") as input:
+            head = input.read(16)
+        zf.write(path, arcname, _compress_type(arcname, head, level), level)
+
+
+def _write_parallel(zf, pool, files, level, workers, block_size):
+    writer = _MemberWriter(zf)
+    # Each entry is a step for the writer. Compressed blocks are
+    # futures, so they are written in the order they were submitted.
+    pending = collections.deque()
+    blocks = 0
+
+    def write_next():
+        nonlocal blocks
+        step, value = pending.popleft()
+        if step == "data":
+            if isinstance(value, concurrent.futures.Future):
+                value = value.result()
+            writer.data(value)
+            blocks -= 1
+        else:
+            step(*value)
+
+    for path, arcname in files:
+        if os.path.isdir(path):
+            # A directory entry has no data, so ZipFile writes it.
+            pending.append((zf.write, (path, arcname)))
+            continue
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        with open(path, "rb") as input:
+            crc = 0
+            for i, (block, dictionary, last) in enumerate(
+                read_blocks(input, block_size)
+            ):
+                if i == 0:
+                    zinfo.compress_type = _compress_type(arcname, block, level)
+                    pending.append((writer.start, (zinfo,)))
+                crc = zlib.crc32(block, crc)
+                if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+                    block = pool.submit(compress_block, block, dictionary, last, level)
+                pending.append(("data", block))
+                blocks += 1
+                while blocks > workers * 2:
+                    write_next()
+        pending.append((writer.end, (zinfo, crc)))
+    while pending:
+        write_next()
+
+
+if __name__ == "__main__":
+    from zipfile_infolist import print_info
+
+    files = [
+        ("README.txt", "README.txt"),
+        ("zipfile_parallel.py", "zipfile_parallel.py"),
+        ("example.zip", "example.zip"),
+    ]
+    print("creating archive")
+    write_zip("parallel.zip", files)
+    print()
+    print_info("parallel.zip")
+
+    with zipfile.ZipFile("parallel.zip") as zf:
+        print("testzip():", zf.testzip())
@@ -0,0 +1,101 @@
+# zipfile_parallel_benchmark.py
+import argparse
+import concurrent.futures
+import gzip
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from zipfile_parallel import list_files, write_zip
+
+WORDS = open(__file__).read().split()
+
+
+def make_tree(root, count, seed=0):
+    """Create count files under root, like a build artifact tree.
+
+    Most files are small text files, every 20th one is a .gz file that
+    is already compressed, and every 1000th one is a large text file.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        directory = os.path.join(root, "dir{:03d}".format(i // 100))
+        os.makedirs(directory, exist_ok=True)
+        if i % 1000 == 999:
+            size = 8 * 2**20
+        else:
+            size = rng.randint(512, 16 * 1024)
+        text = " ".join(rng.choices(WORDS, k=size // 5)).encode("utf-8")[:size]
+        if i % 20 == 19:
+            with open(os.path.join(directory, "file{}.gz".format(i)), "wb") as f:
+                f.write(gzip.compress(text, 6))
+        else:
+            with open(os.path.join(directory, "file{}.txt".format(i)), "wb") as f:
+                f.write(text)
+
+
+def stdlib_zip(output, files):
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in files:
+            zf.write(path, arcname)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, "tree")
+        make_tree(root, args.files)
+        files = list_files(root)
+        sizes = [
+            os.path.getsize(path) for path, arcname in files if os.path.isfile(path)
+        ]
+        total = sum(sizes) / 2**20
+        print("{} files, {:.1f} MB".format(len(sizes), total))
+        print()
+
+        runs = [("ZipFile.write", lambda output: stdlib_zip(output, files))]
+        workers = 1
+        while workers <= args.max_workers:
+            runs.append(
+                (
+                    "{} threads".format(workers),
+                    lambda output, w=workers: write_zip(output, files, workers=w),
+                )
+            )
+            workers *= 2
+        runs.append(
+            (
+                "{} processes".format(args.max_workers),
+                lambda output: write_zip(
+                    output,
+                    files,
+                    workers=args.max_workers,
+                    executor=concurrent.futures.ProcessPoolExecutor,
+                ),
+            )
+        )
+
+        template = "{:<14} {:>8} {:>8} {:>11}"
+        print(template.format("builder", "seconds", "MB/s", "size"))
+        print(template.format("-" * 14, "-" * 8, "-" * 8, "-" * 11))
+        for name, build in runs:
+            output = os.path.join(tmpdir, "out.zip")
+            start = time.perf_counter()
+            build(output)
+            elapsed = time.perf_counter() - start
+            with zipfile.ZipFile(output) as zf:
+                assert zf.testzip() is None
+            print(
+                template.format(
+                    name,
+                    "{:.2f}".format(elapsed),
+                    "{:.1f}".format(total / elapsed),
+                    os.path.getsize(output),
+                )
+            )
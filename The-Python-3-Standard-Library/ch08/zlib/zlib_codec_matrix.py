@@ -0,0 +1,48 @@
+# zlib_codec_matrix.py
+import argparse
+import time
+
+from zlib_server_negotiate import CODECS
+
+
+def run(codec, level, data):
+    compressor = CODECS[codec][0](level)
+    start = time.perf_counter()
+    compressed = compressor.compress(data) + compressor.flush()
+    compress_time = time.perf_counter() - start
+
+    decompressor = CODECS[codec][1]()
+    start = time.perf_counter()
+    decompressed = decompressor.decompress(compressed)
+    decompress_time = time.perf_counter() - start
+    assert decompressed == data
+
+    mb = len(data) / 2 ** 20
+    return (len(data) / len(compressed),
+            mb / compress_time,
+            mb / decompress_time)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', default='lorem.txt')
+    parser.add_argument('--copies', type=int, default=5000,
+                        help='times to repeat the file contents')
+    parser.add_argument('--levels', default='1,6,9')
+    args = parser.parse_args()
+
+    data = open(args.file, 'rb').read() * args.copies
+    levels = [int(level) for level in args.levels.split(',')]
+
+    print('{:,} bytes of {}'.format(len(data), args.file))
+    print()
+    template = '{:<5} {:>5} {:>7} {:>14} {:>16}'
+    print(template.format(
+        'codec', 'level', 'ratio', 'compress MB/s', 'decompress MB/s'))
+    print(template.format('-' * 5, '-' * 5, '-' * 7, '-' * 14, '-' * 16))
+    for codec in CODECS:
+        for level in levels:
+            ratio, compress, decompress = run(codec, level, data)
+            print(template.format(
+                codec, level, '{:.1f}'.format(ratio),
+                '{:.1f}'.format(compress), '{:.1f}'.format(decompress)))
@@ -0,0 +1,515 @@
+# zlib_delta.py
+import collections
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import zlib
+
+BLOCK_SIZE = 32 * 1024
+
+# Literal data is sent in pieces of at most this size.
+MAX_DATA = 1024 * 1024
+
+# Adler-32 sums are kept modulo the largest prime below 2**16.
+ADLER_MOD = 65521
+
+# After a search for moved data fails, the next blocks that do not
+# match are not searched, and the number skipped doubles after each
+# failure up to this limit, so a file that has changed completely is
+# not searched one byte at a time.
+MAX_BACKOFF = 64
+
+# When a block does not match, the blocks up to this many block sizes
+# ahead are checked before searching.
+LOOKAHEAD = 4
+
+Signature = collections.namedtuple('Signature', 'block_size size weak strong')
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def signature(f, block_size=BLOCK_SIZE):
+    """Return the Signature of the file f, with two checksums per block.
+
+    The weak checksum is the Adler-32 of the block, which can be rolled
+    along the data one byte at a time, and the strong one a 128-bit
+    BLAKE2b digest, which is only compared when the weak ones match.
+    """
+    weak = []
+    strong = []
+    size = 0
+    buffer = bytearray(block_size)
+    with memoryview(buffer) as view:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            with view[:n] as block:
+                weak.append(zlib.adler32(block))
+                strong.append(strong_hash(block))
+            size += n
+    return Signature(block_size, size, weak, strong)
+
+
+def _matches(sig, view, inplace):
+    """Yield (offset, index) for each block of sig found in view.
+
+    Blocks are first looked for where the last match ended, or a few
+    block sizes further on, with the checksums computed by zlib and
+    hashlib. Only when none of those match is the Adler-32 rolled
+    along the data, in Python, to find blocks that have moved because
+    data was inserted or removed. With inplace, a block only matches at
+    its own offset, so no search is made.
+    """
+    bs = sig.block_size
+    full_blocks = sig.size // bs
+    table = {}
+    for index in range(full_blocks):
+        table.setdefault(sig.weak[index], []).append(index)
+
+    def find(offset, weak):
+        if inplace:
+            index, extra = divmod(offset, bs)
+            if (extra == 0 and index < full_blocks
+                    and sig.weak[index] == weak
+                    and sig.strong[index] == strong_hash(
+                        view[offset:offset + bs])):
+                return index
+            return None
+        candidates = table.get(weak)
+        if candidates:
+            digest = strong_hash(view[offset:offset + bs])
+            for index in candidates:
+                if sig.strong[index] == digest:
+                    return index
+        return None
+
+    size = len(view)
+    offset = 0
+    backoff = 1
+    skip = 0
+    while offset + bs <= size:
+        weak = zlib.adler32(view[offset:offset + bs])
+        index = find(offset, weak)
+        if index is not None:
+            yield offset, index
+            offset += bs
+            backoff = 1
+            continue
+
+        following = offset + bs
+        if inplace or skip:
+            skip = max(skip - 1, 0)
+            offset = following
+            continue
+        # If one of the next blocks matches, the data before it was
+        # changed rather than moved, and there is nothing to search for.
+        last = min(offset + LOOKAHEAD * bs, size - bs)
+        if any(find(ahead, zlib.adler32(view[ahead:ahead + bs])) is not None
+               for ahead in range(following, last + 1, bs)):
+            offset = following
+            continue
+
+        # Roll the checksum along the data, looking for any block.
+        a = weak & 0xffff
+        b = weak >> 16
+        found = None
+        for start in range(offset, min(following, size - bs)):
+            out = view[start]
+            a = (a - out + view[start + bs]) % ADLER_MOD
+            b = (b - bs * out + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+            if weak in table:
+                index = find(start + 1, weak)
+                if index is not None:
+                    found = start + 1
+                    break
+        if found is None:
+            skip = backoff
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            offset = following
+        else:
+            yield found, index
+            offset = found + bs
+            backoff = 1
+
+    # The last block of the old file may be shorter than the others.
+    tail = sig.size - full_blocks * bs
+    start = size - tail
+    if (tail and start >= offset
+            and (not inplace or start == full_blocks * bs)):
+        if (zlib.adler32(view[start:]) == sig.weak[-1]
+                and strong_hash(view[start:]) == sig.strong[-1]):
+            yield start, full_blocks
+
+
+def delta(sig, data, inplace=False):
+    """Yield the instructions for making data from the file with sig.
+
+    ('copy', index, count) copies count blocks starting with block
+    index of the old file, and ('data', view) writes literal data,
+    sliced from data without copying it.
+    """
+    with memoryview(data) as view:
+        position = 0
+        run = None
+        for offset, index in _matches(sig, view, inplace):
+            if offset > position:
+                if run:
+                    yield ('copy',) + tuple(run)
+                    run = None
+                for start in range(position, offset, MAX_DATA):
+                    yield 'data', view[start:min(start + MAX_DATA, offset)]
+            if run and run[0] + run[1] == index:
+                run[1] += 1
+            else:
+                if run:
+                    yield ('copy',) + tuple(run)
+                run = [index, 1]
+            position = offset + min(sig.block_size,
+                                    sig.size - index * sig.block_size)
+        if run:
+            yield ('copy',) + tuple(run)
+        for start in range(position, len(view), MAX_DATA):
+            yield 'data', view[start:start + MAX_DATA]
+
+
+def write_all(fd, data, offset=None):
+    with memoryview(data) as view:
+        while view:
+            if offset is None:
+                n = os.write(fd, view)
+            else:
+                n = os.pwrite(fd, view, offset)
+                offset += n
+            view = view[n:]
+
+
+def patch(old, ops, block_size, new):
+    """Write the file new from the blocks of the file old and ops.
+
+    Blocks are copied with os.copy_file_range(), so on Linux their
+    data stays in the kernel. Return a Counter of the bytes copied
+    and written.
+    """
+    stats = collections.Counter()
+    old_size = os.path.getsize(old)
+    with open(old, 'rb', buffering=0) as fold, \
+            open(new, 'wb', buffering=0) as fnew:
+        for op in ops:
+            if op[0] == 'data':
+                write_all(fnew.fileno(), op[1])
+                stats['written'] += len(op[1])
+                continue
+            _, index, count = op
+            offset = index * block_size
+            length = min(count * block_size, old_size - offset)
+            stats['copied'] += length
+            if hasattr(os, 'copy_file_range'):
+                while length:
+                    n = os.copy_file_range(fold.fileno(), fnew.fileno(),
+                                           length, offset)
+                    offset += n
+                    length -= n
+            else:
+                write_all(fnew.fileno(), os.pread(fold.fileno(), length,
+                                                  offset))
+    return stats
+
+
+def patch_inplace(path, ops, block_size, size):
+    """Apply ops from delta(inplace=True) to path, writing only changes.
+
+    Every block that is copied is already in place, so only the literal
+    data is written, and the file is then truncated to size.
+    """
+    stats = collections.Counter()
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        old_size = os.fstat(fd).st_size
+        position = 0
+        for op in ops:
+            if op[0] == 'data':
+                write_all(fd, op[1], position)
+                position += len(op[1])
+                stats['written'] += len(op[1])
+            else:
+                _, index, count = op
+                if index * block_size != position:
+                    raise ValueError('block {} is not in place'.format(index))
+                length = min(count * block_size, old_size - position)
+                position += length
+                stats['copied'] += length
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+    return stats
+
+
+def sync_file(src, dst, block_size=BLOCK_SIZE, inplace=False):
+    """Make dst a copy of src, reusing the blocks dst already has.
+
+    Without inplace the new contents are written to a temporary file
+    that replaces dst, like rsync. With inplace, only the blocks that
+    changed are written into dst. Return a Counter of the bytes copied
+    from dst and written from src.
+    """
+    with open(dst, 'rb') as f:
+        sig = signature(f, block_size)
+    with open(src, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+            if size else b''
+        ops = delta(sig, data, inplace)
+        if inplace:
+            stats = patch_inplace(dst, ops, block_size, size)
+        else:
+            tmp = os.path.join(os.path.dirname(dst),
+                               '.{}.tmp'.format(os.path.basename(dst)))
+            stats = patch(dst, ops, block_size, tmp)
+            os.replace(tmp, dst)
+        # After an error, slices of the map may still be referenced
+        # from the traceback, so it is only closed here, and otherwise
+        # when it is garbage collected.
+        if size:
+            data.close()
+    shutil.copystat(src, dst)
+    return stats
+
+
+def sync_tree(src, dst, block_size=BLOCK_SIZE, inplace=False):
+    """Update the tree dst to match src, using sync_file() for changes.
+
+    As with rsync, files with the same size and modification time are
+    assumed to be unchanged, files missing from dst are copied, and
+    files only in dst are left alone. Return a Counter of the files
+    and bytes handled.
+    """
+    stats = collections.Counter()
+    for dirpath, dirnames, filenames in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target, exist_ok=True)
+        for name in filenames:
+            source = os.path.join(dirpath, name)
+            dest = os.path.join(target, name)
+            st = os.stat(source)
+            try:
+                dst_st = os.stat(dest)
+            except FileNotFoundError:
+                shutil.copy2(source, dest)
+                stats['copied files'] += 1
+                stats['written'] += st.st_size
+                continue
+            if (dst_st.st_size == st.st_size
+                    and dst_st.st_mtime_ns == st.st_mtime_ns):
+                stats['unchanged files'] += 1
+                continue
+            stats.update(sync_file(source, dest, block_size, inplace))
+            stats['updated files'] += 1
+    return stats
+
+
+# Requests are the name of the file, whether to patch it in place,
+# the block size, and the size of the old file, followed by the
+# signature. Responses are the size of the new file and a stream of
+# operations, each followed by its literal data, compressed with zlib
+# if the server is set up to.
+REQUEST = struct.Struct('!HBIQ')
+SIGNATURE_ENTRY = struct.Struct('!I16s')
+NEW_SIZE = struct.Struct('!Q')
+OP = struct.Struct('!cQQ')
+
+
+def send_request(sock, name, sig, inplace=False):
+    """Send a request and return the number of bytes sent."""
+    name = name.encode('utf-8')
+    request = REQUEST.pack(len(name), inplace, sig.block_size, sig.size) \
+        + name + b''.join(SIGNATURE_ENTRY.pack(w, s)
+                          for w, s in zip(sig.weak, sig.strong))
+    sock.sendall(request)
+    return len(request)
+
+
+class DeltaRequestHandler(socketserver.BaseRequestHandler):
+    """Send the changes a client needs to bring its copy of a file up
+    to date, given the signature of that copy.
+
+    Files are looked up under root. With level set, the response is
+    compressed with zlib at that level.
+    """
+
+    logger = logging.getLogger('Server')
+    root = '.'
+    level = None
+
+    def handle(self):
+        rfile = self.request.makefile('rb')
+        name_size, inplace, block_size, size = REQUEST.unpack(
+            rfile.read(REQUEST.size))
+        name = rfile.read(name_size).decode('utf-8')
+        count = -(-size // block_size)
+        weak = []
+        strong = []
+        for w, s in SIGNATURE_ENTRY.iter_unpack(
+                rfile.read(count * SIGNATURE_ENTRY.size)):
+            weak.append(w)
+            strong.append(s)
+        sig = Signature(block_size, size, weak, strong)
+        self.logger.debug('client asked for: %r, %d blocks', name, count)
+
+        root = os.path.realpath(self.root)
+        filename = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, filename]) != root:
+            self.logger.debug('refusing %r', name)
+            return
+
+        compressor = None
+        if self.level is not None:
+            compressor = zlib.compressobj(self.level)
+
+        def send(data):
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                self.request.sendall(data)
+
+        with open(filename, 'rb') as f:
+            new_size = os.fstat(f.fileno()).st_size
+            send(NEW_SIZE.pack(new_size))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if new_size else b''
+            for op in delta(sig, data, inplace):
+                if op[0] == 'copy':
+                    send(OP.pack(b'C', op[1], op[2]))
+                else:
+                    send(OP.pack(b'D', len(op[1]), 0))
+                    send(op[1])
+                    op[1].release()
+            if new_size:
+                data.close()
+        send(OP.pack(b'E', 0, 0))
+        if compressor is not None:
+            self.request.sendall(compressor.flush())
+
+
+class _Inflater:
+    """Read exact amounts of data from a socket, decompressing it."""
+
+    def __init__(self, sock, compressed):
+        self.rfile = sock.makefile('rb')
+        self.decompressor = zlib.decompressobj() if compressed else None
+        self.buffer = bytearray()
+        self.received = 0
+
+    def read(self, size):
+        if self.decompressor is None:
+            data = self.rfile.read(size)
+            self.received += len(data)
+        else:
+            while len(self.buffer) < size:
+                data = self.decompressor.unconsumed_tail
+                if not data:
+                    data = self.rfile.read1(65536)
+                    self.received += len(data)
+                if not data:
+                    break
+                self.buffer += self.decompressor.decompress(data, MAX_DATA)
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+        if len(data) < size:
+            raise EOFError('connection closed')
+        return data
+
+
+def receive_ops(stream):
+    """Yield the operations sent by DeltaRequestHandler."""
+    while True:
+        kind, a, b = OP.unpack(stream.read(OP.size))
+        if kind == b'C':
+            yield 'copy', a, b
+        elif kind == b'D':
+            yield 'data', stream.read(a)
+        else:
+            return
+
+
+def fetch(address, name, dst, block_size=BLOCK_SIZE, inplace=False,
+          compressed=False):
+    """Bring dst up to date with the file name on a DeltaRequestHandler.
+
+    compressed must match the level of the handler. Return a Counter
+    of the bytes copied from dst, written from the data that was
+    received, and sent and received over the socket.
+    """
+    with open(dst, 'rb') as f:
+        sig = signature(f, block_size)
+    stats = collections.Counter()
+    with socket.create_connection(address) as sock:
+        stats['sent'] = send_request(sock, name, sig, inplace)
+        stream = _Inflater(sock, compressed)
+        size, = NEW_SIZE.unpack(stream.read(NEW_SIZE.size))
+        ops = receive_ops(stream)
+        if inplace:
+            stats.update(patch_inplace(dst, ops, block_size, size))
+        else:
+            tmp = os.path.join(os.path.dirname(dst),
+                               '.{}.tmp'.format(os.path.basename(dst)))
+            stats.update(patch(dst, ops, block_size, tmp))
+            os.replace(tmp, dst)
+        stats['received'] = stream.received
+    return stats
+
+
+if __name__ == '__main__':
+    import tempfile
+    import threading
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(name)s: %(message)s',
+    )
+    logger = logging.getLogger('Client')
+
+    lorem = open('lorem.txt', 'rb').read()
+    with tempfile.TemporaryDirectory() as tmp:
+        # An old copy of the text, with a sentence missing and a word
+        # changed.
+        old = lorem.replace(b'Duis tincidunt nisi ut ante. ', b'')
+        old = old.replace(b'potenti', b'POTENTI')
+        dst = os.path.join(tmp, 'lorem.txt')
+        with open(dst, 'wb') as f:
+            f.write(old)
+
+        stats = sync_file('lorem.txt', dst, block_size=64)
+        with open(dst, 'rb') as f:
+            logger.info('local: copied %d, wrote %d, same: %s',
+                        stats['copied'], stats['written'], f.read() == lorem)
+
+        with open(dst, 'wb') as f:
+            f.write(old)
+
+        class Handler(DeltaRequestHandler):
+            level = 6
+
+        server = socketserver.TCPServer(('localhost', 0), Handler)
+        t = threading.Thread(target=server.serve_forever)
+        t.daemon = True
+        t.start()
+
+        stats = fetch(server.server_address, 'lorem.txt', dst,
+                      block_size=64, compressed=True)
+        with open(dst, 'rb') as f:
+            logger.info('remote: copied %d, wrote %d, same: %s',
+                        stats['copied'], stats['written'], f.read() == lorem)
+        logger.info('sent %d bytes, received %d bytes',
+                    stats['sent'], stats['received'])
+
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,103 @@
+# zlib_delta_benchmark.py
+import argparse
+import os
+import random
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+
+from zlib_delta import DeltaRequestHandler, fetch, sync_file
+
+RUN_SIZE = 64 * 1024
+
+
+def write_random(filename, size):
+    with open(filename, 'wb') as f:
+        for start in range(0, size, 2 ** 20):
+            f.write(os.urandom(min(2 ** 20, size - start)))
+
+
+def modify(src, dst, rate, seed=0):
+    """Copy src to dst, overwriting about rate of it with new data.
+
+    The changes are made in runs of RUN_SIZE bytes at random offsets.
+    """
+    rng = random.Random(seed)
+    shutil.copyfile(src, dst)
+    size = os.path.getsize(dst)
+    if rate >= 1:
+        write_random(dst, size)
+        return
+    with open(dst, 'r+b') as f:
+        for _ in range(int(size * rate / RUN_SIZE)):
+            f.seek(rng.randrange(size - RUN_SIZE))
+            f.write(os.urandom(RUN_SIZE))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1024,
+                        help='size of the test file in MB')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old = os.path.join(tmp, 'old.bin')
+        new = os.path.join(tmp, 'new.bin')
+        dst = os.path.join(tmp, 'dst.bin')
+        size = args.size * 2 ** 20
+        write_random(old, size)
+
+        class Handler(DeltaRequestHandler):
+            root = tmp
+
+        server = socketserver.TCPServer(('localhost', 0), Handler)
+        t = threading.Thread(target=server.serve_forever, daemon=True)
+        t.start()
+
+        def copy():
+            shutil.copyfile(new, dst)
+            return {'written': size, 'sent': 0, 'received': size}
+
+        methods = [
+            ('copy whole file', copy),
+            ('sync_file', lambda: sync_file(new, dst)),
+            ('sync_file in place', lambda: sync_file(new, dst, inplace=True)),
+            ('fetch', lambda: fetch(server.server_address, 'new.bin', dst)),
+            ('fetch in place',
+             lambda: fetch(server.server_address, 'new.bin', dst,
+                           inplace=True)),
+        ]
+
+        print('{} MB file, {} KB runs changed'.format(
+            args.size, RUN_SIZE // 1024))
+        template = '{:>7} {:<20} {:>8} {:>11} {:>15}'
+        print(template.format('changed', 'method', 'seconds', 'MB literal',
+                              'MB over socket'))
+        print(template.format('-' * 7, '-' * 20, '-' * 8, '-' * 11,
+                              '-' * 15))
+        for rate in [0.01, 0.1, 1]:
+            modify(old, new, rate)
+            for name, method in methods:
+                shutil.copyfile(old, dst)
+                os.sync()
+                start = time.perf_counter()
+                stats = method()
+                os.sync()
+                elapsed = time.perf_counter() - start
+                network = stats.get('sent', 0) + stats.get('received', 0)
+                print(template.format(
+                    '{:.0%}'.format(rate), name, '{:.2f}'.format(elapsed),
+                    '{:.1f}'.format(stats['written'] / 2 ** 20),
+                    '{:.1f}'.format(network / 2 ** 20)
+                    if name.startswith(('fetch', 'copy')) else ''))
+                with open(new, 'rb') as f1, open(dst, 'rb') as f2:
+                    while True:
+                        block = f1.read(2 ** 20)
+                        assert block == f2.read(2 ** 20), name
+                        if not block:
+                            break
+
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,116 @@
+# zlib_parallel.py
+import collections
+import concurrent.futures
+import os
+import struct
+import time
+import zlib
+
+BLOCK_SIZE = 1024 * 1024
+
+# deflate can refer back at most 32 KB, so that is all of the
+# previous block a compressor needs to see.
+WINDOW_SIZE = 32 * 1024
+
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+
+def compress_block(block, dictionary, last, level):
+    """Compress one block as raw deflate data.
+
+    Priming the compressor with the end of the previous block lets it
+    find matches across the block boundary, as if a single compressor
+    had seen the whole input. Every block except the last ends with a
+    sync flush, which pads the output to a byte boundary so the blocks
+    can simply be concatenated.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(block) + compressor.flush(mode)
+
+
+def read_blocks(input, block_size):
+    """Yield (block, dictionary, last) for each block of input."""
+    dictionary = b''
+    block = input.read(block_size)
+    while True:
+        following = input.read(block_size)
+        yield block, dictionary, not following
+        if not following:
+            break
+        dictionary = block[-WINDOW_SIZE:]
+        block = following
+
+
+def compress_file(input, output, level=6, block_size=BLOCK_SIZE,
+                  workers=None):
+    """Write input to output as a gzip stream, using a thread pool.
+
+    zlib releases the GIL while it compresses, so threads run the
+    blocks in parallel. Only a few blocks per worker are in flight at
+    a time, so memory use does not depend on the size of the input.
+    """
+    workers = workers or os.cpu_count()
+    crc = 0
+    size = 0
+    output.write(GZIP_HEADER)
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        for block, dictionary, last in read_blocks(input, block_size):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            pending.append(executor.submit(
+                compress_block, block, dictionary, last, level))
+            if len(pending) >= workers * 2:
+                output.write(pending.popleft().result())
+        while pending:
+            output.write(pending.popleft().result())
+    output.write(struct.pack('<II', crc, size & 0xffffffff))
+
+
+if __name__ == '__main__':
+    import argparse
+    import gzip
+    import io
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=64,
+                        help='size of the test data in MB')
+    parser.add_argument('--level', type=int, default=6)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    lorem = open('lorem.txt', 'rb').read()
+    block = (lorem + os.urandom(len(lorem) // 4)) * 64
+    data = (block * (args.size * 2 ** 20 // len(block) + 1))
+    data = data[:args.size * 2 ** 20]
+
+    start = time.perf_counter()
+    expected = gzip.compress(data, args.level)
+    baseline = time.perf_counter() - start
+
+    template = '{:>7} {:>8} {:>8} {:>10} {:>7}'
+    print(template.format('threads', 'seconds', 'MB/s', 'size', 'speedup'))
+    print(template.format('-' * 7, '-' * 8, '-' * 8, '-' * 10, '-' * 7))
+    print(template.format(
+        'gzip', '{:.2f}'.format(baseline),
+        '{:.1f}'.format(args.size / baseline), len(expected), '1.0'))
+
+    workers = 1
+    while workers <= args.max_workers:
+        output = io.BytesIO()
+        start = time.perf_counter()
+        compress_file(io.BytesIO(data), output, args.level,
+                      workers=workers)
+        elapsed = time.perf_counter() - start
+        compressed = output.getvalue()
+        assert gzip.decompress(compressed) == data
+        print(template.format(
+            workers, '{:.2f}'.format(elapsed),
+            '{:.1f}'.format(args.size / elapsed), len(compressed),
+            '{:.1f}'.format(baseline / elapsed)))
+        workers *= 2
@@ -0,0 +1,97 @@
+# zlib_server_asyncio.py
+import asyncio
+import logging
+import zlib
+
+READ_SIZE = 64 * 1024
+COMPRESS_LEVEL = 1
+
+logger = logging.getLogger('Server')
+
+
+def make_handler(read_size=READ_SIZE, level=COMPRESS_LEVEL):
+    """Return a connection callback for asyncio.start_server()."""
+
+    async def handle(reader, writer):
+        compressor = zlib.compressobj(level)
+
+        # Find out what file the client wants
+        filename = (await reader.read(1024)).decode('utf-8')
+        logger.debug('client asked for: %r', filename)
+
+        # Send chunks of the file as they are compressed, waiting
+        # for the transport buffer to drain so a slow client does
+        # not make the server hold the whole file in memory.
+        try:
+            with open(filename, 'rb') as input:
+                while True:
+                    block = input.read(read_size)
+                    if not block:
+                        break
+                    compressed = compressor.compress(block)
+                    if compressed:
+                        writer.write(compressed)
+                        await writer.drain()
+            writer.write(compressor.flush())
+            await writer.drain()
+        except (ConnectionError, OSError) as err:
+            logger.debug('request for %r failed: %s', filename, err)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    return handle
+
+
+async def start_server(host='localhost', port=0,
+                       read_size=READ_SIZE, level=COMPRESS_LEVEL,
+                       backlog=1024):
+    return await asyncio.start_server(
+        make_handler(read_size, level), host, port, backlog=backlog)
+
+
+async def fetch(host, port, filename):
+    """Request filename and return the decompressed contents."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(filename.encode('utf-8'))
+    await writer.drain()
+
+    decompressor = zlib.decompressobj()
+    chunks = []
+    while True:
+        response = await reader.read(READ_SIZE)
+        if not response:
+            break
+        chunks.append(decompressor.decompress(response))
+    chunks.append(decompressor.flush())
+    writer.close()
+    await writer.wait_closed()
+    return b''.join(chunks)
+
+
+async def main():
+    server = await start_server()
+    ip, port = server.sockets[0].getsockname()[:2]
+
+    log = logging.getLogger('Client')
+    log.info('Contacting server on %s:%s', ip, port)
+
+    # Many clients are served concurrently by the single thread
+    # running the event loop.
+    responses = await asyncio.gather(
+        *[fetch(ip, port, 'lorem.txt') for i in range(10)])
+
+    lorem = open('lorem.txt', 'rb').read()
+    log.info('%d responses match file contents: %s',
+             len(responses), all(r == lorem for r in responses))
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(name)s: %(message)s',
+    )
+    asyncio.run(main())
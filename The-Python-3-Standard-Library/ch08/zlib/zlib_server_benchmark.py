@@ -0,0 +1,114 @@
+# zlib_server_benchmark.py
+import argparse
+import asyncio
+import socketserver
+import statistics
+import threading
+import time
+
+from zlib_server import ZlibRequestHandler
+import zlib_server_asyncio
+
+
+class ThreadedServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # Let the backlog hold every client so the comparison measures
+    # the handler, not refused connections.
+    request_queue_size = 1024
+
+
+def start_threaded_server():
+    server = ThreadedServer(('localhost', 0), ZlibRequestHandler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+
+    return server.server_address[:2], stop
+
+
+def start_asyncio_server(read_size, level):
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+    server = asyncio.run_coroutine_threadsafe(
+        zlib_server_asyncio.start_server(
+            read_size=read_size, level=level),
+        loop,
+    ).result()
+
+    def stop():
+        async def close():
+            server.close()
+            await server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        t.join()
+        loop.close()
+
+    return server.sockets[0].getsockname()[:2], stop
+
+
+async def load(address, filename, clients, requests):
+    """Run requests fetches from clients concurrent connections."""
+    latencies = []
+    sizes = []
+    queue = list(range(requests))
+
+    async def worker():
+        while queue:
+            queue.pop()
+            start = time.perf_counter()
+            body = await zlib_server_asyncio.fetch(*address, filename)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(len(body))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    return elapsed, sizes, latencies
+
+
+def report(name, elapsed, sizes, latencies):
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print('{:<8} {:>8.0f} {:>8.2f} {:>9.2f} {:>9.2f}'.format(
+        name,
+        len(sizes) / elapsed,
+        sum(sizes) / elapsed / 2 ** 20,
+        statistics.median(latencies) * 1000,
+        p99 * 1000,
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', default='lorem.txt')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--read-size', type=int,
+                        default=zlib_server_asyncio.READ_SIZE)
+    parser.add_argument('--level', type=int,
+                        default=zlib_server_asyncio.COMPRESS_LEVEL)
+    args = parser.parse_args()
+
+    print('{} requests for {} from {} concurrent clients'.format(
+        args.requests, args.file, args.clients))
+    print()
+    print('{:<8} {:>8} {:>8} {:>9} {:>9}'.format(
+        'server', 'req/s', 'MB/s', 'p50 (ms)', 'p99 (ms)'))
+    print('{:<8} {:>8} {:>8} {:>9} {:>9}'.format(
+        '-' * 8, '-' * 8, '-' * 8, '-' * 9, '-' * 9))
+
+    servers = [
+        ('threaded', start_threaded_server),
+        ('asyncio', lambda: start_asyncio_server(
+            args.read_size, args.level)),
+    ]
+    for name, start_server in servers:
+        address, stop = start_server()
+        results = asyncio.run(
+            load(address, args.file, args.clients, args.requests))
+        stop()
+        report(name, *results)
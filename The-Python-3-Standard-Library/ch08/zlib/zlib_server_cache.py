@@ -0,0 +1,275 @@
+# zlib_server_cache.py
+import bz2
+import collections
+import hashlib
+import logging
+import os
+import socket
+import socketserver
+import threading
+import zlib
+
+COMPRESSORS = {
+    'zlib': lambda data, level: zlib.compress(data, level),
+    'bz2': lambda data, level: bz2.compress(data, level),
+}
+
+
+class CompressedCache:
+    """LRU cache of compressed file contents with a byte budget.
+
+    Entries are keyed by (path, mtime, size, codec, level), so a file
+    that changes on disk is compressed again on the next request. When
+    cache_dir is given, every compressed artifact is also written
+    there and survives both eviction from memory and server restarts.
+    The artifacts on disk have a budget of their own, max_disk_bytes,
+    and the least recently used ones are removed to stay within it.
+    """
+
+    logger = logging.getLogger('Cache')
+
+    def __init__(self, max_bytes=64 * 2 ** 20, cache_dir=None,
+                 max_disk_bytes=2 ** 30):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.current_bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Artifacts left by an earlier server count against the
+            # budget too.
+            self.disk_bytes = sum(
+                size for mtime, size, path in self._disk_entries())
+
+    def key(self, path, codec, level):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size,
+                codec, level)
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.' + key[3])
+
+    def _disk_entries(self):
+        """Return (mtime, size, path) for each artifact in cache_dir."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed since the directory was read
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def _trim_disk(self):
+        """Remove the least recently used artifacts to fit the budget.
+
+        The directory is scanned again instead of trusting disk_bytes,
+        which can be off when two requests write the same artifact.
+        It is trimmed to 90% of the budget, so the next few artifacts
+        can be written without another scan.
+        """
+        entries = sorted(self._disk_entries())
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.disk_evictions += 1
+            self.logger.debug('removed %s', path)
+        self.disk_bytes = total
+
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            # Another request compressed the same file first, and its
+            # result is already counted.
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = data
+        self.current_bytes += len(data)
+        while self.current_bytes > self.max_bytes:
+            old_key, old_data = self._entries.popitem(last=False)
+            self.current_bytes -= len(old_data)
+            self.evictions += 1
+            self.logger.debug('evicted %r', old_key)
+
+    def lookup(self, path, codec, level):
+        """Return (data, disk_path); exactly one of them is set.
+
+        disk_path is only returned for entries that are persisted
+        but no longer held in memory, so the caller can stream the
+        file instead of reading it back into memory.
+        """
+        key = self.key(path, codec, level)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data, None
+        if self.cache_dir:
+            disk_path = self._disk_path(key)
+            try:
+                # The modification time marks the artifact as recently
+                # used, so it is the last to be removed.
+                os.utime(disk_path)
+            except FileNotFoundError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                return None, disk_path
+
+        # Compress outside of the lock so other requests are not
+        # blocked behind a large file.
+        with open(path, 'rb') as input:
+            data = COMPRESSORS[codec](input.read(), level)
+        if self.cache_dir:
+            # Write to a temporary name first so a concurrent reader
+            # never sees a partially written artifact.
+            disk_path = self._disk_path(key)
+            tmp_path = '{}.{}.tmp'.format(disk_path, threading.get_ident())
+            with open(tmp_path, 'wb') as output:
+                output.write(data)
+            os.replace(tmp_path, disk_path)
+        with self._lock:
+            self.misses += 1
+            self._store(key, data)
+            if self.cache_dir:
+                self.disk_bytes += len(data)
+                if self.disk_bytes > self.max_disk_bytes:
+                    self._trim_disk()
+        return data, None
+
+    def send(self, sock, path, codec, level):
+        data, disk_path = self.lookup(path, codec, level)
+        if data is not None:
+            sock.sendall(data)
+        else:
+            with open(disk_path, 'rb') as input:
+                sock.sendfile(input)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'disk_evictions': self.disk_evictions,
+                'disk_bytes': self.disk_bytes,
+            }
+
+
+class CachingRequestHandler(socketserver.BaseRequestHandler):
+    """Serve compressed files, reusing earlier compression results.
+
+    Configure a server by subclassing and setting cache, codec, and
+    level. With cache set to None every request compresses the file
+    again, which is useful as a baseline.
+    """
+
+    logger = logging.getLogger('Server')
+    cache = CompressedCache()
+    codec = 'zlib'
+    level = 1
+
+    def handle(self):
+        # Find out what file the client wants
+        filename = self.request.recv(1024).decode('utf-8')
+        self.logger.debug('client asked for: %r', filename)
+
+        if self.cache is None:
+            with open(filename, 'rb') as input:
+                data = COMPRESSORS[self.codec](input.read(), self.level)
+            self.request.sendall(data)
+        else:
+            self.cache.send(self.request, filename,
+                            self.codec, self.level)
+
+
+def fetch(address, filename, codec='zlib'):
+    with socket.create_connection(address) as s:
+        s.sendall(filename.encode('utf-8'))
+        chunks = []
+        while True:
+            response = s.recv(65536)
+            if not response:
+                break
+            chunks.append(response)
+    compressed = b''.join(chunks)
+    if codec == 'bz2':
+        return bz2.decompress(compressed)
+    return zlib.decompress(compressed)
+
+
+def run_requests(cache, codec, filename, count, level=1):
+    handler = type('Handler', (CachingRequestHandler,), {
+        'cache': cache,
+        'codec': codec,
+        'level': level,
+    })
+    server = socketserver.TCPServer(('localhost', 0), handler)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    try:
+        return [fetch(server.server_address, filename, codec)
+                for i in range(count)]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(name)s: %(message)s',
+    )
+    logger = logging.getLogger('Client')
+    lorem = open('lorem.txt', 'rb').read()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for codec in ['zlib', 'bz2']:
+            cache = CompressedCache(cache_dir=cache_dir)
+            responses = run_requests(cache, codec, 'lorem.txt', 3)
+            logger.info('%s responses match file contents: %s',
+                        codec, all(r == lorem for r in responses))
+            logger.info('%s cache stats: %s', codec, cache.stats())
+
+            # A new cache with no memory budget, as after a restart,
+            # still finds the artifacts persisted on disk.
+            cache = CompressedCache(max_bytes=0, cache_dir=cache_dir)
+            responses = run_requests(cache, codec, 'lorem.txt', 2)
+            logger.info('%s responses match file contents: %s',
+                        codec, all(r == lorem for r in responses))
+            logger.info('%s restarted cache stats: %s',
+                        codec, cache.stats())
+
+        # With a smaller disk budget, storing a new artifact removes the
+        # least recently used one.
+        cache = CompressedCache(max_bytes=0, cache_dir=cache_dir,
+                                max_disk_bytes=1000)
+        run_requests(cache, 'zlib', 'lorem.txt', 1, level=9)
+        logger.info('small disk budget cache stats: %s', cache.stats())
@@ -0,0 +1,74 @@
+# zlib_server_cache_benchmark.py
+import argparse
+import os
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+
+from zlib_server_cache import CachingRequestHandler, CompressedCache, fetch
+
+
+def measure(cache, codec, filename, requests):
+    handler = type('Handler', (CachingRequestHandler,), {
+        'cache': cache,
+        'codec': codec,
+    })
+    server = socketserver.TCPServer(('localhost', 0), handler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+
+    # Prime the cache so only repeat requests are measured.
+    fetch(server.server_address, filename, codec)
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        fetch(server.server_address, filename, codec)
+        latencies.append(time.perf_counter() - start)
+
+    server.shutdown()
+    server.server_close()
+    return latencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--copies', type=int, default=500,
+                        help='copies of lorem.txt in the served file')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    lorem = open('lorem.txt', 'rb').read()
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'data.txt')
+        with open(filename, 'wb') as output:
+            output.write(lorem * args.copies)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        print('{} repeat requests for a {:,} byte file'.format(
+            args.requests, os.stat(filename).st_size))
+        print()
+        template = '{:<5} {:<8} {:>9} {:>9} {:>6} {:>6}'
+        print(template.format(
+            'codec', 'cache', 'p50 (ms)', 'p99 (ms)', 'hits', 'misses'))
+        print(template.format(
+            '-' * 5, '-' * 8, '-' * 9, '-' * 9, '-' * 6, '-' * 6))
+
+        for codec in ['zlib', 'bz2']:
+            modes = [
+                ('none', None),
+                ('memory', CompressedCache()),
+                ('disk', CompressedCache(max_bytes=0, cache_dir=cache_dir)),
+            ]
+            for name, cache in modes:
+                latencies = measure(cache, codec, filename, args.requests)
+                stats = cache.stats() if cache else {}
+                print(template.format(
+                    codec, name,
+                    '{:.3f}'.format(statistics.median(latencies) * 1000),
+                    '{:.3f}'.format(
+                        statistics.quantiles(latencies, n=100)[98] * 1000),
+                    stats.get('hits', 0) + stats.get('disk_hits', 0),
+                    stats.get('misses', 0),
+                ))
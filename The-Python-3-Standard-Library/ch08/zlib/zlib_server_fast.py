@@ -0,0 +1,122 @@
+# zlib_server_fast.py
+import binascii
+import logging
+import mmap
+import os
+import socketserver
+import zlib
+
+BLOCK_SIZE = 1024 * 1024
+
+# Send compressed output once this much has been collected.
+SEND_SIZE = 256 * 1024
+
+
+class FastZlibRequestHandler(socketserver.BaseRequestHandler):
+    """Stream a compressed file with as few syscalls as possible.
+
+    The file is mapped into memory and fed to the compressor through
+    memoryview slices, so no intermediate copies of the input are
+    made. Compressed blocks are collected in a list and written with
+    one sendmsg() call, and the hex dumps are only built when debug
+    logging is enabled.
+    """
+
+    logger = logging.getLogger('Server')
+    block_size = BLOCK_SIZE
+    send_size = SEND_SIZE
+    level = 1
+
+    def send_blocks(self, blocks):
+        # sendmsg() may send less than everything, like send(), so
+        # fall back to sendall() for whatever is left over.
+        total = sum(len(b) for b in blocks)
+        sent = self.request.sendmsg(blocks)
+        if sent < total:
+            self.request.sendall(b''.join(blocks)[sent:])
+
+    def handle(self):
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        compressor = zlib.compressobj(self.level)
+
+        # Find out what file the client wants
+        filename = self.request.recv(1024).decode('utf-8')
+        if debug:
+            self.logger.debug('client asked for: %r', filename)
+
+        pending = []
+        pending_size = 0
+        with open(filename, 'rb') as input:
+            size = os.fstat(input.fileno()).st_size
+            # mmap cannot map an empty file
+            data = mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ) \
+                if size else b''
+            with memoryview(data) as view:
+                for start in range(0, size, self.block_size):
+                    compressed = compressor.compress(
+                        view[start:start + self.block_size])
+                    if not compressed:
+                        continue
+                    if debug:
+                        self.logger.debug(
+                            'SENDING %r', binascii.hexlify(compressed))
+                    pending.append(compressed)
+                    pending_size += len(compressed)
+                    if pending_size >= self.send_size:
+                        self.send_blocks(pending)
+                        pending = []
+                        pending_size = 0
+            if size:
+                data.close()
+
+        # The flushed data is sent as a whole, with no slicing.
+        remaining = compressor.flush()
+        if debug:
+            self.logger.debug('FLUSHING %r', binascii.hexlify(remaining))
+        pending.append(remaining)
+        self.send_blocks(pending)
+
+
+if __name__ == '__main__':
+    import socket
+    import threading
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(name)s: %(message)s',
+    )
+    logger = logging.getLogger('Client')
+
+    server = socketserver.TCPServer(('localhost', 0), FastZlibRequestHandler)
+    ip, port = server.server_address
+
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+
+    logger.info('Contacting server on %s:%s', ip, port)
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.connect((ip, port))
+
+    requested_file = 'lorem.txt'
+    logger.debug('sending filename: %r', requested_file)
+    s.send(requested_file.encode('utf-8'))
+
+    decompressor = zlib.decompressobj()
+    chunks = []
+    while True:
+        response = s.recv(BLOCK_SIZE)
+        if not response:
+            break
+        logger.debug('READ %d bytes', len(response))
+        chunks.append(decompressor.decompress(response))
+    chunks.append(decompressor.flush())
+
+    full_response = b''.join(chunks)
+    lorem = open('lorem.txt', 'rb').read()
+    logger.debug('response matches file contents: %s',
+                 full_response == lorem)
+
+    s.close()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,69 @@
+# zlib_server_fast_benchmark.py
+import argparse
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import zlib
+
+from zlib_server import ZlibRequestHandler
+from zlib_server_fast import FastZlibRequestHandler
+
+
+def make_file(filename, size):
+    # Mix text with random bytes so the data compresses, but not
+    # so well that the compressor has nothing to do.
+    lorem = open('lorem.txt', 'rb').read()
+    block = (lorem + os.urandom(len(lorem) // 4)) * 64
+    with open(filename, 'wb') as output:
+        written = 0
+        while written < size:
+            output.write(block[:size - written])
+            written += len(block)
+
+
+def measure(handler, filename):
+    server = socketserver.TCPServer(('localhost', 0), handler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+
+    start = time.perf_counter()
+    received = 0
+    with socket.create_connection(server.server_address) as s:
+        s.sendall(filename.encode('utf-8'))
+        decompressor = zlib.decompressobj()
+        while True:
+            response = s.recv(1024 * 1024)
+            if not response:
+                break
+            received += len(decompressor.decompress(response))
+        received += len(decompressor.flush())
+    elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    server.server_close()
+    return received, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=32,
+                        help='size of the test file in MB')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'data.bin')
+        make_file(filename, args.size * 2 ** 20)
+
+        template = '{:<24} {:>10} {:>8}'
+        print(template.format('handler', 'seconds', 'MB/s'))
+        print(template.format('-' * 24, '-' * 10, '-' * 8))
+        for handler in [ZlibRequestHandler, FastZlibRequestHandler]:
+            received, elapsed = measure(handler, filename)
+            assert received == args.size * 2 ** 20
+            print(template.format(
+                handler.__name__,
+                '{:.2f}'.format(elapsed),
+                '{:.1f}'.format(args.size / elapsed)))
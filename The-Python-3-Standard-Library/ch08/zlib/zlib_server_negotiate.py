@@ -0,0 +1,265 @@
+# zlib_server_negotiate.py
+import bz2
+import logging
+import lzma
+import mimetypes
+import os
+import socket
+import socketserver
+import zlib
+
+BLOCK_SIZE = 64 * 1024
+SAMPLE_SIZE = 64 * 1024
+
+# A sample that shrinks by less than this is treated as incompressible.
+MIN_SAVINGS = 0.1
+
+# Below this size the headers of bz2 and lzma outweigh their better
+# ratio, so deflate is used at any level.
+SMALL_FILE = 4 * 1024
+
+# Files with these types are already compressed.
+COMPRESSED_TYPES = {
+    'application/gzip', 'application/x-bzip2', 'application/x-xz',
+    'application/zip', 'image/jpeg', 'image/png', 'image/gif',
+    'video/mp4', 'audio/mpeg',
+}
+
+# Files with these types are text, even though they are not text/*.
+TEXT_TYPES = {
+    'application/json', 'application/xml', 'application/javascript',
+}
+
+
+class NullCodec:
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+CODECS = {
+    'zlib': (
+        lambda level: zlib.compressobj(level),
+        lambda: zlib.decompressobj(),
+    ),
+    'gzip': (
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+        lambda: zlib.decompressobj(31),
+    ),
+    'bz2': (
+        lambda level: bz2.BZ2Compressor(max(level, 1)),
+        lambda: bz2.BZ2Decompressor(),
+    ),
+    'lzma': (
+        lambda level: lzma.LZMACompressor(preset=level),
+        lambda: lzma.LZMADecompressor(),
+    ),
+    'none': (
+        lambda level: NullCodec(),
+        lambda: NullCodec(),
+    ),
+}
+
+# The compression levels each codec accepts.
+LEVELS = {
+    'zlib': range(0, 10),
+    'gzip': range(0, 10),
+    'bz2': range(0, 10),
+    'lzma': range(0, 10),
+    'none': range(0, 10),
+}
+
+# Level -1 asks for the codec's own default.
+DEFAULT_LEVELS = {
+    'zlib': zlib.Z_DEFAULT_COMPRESSION,
+    'gzip': zlib.Z_DEFAULT_COMPRESSION,
+    'bz2': 9,
+    'lzma': lzma.PRESET_DEFAULT,
+    'none': 0,
+}
+
+# Order of preference for compressible data, by kind of file, for low
+# levels that ask for speed and high levels that ask for the smallest
+# output. Deflate is the fastest for both. On text bz2 comes close to
+# the ratio of lzma at a fraction of its CPU cost, while on binary
+# data lzma is clearly smaller and bz2 gains little over deflate.
+PREFERENCES = {
+    'text': (['zlib', 'gzip', 'bz2', 'lzma'],
+             ['bz2', 'lzma', 'zlib', 'gzip']),
+    'binary': (['zlib', 'gzip', 'lzma', 'bz2'],
+               ['lzma', 'zlib', 'gzip', 'bz2']),
+}
+
+
+class NegotiationError(ValueError):
+    """The server could not serve the file with any accepted codec."""
+
+
+def encode_request(filename, codecs, level):
+    return '{} {} {}\n'.format(
+        filename, ','.join(codecs), level).encode('utf-8')
+
+
+def decode_request(line):
+    filename, codecs, level = line.decode('utf-8').rstrip('\n').rsplit(' ', 2)
+    return filename, codecs.split(','), int(level)
+
+
+def is_compressible(filename):
+    mimetype, encoding = mimetypes.guess_type(filename)
+    if encoding or mimetype in COMPRESSED_TYPES:
+        return False
+    with open(filename, 'rb') as input:
+        sample = input.read(SAMPLE_SIZE)
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * (1 - MIN_SAVINGS)
+
+
+def file_kind(filename):
+    mimetype, encoding = mimetypes.guess_type(filename)
+    if mimetype and (mimetype.startswith('text/') or mimetype in TEXT_TYPES):
+        return 'text'
+    return 'binary'
+
+
+def choose_codec(filename, accepted, level):
+    if 'none' in accepted and not is_compressible(filename):
+        return 'none'
+    fast, small = PREFERENCES[file_kind(filename)]
+    if 0 <= level <= 5 or os.path.getsize(filename) < SMALL_FILE:
+        preference = fast
+    else:
+        preference = small
+    for name in preference:
+        if name in accepted:
+            return name
+    if 'none' in accepted:
+        return 'none'
+    raise NegotiationError('no supported codec in {!r}'.format(accepted))
+
+
+def check_level(codec, level):
+    """Return the level to use for codec, replacing -1 by its default."""
+    if level == -1:
+        return DEFAULT_LEVELS[codec]
+    if level not in LEVELS[codec]:
+        raise NegotiationError('level {} is out of range for {}'.format(
+            level, codec))
+    return level
+
+
+class CompressionRequestHandler(socketserver.StreamRequestHandler):
+    """Serve a file with the best codec the client accepts.
+
+    The request is a single line holding the filename, a comma
+    separated list of acceptable codecs, and a compression level. The
+    response starts with a line naming the chosen codec, followed by
+    the compressed stream. If the request can not be served, the line
+    is "error" and a message instead, and nothing follows.
+    """
+
+    logger = logging.getLogger('Server')
+
+    def handle(self):
+        try:
+            filename, accepted, level = decode_request(self.rfile.readline())
+            codec = choose_codec(filename, accepted, level)
+            level = check_level(codec, level)
+            # Open the file before answering, so a missing or unreadable
+            # file is reported instead of looking like an empty one.
+            input = open(filename, 'rb')
+        except (ValueError, OSError) as err:
+            self.logger.debug('refusing request: %s', err)
+            self.wfile.write('error {}\n'.format(err).encode('utf-8'))
+            return
+        self.logger.debug('client asked for %r accepting %s, using %s',
+                          filename, accepted, codec)
+        self.wfile.write(codec.encode('utf-8') + b'\n')
+
+        compressor = CODECS[codec][0](level)
+        with input:
+            while True:
+                block = input.read(BLOCK_SIZE)
+                if not block:
+                    break
+                compressed = compressor.compress(block)
+                if compressed:
+                    self.wfile.write(compressed)
+        self.wfile.write(compressor.flush())
+
+
+def fetch(address, filename, codecs=('zlib', 'none'), level=6):
+    """Return (codec, data) for filename served from address.
+
+    Raise NegotiationError if the server refuses the request.
+    """
+    with socket.create_connection(address) as s:
+        s.sendall(encode_request(filename, codecs, level))
+        response = s.makefile('rb')
+        codec = response.readline().decode('utf-8').rstrip('\n')
+        if codec.startswith('error '):
+            raise NegotiationError(codec[len('error '):])
+        if codec not in CODECS:
+            raise NegotiationError('unexpected response {!r}'.format(codec))
+        decompressor = CODECS[codec][1]()
+        chunks = []
+        while True:
+            block = response.read1(BLOCK_SIZE)
+            if not block:
+                break
+            chunks.append(decompressor.decompress(block))
+        if codec in ('zlib', 'gzip'):
+            chunks.append(decompressor.flush())
+    return codec, b''.join(chunks)
+
+
+if __name__ == '__main__':
+    import tempfile
+    import threading
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(name)s: %(message)s',
+    )
+    logger = logging.getLogger('Client')
+
+    server = socketserver.TCPServer(('localhost', 0),
+                                    CompressionRequestHandler)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+
+    with tempfile.NamedTemporaryFile(suffix='.bin') as random_file:
+        random_file.write(os.urandom(100000))
+        random_file.flush()
+
+        requests = [
+            ('lorem.txt', ['zlib', 'none'], 1),
+            ('lorem.txt', ['gzip', 'bz2', 'lzma', 'none'], 1),
+            ('lorem.txt', ['zlib', 'bz2', 'lzma', 'none'], 9),
+            ('zlib.md', ['zlib', 'bz2', 'lzma', 'none'], 9),
+            ('lorem.txt', ['bz2'], -1),
+            (random_file.name, ['zlib', 'bz2', 'lzma', 'none'], 9),
+            ('lorem.txt', ['brotli'], 9),
+            ('lorem.txt', ['zlib'], 12),
+            ('missing.txt', ['zlib'], 6),
+        ]
+        for filename, codecs, level in requests:
+            try:
+                codec, data = fetch(server.server_address, filename,
+                                    codecs, level)
+            except NegotiationError as err:
+                logger.debug('request refused: %s', err)
+                continue
+            original = open(filename, 'rb').read()
+            logger.debug('received %s, matches file contents: %s',
+                         codec, data == original)
+
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,218 @@
+# hashlib_dedupe.py
+import collections
+import hashlib
+import os
+import sqlite3
+
+from hashlib_multi import hash_stream
+
+ALGORITHM = "sha256"
+
+# How much of each end of a file the second tier hashes.
+EDGE_SIZE = 64 * 1024
+
+SCHEMA = """
+create table if not exists digest (
+    device   integer not null,
+    inode    integer not null,
+    mtime_ns integer not null,
+    size     integer not null,
+    edge     blob not null,
+    full     blob,
+    path     text not null,
+    primary key (device, inode, mtime_ns, size)
+) without rowid;
+"""
+
+
+def open_index(filename):
+    """Open the SQLite index of digests, creating it if needed.
+
+    An index written before the path column was added is only a cache,
+    so it is dropped and built again.
+    """
+    conn = sqlite3.connect(filename)
+    columns = [row[1] for row in conn.execute("pragma table_info(digest)")]
+    if columns and "path" not in columns:
+        conn.execute("drop table digest")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def walk(root, onerror=None):
+    """Yield (path, stat_result) for every regular file under root.
+
+    This finds the same files as pathlib.Path(root).rglob("*"), but
+    os.scandir() reports the type of each entry without a separate
+    stat() call, so only regular files are stat()ed. Symbolic links
+    are not followed. As with os.walk(), directories and files that
+    cannot be read, or that are removed during the walk, are skipped,
+    and the OSError is passed to onerror if it is given.
+    """
+    directories = [root]
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError as err:
+            if onerror is not None:
+                onerror(err)
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+                except OSError as err:
+                    if onerror is not None:
+                        onerror(err)
+
+
+def edge_digest(path, size):
+    """Return a digest of the first and last EDGE_SIZE bytes of a file.
+
+    Files of up to twice EDGE_SIZE are hashed whole, so for them this
+    is the same as full_digest().
+    """
+    h = hashlib.new(ALGORITHM)
+    with open(path, "rb", buffering=0) as f:
+        if size <= 2 * EDGE_SIZE:
+            h.update(f.readall())
+        else:
+            h.update(f.read(EDGE_SIZE))
+            f.seek(size - EDGE_SIZE)
+            h.update(f.read(EDGE_SIZE))
+    return h.digest()
+
+
+def full_digest(path):
+    with open(path, "rb", buffering=0) as f:
+        return hash_stream(f, [ALGORITHM])[ALGORITHM].digest()
+
+
+def find_duplicates(root, conn=None, stats=None):
+    """Return a sorted list of groups of paths under root with equal contents.
+
+    Files are compared in tiers, and each tier only looks at the files
+    that the one before could not tell apart: first the sizes, then a
+    digest of the first and last EDGE_SIZE bytes, then a digest of the
+    whole file. Hard links to the same file are one file, not
+    duplicates, and empty files are ignored.
+
+    If conn is an index from open_index(), digests are looked up there
+    by device, inode, modification time, and size before a file is
+    read, and the index is updated at the end, so a later scan only
+    reads files that are new or have changed. Entries are removed
+    only for files under root that were not found, so one index can
+    be shared by scans of different roots. If stats is a Counter, the
+    number of files, digests computed, bytes read, and files or
+    directories that could not be read are added to it.
+    """
+    if stats is None:
+        stats = collections.Counter()
+
+    def count_error(err):
+        stats["errors"] += 1
+
+    # Tier 1: group by size, keeping the paths of each inode together.
+    by_size = collections.defaultdict(dict)
+    for path, st in walk(root, count_error):
+        stats["files"] += 1
+        if st.st_size:
+            key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            by_size[st.st_size].setdefault(key, []).append(path)
+
+    cached = {}
+    cached_paths = {}
+    if conn is not None:
+        for row in conn.execute("select * from digest"):
+            cached[row[:4]] = row[4:6]
+            cached_paths[row[:4]] = row[6]
+
+    digests = {}
+    first_path = {}
+    duplicates = []
+    for files in by_size.values():
+        if len(files) < 2:
+            continue
+
+        # Tier 2: group files of the same size by their ends.
+        by_edge = collections.defaultdict(list)
+        for key, paths in files.items():
+            size = key[3]
+            edge, full = cached.get(key, (None, None))
+            if edge is None:
+                try:
+                    edge = edge_digest(paths[0], size)
+                except OSError as err:
+                    # Removed or made unreadable since the walk
+                    count_error(err)
+                    continue
+                stats["edge digests"] += 1
+                stats["bytes read"] += min(size, 2 * EDGE_SIZE)
+                if size <= 2 * EDGE_SIZE:
+                    full = edge
+            digests[key] = [edge, full]
+            first_path[key] = os.path.abspath(paths[0])
+            by_edge[edge].append(key)
+
+        # Tier 3: hash the rest of the files that are still alike.
+        for keys in by_edge.values():
+            if len(keys) < 2:
+                continue
+            by_full = collections.defaultdict(list)
+            for key in keys:
+                digest = digests[key]
+                if digest[1] is None:
+                    try:
+                        digest[1] = full_digest(files[key][0])
+                    except OSError as err:
+                        count_error(err)
+                        continue
+                    stats["full digests"] += 1
+                    stats["bytes read"] += key[3]
+                by_full[digest[1]].append(key)
+            for group in by_full.values():
+                if len(group) > 1:
+                    duplicates.append(sorted(p for key in group for p in files[key]))
+
+    if conn is not None:
+        prefix = os.path.join(os.path.abspath(root), "")
+        with conn:
+            conn.executemany(
+                "delete from digest "
+                "where device = ? and inode = ? and mtime_ns = ? and size = ?",
+                [
+                    key
+                    for key, path in cached_paths.items()
+                    if path.startswith(prefix) and key not in digests
+                ],
+            )
+            conn.executemany(
+                "insert or replace into digest values (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    key + tuple(digest) + (cached_paths.get(key, first_path[key]),)
+                    for key, digest in digests.items()
+                    if cached.get(key) != tuple(digest)
+                ],
+            )
+    return sorted(duplicates)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find files with equal contents.")
+    parser.add_argument("root", nargs="?", default="..")
+    parser.add_argument("--index", default="dedupe.db", help="SQLite index file")
+    args = parser.parse_args()
+
+    stats = collections.Counter()
+    with open_index(args.index) as conn:
+        for group in find_duplicates(args.root, conn, stats):
+            print("\n  ".join(group))
+    conn.close()
+    print()
+    for name in ["files", "edge digests", "full digests", "bytes read", "errors"]:
+        print("{:<13}: {}".format(name, stats[name]))
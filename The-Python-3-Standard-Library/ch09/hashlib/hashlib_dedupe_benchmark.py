@@ -0,0 +1,130 @@
+# hashlib_dedupe_benchmark.py
+import argparse
+import collections
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from hashlib_dedupe import find_duplicates, full_digest, open_index, walk
+
+
+def make_tree(root, count, large, seed=0):
+    """Write count files into directories of 1000 files under root.
+
+    Most files are small, with sizes around a few KB. large of them are
+    4-32 MB, and half of those have the same size and the same first
+    and last 64 KB as another large file, but differ in the middle.
+    One file in twenty is a copy of an earlier one.
+    """
+    rng = random.Random(seed)
+    pool = os.urandom(64 * 1024 * 1024)
+    specs = []
+    last_large = None
+    for i in range(count):
+        if specs and rng.random() < 0.05:
+            spec = rng.choice(specs)
+        elif i % (count // large) == 0:
+            if last_large and rng.random() < 0.5:
+                offset, size, _ = last_large
+                spec = (offset, size, rng.randrange(size // 4, size * 3 // 4))
+            else:
+                size = rng.randint(4, 32) * 1024 * 1024
+                spec = (rng.randrange(len(pool) - size), size, None)
+            last_large = spec
+        else:
+            size = min(int(rng.lognormvariate(7, 1.5)) + 1, 4 * 1024 * 1024)
+            spec = (rng.randrange(len(pool) - size), size, None)
+        specs.append(spec)
+
+        offset, size, change = spec
+        data = pool[offset : offset + size]
+        if change is not None:
+            data = data[:change] + bytes([data[change] ^ 1]) + data[change + 1 :]
+        directory = os.path.join(root, "dir{:04d}".format(i // 1000))
+        if i % 1000 == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "file{}.bin".format(i)), "wb") as f:
+            f.write(data)
+
+
+def hash_everything(root, stats):
+    """Find duplicates by computing the full digest of every file."""
+    by_digest = collections.defaultdict(list)
+    for path, st in walk(root):
+        stats["files"] += 1
+        if st.st_size:
+            by_digest[full_digest(path)].append(path)
+            stats["full digests"] += 1
+            stats["bytes read"] += st.st_size
+    return sorted(sorted(paths) for paths in by_digest.values() if len(paths) > 1)
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--large", type=int, default=200)
+    parser.add_argument(
+        "--root", help="directory for the tree, kept to reuse in the next run"
+    )
+    parser.add_argument(
+        "--drop-caches",
+        action="store_true",
+        help="empty the page cache before each run (Linux, needs root)",
+    )
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp()
+    marker = "{}.complete-{}-{}".format(root.rstrip("/"), args.files, args.large)
+    if not (args.root and os.path.exists(marker)):
+        start = time.perf_counter()
+        make_tree(root, args.files, args.large)
+        print("tree written in {:.0f} s".format(time.perf_counter() - start))
+        if args.root:
+            open(marker, "w").close()
+    index = os.path.join(tempfile.mkdtemp(), "dedupe.db")
+
+    conn = open_index(index)
+    try:
+        runs = [
+            ("full digest of every file", lambda s: hash_everything(root, s)),
+            ("tiered, new index", lambda s: find_duplicates(root, conn, s)),
+            ("tiered, index up to date", lambda s: find_duplicates(root, conn, s)),
+        ]
+        template = "{:<26} {:>8} {:>8} {:>8} {:>9}"
+        print(template.format("", "seconds", "edge", "full", "GB read"))
+        print(template.format("-" * 26, "-" * 8, "-" * 8, "-" * 8, "-" * 9))
+        results = []
+        for name, func in runs:
+            if args.drop_caches:
+                drop_caches()
+            stats = collections.Counter()
+            start = time.perf_counter()
+            results.append(func(stats))
+            elapsed = time.perf_counter() - start
+            print(
+                template.format(
+                    name,
+                    "{:.1f}".format(elapsed),
+                    stats["edge digests"],
+                    stats["full digests"],
+                    "{:.2f}".format(stats["bytes read"] / 2**30),
+                )
+            )
+        assert results[0] == results[1] == results[2]
+        print()
+        print(
+            "{} files, {} groups of duplicates".format(stats["files"], len(results[0]))
+        )
+    finally:
+        conn.close()
+        shutil.rmtree(os.path.dirname(index))
+        if not args.root:
+            shutil.rmtree(root)
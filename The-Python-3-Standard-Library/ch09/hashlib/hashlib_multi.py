@@ -0,0 +1,142 @@
+# hashlib_multi.py
+import argparse
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import sys
+
+DEFAULT_ALGORITHMS = ("md5", "sha1", "sha256", "blake2b")
+
+# The SHAKE algorithms produce digests of any length, so hexdigest()
+# needs one. They are left out of the choices on the command line.
+FIXED_SIZE_ALGORITHMS = sorted(
+    name for name in hashlib.algorithms_available if not name.startswith("shake_")
+)
+
+# Large enough that hashlib releases the GIL while hashing each buffer
+# and the cost of the Python loop around it disappears.
+BUFFER_SIZE = 1024 * 1024
+
+
+def hash_stream(f, algorithms=DEFAULT_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """Return a dict of hash objects for the data read from f.
+
+    The data is read into the same buffer over and over, and every
+    hash is updated from a view of it, so nothing is copied.
+    """
+    hashes = {name: hashlib.new(name) for name in algorithms}
+    buffer = bytearray(buffer_size)
+    with memoryview(buffer) as view:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            with view[:size] as chunk:
+                for h in hashes.values():
+                    h.update(chunk)
+    return hashes
+
+
+def hash_mmap(f, algorithms=DEFAULT_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """Return a dict of hash objects for the file f, using mmap.
+
+    The file is mapped instead of read, so the data goes straight from
+    the page cache to the hashes.
+    """
+    hashes = {name: hashlib.new(name) for name in algorithms}
+    if os.fstat(f.fileno()).st_size == 0:
+        return hashes  # an empty file cannot be mapped
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if hasattr(m, "madvise"):
+            m.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(m) as view:
+            # Hash a buffer at a time, so every algorithm uses the data
+            # while it is still in the CPU cache.
+            for start in range(0, len(view), buffer_size):
+                with view[start : start + buffer_size] as chunk:
+                    for h in hashes.values():
+                        h.update(chunk)
+    return hashes
+
+
+def hash_file(filename, algorithms=DEFAULT_ALGORITHMS, use_mmap=False):
+    """Return a dict mapping each algorithm to the hex digest of a file."""
+    with open(filename, "rb", buffering=0) as f:
+        if use_mmap:
+            hashes = hash_mmap(f, algorithms)
+        else:
+            hashes = hash_stream(f, algorithms)
+    return {name: h.hexdigest() for name, h in hashes.items()}
+
+
+def hash_files(
+    filenames, algorithms=DEFAULT_ALGORITHMS, use_mmap=False, workers=None, onerror=None
+):
+    """Yield (filename, digests) for each file, hashing them in threads.
+
+    hashlib releases the GIL while it hashes a large buffer, so several
+    files are hashed at the same time. The results are yielded in the
+    order of filenames. If onerror is given, files that cannot be read
+    are skipped and the OSError is passed to it; otherwise the error is
+    raised.
+    """
+
+    def hash_or_error(filename):
+        try:
+            return hash_file(filename, algorithms, use_mmap)
+        except OSError as err:
+            return err
+
+    # pool.map() consumes an iterator, which zip() then needs again.
+    filenames = list(filenames)
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        for filename, result in zip(filenames, pool.map(hash_or_error, filenames)):
+            if not isinstance(result, OSError):
+                yield filename, result
+            elif onerror is None:
+                raise result
+            else:
+                onerror(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute several digests of each file in one pass."
+    )
+    parser.add_argument("filenames", nargs="+", metavar="file")
+    parser.add_argument(
+        "-a",
+        "--algorithm",
+        action="append",
+        dest="algorithms",
+        choices=FIXED_SIZE_ALGORITHMS,
+        help="a hash algorithm to use, may be repeated "
+        "(default: {})".format(", ".join(DEFAULT_ALGORITHMS)),
+    )
+    parser.add_argument(
+        "--mmap", action="store_true", help="map the files instead of reading them"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of threads"
+    )
+    args = parser.parse_args(argv)
+
+    errors = []
+
+    def report(err):
+        # Like sha256sum, name the file and carry on with the rest.
+        print("{}: {}".format(err.filename, err.strerror), file=sys.stderr)
+        errors.append(err)
+
+    algorithms = args.algorithms or DEFAULT_ALGORITHMS
+    for filename, digests in hash_files(
+        args.filenames, algorithms, args.mmap, args.workers, report
+    ):
+        for name, digest in digests.items():
+            print("{} ({}) = {}".format(name.upper(), filename, digest))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
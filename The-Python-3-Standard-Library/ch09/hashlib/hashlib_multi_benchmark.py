@@ -0,0 +1,88 @@
+# hashlib_multi_benchmark.py
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from hashlib_multi import DEFAULT_ALGORITHMS, hash_file, hash_files
+
+
+def make_files(directory, count, size):
+    filenames = []
+    block = os.urandom(1024 * 1024)
+    for i in range(count):
+        filename = os.path.join(directory, "data{}.bin".format(i))
+        with open(filename, "wb") as f:
+            for _ in range(size // len(block)):
+                f.write(block)
+        filenames.append(filename)
+    return filenames
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def read_per_chunk(filename, algorithms):
+    """Hash each algorithm in its own pass, with f.read() per chunk."""
+    for name in algorithms:
+        h = hashlib.new(name)
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                h.update(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256, help="MB per file")
+    parser.add_argument("--max-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filenames = make_files(tmpdir, args.files, args.size * 1024 * 1024)
+        total = sum(os.path.getsize(f) for f in filenames) / 2**30
+        # Read the files once, so every run finds them in the page cache.
+        for filename in filenames:
+            hash_file(filename, ["md5"])
+        print("{} files, {:.2f} GB, {} CPUs".format(args.files, total, os.cpu_count()))
+        print()
+
+        thread_counts = []
+        workers = 1
+        while workers <= args.max_workers:
+            thread_counts.append(workers)
+            workers *= 2
+
+        template = "{:<16}" + " {:>10}" * len(thread_counts)
+        print(template.format("GB/s", *["{} threads".format(n) for n in thread_counts]))
+        print(template.format("-" * 16, *["-" * 10] * len(thread_counts)))
+        rows = [(name, [name]) for name in DEFAULT_ALGORITHMS]
+        rows.append(("all four", DEFAULT_ALGORITHMS))
+        for label, algorithms in rows:
+            speeds = []
+            for workers in thread_counts:
+                elapsed = timed(
+                    lambda: list(hash_files(filenames, algorithms, workers=workers))
+                )
+                speeds.append("{:.2f}".format(total / elapsed))
+            print(template.format(label, *speeds))
+        print()
+
+        template = "{:<28} {:>8} {:>8}"
+        print(template.format("all four, one thread", "seconds", "GB/s"))
+        print(template.format("-" * 28, "-" * 8, "-" * 8))
+        for label, func in [
+            ("pass per algorithm, read()", read_per_chunk),
+            ("one pass, readinto()", hash_file),
+            ("one pass, mmap", lambda f, a: hash_file(f, a, use_mmap=True)),
+        ]:
+            elapsed = sum(timed(func, f, DEFAULT_ALGORITHMS) for f in filenames)
+            print(
+                template.format(
+                    label, "{:.2f}".format(elapsed), "{:.2f}".format(total / elapsed)
+                )
+            )
@@ -0,0 +1,262 @@
+# hmac_channel.py
+import hashlib
+import hmac
+import os
+import pickle
+import struct
+
+# algorithm id, number of pickles, number of out-of-band buffers
+HEADER = struct.Struct("!BHH")
+LENGTH = struct.Struct("!Q")
+MAX_COUNT = 0xFFFF
+
+# The largest payload a frame may carry. The lengths are read before
+# the digest can be checked, so this bounds what a forged header can
+# make the receiver allocate.
+MAX_PAYLOAD = 256 * 1024 * 1024
+
+# The most buffers sendmsg() and writev() accept in one call.
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+ALGORITHMS = {
+    "sha256": 1,
+    "blake2b": 2,
+}
+
+
+class SignatureError(ValueError):
+    """A frame's digest did not match its contents."""
+
+
+def new_mac(key, algorithm):
+    if algorithm == "sha256":
+        return hmac.new(key, digestmod=hashlib.sha256)
+    if algorithm == "blake2b":
+        # BLAKE2 has a built-in keyed mode, so it does not need the
+        # extra hashing passes of HMAC.
+        return hashlib.blake2b(key=key, digest_size=32)
+    raise ValueError("unsupported algorithm {!r}".format(algorithm))
+
+
+class Channel:
+    """Send signed pickles over a socket or pipe.
+
+    Each frame holds a fixed-size binary header, a table of lengths, a
+    raw digest, and then one or more pickles followed by the pickle
+    protocol 5 out-of-band buffers they refer to. Objects wrapped in
+    pickle.PickleBuffer are sent straight from their own memory and
+    received directly into the buffers handed back to the caller. The
+    digest covers everything except itself and is checked before any
+    pickle is loaded. Frames with more than max_payload bytes of data
+    are refused by both ends.
+    """
+
+    def __init__(
+        self,
+        send_buffers,
+        recv_into,
+        key,
+        algorithm="blake2b",
+        max_payload=MAX_PAYLOAD,
+    ):
+        self._send_buffers = send_buffers
+        self._recv_into = recv_into
+        self.algorithm = algorithm
+        self.max_payload = max_payload
+        # Copying a keyed MAC is cheaper than keying a new one per frame.
+        self._mac = new_mac(key, algorithm)
+        self.digest_size = self._mac.digest_size
+
+    @classmethod
+    def from_socket(cls, sock, key, algorithm="blake2b", max_payload=MAX_PAYLOAD):
+        def send_buffers(buffers):
+            if len(buffers) == 1:
+                sock.sendall(buffers[0])
+                return
+            size = sum(memoryview(b).nbytes for b in buffers)
+            while size:
+                sent = sock.sendmsg(buffers[:IOV_MAX])
+                size -= sent
+                if size:
+                    buffers = _advance(buffers, sent)
+
+        # The buffered reader collects small headers with one system call
+        # and reads large payloads directly into the caller's buffer.
+        rfile = sock.makefile("rb")
+        return cls(send_buffers, rfile.readinto, key, algorithm, max_payload)
+
+    @classmethod
+    def from_pipe(
+        cls, read_fd, write_fd, key, algorithm="blake2b", max_payload=MAX_PAYLOAD
+    ):
+        def send_buffers(buffers):
+            size = sum(memoryview(b).nbytes for b in buffers)
+            while size:
+                written = os.writev(write_fd, buffers[:IOV_MAX])
+                size -= written
+                if size:
+                    buffers = _advance(buffers, written)
+
+        rfile = open(read_fd, "rb", closefd=False)
+        return cls(send_buffers, rfile.readinto, key, algorithm, max_payload)
+
+    def _frame(self, objects):
+        pickles = []
+        buffers = []
+        for obj in objects:
+            pickles.append(
+                pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+            )
+        buffers = [b.raw() for b in buffers]
+        if len(pickles) > MAX_COUNT or len(buffers) > MAX_COUNT:
+            raise ValueError(
+                "a frame holds at most {} objects and {} buffers".format(
+                    MAX_COUNT, MAX_COUNT
+                )
+            )
+        sizes = [len(p) for p in pickles] + [b.nbytes for b in buffers]
+        if sum(sizes) > self.max_payload:
+            raise ValueError(
+                "frame of {} bytes is larger than max_payload".format(sum(sizes))
+            )
+        prefix = HEADER.pack(
+            ALGORITHMS[self.algorithm], len(pickles), len(buffers)
+        ) + struct.pack("!{}Q".format(len(sizes)), *sizes)
+        mac = self._mac.copy()
+        mac.update(prefix)
+        for part in pickles + buffers:
+            mac.update(part)
+        if not buffers:
+            # Small frames are cheaper to send as a single bytes object.
+            return [b"".join([prefix, mac.digest()] + pickles)]
+        return [prefix, mac.digest()] + pickles + buffers
+
+    def send(self, obj):
+        self._send_buffers(self._frame([obj]))
+
+    def send_batch(self, objects):
+        """Send several objects in one frame, signed by one digest."""
+        self._send_buffers(self._frame(objects))
+
+    def _recv_exact(self, size, eof_ok=False):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            n = self._recv_into(view[received:])
+            if not n:
+                if eof_ok and not received:
+                    return None
+                raise EOFError("channel closed inside a frame")
+            received += n
+        return buffer
+
+    def recv_batch(self):
+        """Return the list of objects in the next frame, or None at EOF."""
+        header = self._recv_exact(HEADER.size, eof_ok=True)
+        if header is None:
+            return None
+        algorithm, pickle_count, buffer_count = HEADER.unpack(header)
+        if algorithm != ALGORITHMS[self.algorithm]:
+            raise SignatureError("unexpected algorithm id {}".format(algorithm))
+        count = pickle_count + buffer_count
+        block = self._recv_exact(LENGTH.size * count + self.digest_size)
+        lengths = memoryview(block)[: LENGTH.size * count]
+        digest = block[LENGTH.size * count :]
+        sizes = struct.unpack("!{}Q".format(count), lengths)
+        if sum(sizes) > self.max_payload:
+            raise SignatureError(
+                "frame of {} bytes is larger than max_payload".format(sum(sizes))
+            )
+
+        # Read the payload into one buffer and hand out slices of it.
+        payload = memoryview(self._recv_exact(sum(sizes)))
+        parts = []
+        offset = 0
+        for size in sizes:
+            parts.append(payload[offset : offset + size])
+            offset += size
+
+        mac = self._mac.copy()
+        mac.update(header)
+        mac.update(lengths)
+        mac.update(payload)
+        if not hmac.compare_digest(mac.digest(), digest):
+            raise SignatureError("frame digest does not match")
+
+        buffers = iter(parts[pickle_count:])
+        return [pickle.loads(p, buffers=buffers) for p in parts[:pickle_count]]
+
+    def recv(self):
+        """Return the next object, or raise EOFError at the end."""
+        objects = self.recv_batch()
+        if objects is None:
+            raise EOFError("channel closed")
+        if len(objects) != 1:
+            raise ValueError("expected 1 object, got {}".format(len(objects)))
+        return objects[0]
+
+
+def _advance(buffers, count):
+    """Drop count bytes from the front of a list of buffers."""
+    buffers = [memoryview(b).cast("B") for b in buffers]
+    while buffers and count >= buffers[0].nbytes:
+        count -= buffers[0].nbytes
+        buffers.pop(0)
+    if buffers and count:
+        buffers[0] = buffers[0][count:]
+    return buffers
+
+
+class SimpleObject:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+if __name__ == "__main__":
+    import socket
+    import threading
+
+    key = b"secret-shared-key-goes-here"
+    left, right = socket.socketpair()
+    writer = Channel.from_socket(left, key)
+    reader = Channel.from_socket(right, key)
+    # Sign with a different key to simulate a forged frame.
+    forger = Channel.from_socket(left, b"not-the-right-key")
+
+    # Write from another thread, since the large frame does not fit in
+    # the socket buffers.
+    def send_all():
+        writer.send(SimpleObject("digest matches"))
+        big = bytearray(b"x" * 1000000)
+        writer.send({"name": "large", "data": pickle.PickleBuffer(big)})
+        writer.send_batch([SimpleObject("batch {}".format(i)) for i in range(3)])
+        forger.send(SimpleObject("digest does not match"))
+        left.shutdown(socket.SHUT_WR)
+
+    t = threading.Thread(target=send_all)
+    t.start()
+
+    print("OK:", reader.recv())
+    received = reader.recv()
+    print(
+        "OK: {} with {} bytes out-of-band, a {}".format(
+            received["name"], len(received["data"]), type(received["data"]).__name__
+        )
+    )
+    print("OK:", [str(o) for o in reader.recv_batch()])
+    try:
+        reader.recv()
+    except SignatureError as err:
+        print("WARNING:", err)
+    print("End of stream:", reader.recv_batch())
+
+    t.join()
+    left.close()
+    right.close()
@@ -0,0 +1,119 @@
+# hmac_channel_benchmark.py
+import argparse
+import hashlib
+import hmac
+import pickle
+import socket
+import threading
+import time
+
+from hmac_channel import Channel, SignatureError
+
+KEY = b"secret-shared-key-goes-here"
+
+
+class TextHeaderChannel:
+    """The digest/length text header format from hmac_pickle.py."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.rfile = sock.makefile("rb")
+
+    def send(self, obj):
+        # Protocol 5 is needed for PickleBuffer, which is copied in-band
+        # here since there is no buffer_callback.
+        data = pickle.dumps(obj, protocol=5)
+        digest = hmac.new(KEY, data, hashlib.sha1).hexdigest().encode("utf-8")
+        self.sock.sendall(b"%s %d\n" % (digest, len(data)) + data)
+
+    def send_batch(self, objects):
+        for obj in objects:
+            self.send(obj)
+
+    def recv_batch(self):
+        first_line = self.rfile.readline()
+        if not first_line:
+            return None
+        incoming_digest, incoming_length = first_line.split(b" ")
+        data = self.rfile.read(int(incoming_length.decode("utf-8")))
+        digest = hmac.new(KEY, data, hashlib.sha1).hexdigest().encode("utf-8")
+        if not hmac.compare_digest(digest, incoming_digest):
+            raise SignatureError("Data corruption")
+        return [pickle.loads(data)]
+
+
+def make_text(sock):
+    return TextHeaderChannel(sock)
+
+
+def make_sha256(sock):
+    return Channel.from_socket(sock, KEY, "sha256")
+
+
+def make_blake2b(sock):
+    return Channel.from_socket(sock, KEY, "blake2b")
+
+
+FORMATS = [
+    ("text sha1", make_text),
+    ("binary sha256", make_sha256),
+    ("binary blake2b", make_blake2b),
+]
+
+
+def transfer(make_channel, messages, batch):
+    """Send messages through a socket pair, return the elapsed time."""
+    left, right = socket.socketpair()
+    writer = make_channel(left)
+    reader = make_channel(right)
+
+    def send_all():
+        for i in range(0, len(messages), batch):
+            writer.send_batch(messages[i : i + batch])
+        left.shutdown(socket.SHUT_WR)
+
+    start = time.perf_counter()
+    t = threading.Thread(target=send_all)
+    t.start()
+    received = 0
+    while True:
+        objects = reader.recv_batch()
+        if objects is None:
+            break
+        received += len(objects)
+    t.join()
+    elapsed = time.perf_counter() - start
+    left.close()
+    right.close()
+    assert received == len(messages)
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small", type=int, default=50000, help="small messages")
+    parser.add_argument("--batch", type=int, default=100, help="small per frame")
+    parser.add_argument("--large", type=int, default=8, help="MB per large message")
+    parser.add_argument("--count", type=int, default=32, help="large messages")
+    args = parser.parse_args()
+
+    small = [{"id": i, "name": "item {}".format(i)} for i in range(args.small)]
+    payload = bytearray(args.large * 2**20)
+    large = [{"id": i, "data": pickle.PickleBuffer(payload)} for i in range(args.count)]
+    large_mb = args.large * args.count
+
+    template = "{:<15} {:>10} {:>14} {:>10}"
+    print(template.format("format", "msgs/s", "batched msgs/s", "large MB/s"))
+    print(template.format("-" * 15, "-" * 10, "-" * 14, "-" * 10))
+    for name, make_channel in FORMATS:
+        single = transfer(make_channel, small, 1)
+        batched = transfer(make_channel, small, args.batch)
+        bulk = transfer(make_channel, large, 1)
+        print(
+            template.format(
+                name,
+                "{:.0f}".format(len(small) / single),
+                "{:.0f}".format(len(small) / batched),
+                "{:.1f}".format(large_mb / bulk),
+            )
+        )